@@ -0,0 +1,66 @@
+"""add wallet statements
+
+Revision ID: 29203e519693
+Revises: c9e1f4a7b203
+Create Date: 2026-10-18 06:32:52.447603
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '29203e519693'
+down_revision: Union[str, Sequence[str], None] = 'c9e1f4a7b203'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'job_watermark',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('position', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'wallet_statement',
+        sa.Column('wallet_id', sa.UUID(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column(
+            'opening_balance', sa.Numeric(precision=18, scale=4), nullable=False
+        ),
+        sa.Column(
+            'closing_balance', sa.Numeric(precision=18, scale=4), nullable=False
+        ),
+        sa.Column('credits', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('debits', sa.Numeric(precision=18, scale=4), nullable=False),
+        sa.Column('transaction_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('wallet_id', 'day'),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transaction_created_at',
+            'transaction',
+            ['created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transaction_created_at',
+            table_name='transaction',
+            postgresql_concurrently=True,
+        )
+    op.drop_table('wallet_statement')
+    op.drop_table('job_watermark')
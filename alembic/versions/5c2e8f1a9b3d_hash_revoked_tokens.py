@@ -0,0 +1,83 @@
+"""hash revoked tokens and track their expiry
+
+Revision ID: 5c2e8f1a9b3d
+Revises: 34bfd68444ad
+Create Date: 2026-10-18 09:12:40.518263
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from jose import JWTError, jwt
+
+from utils import hash_token
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8f1a9b3d'
+down_revision: Union[str, Sequence[str], None] = '34bfd68444ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+revoked_token = sa.table(
+    'revoked_token',
+    sa.column('token', sa.String()),
+    sa.column('token_hash', sa.String()),
+    sa.column('expires_at', sa.DateTime(timezone=True)),
+    sa.column('revoked_at', sa.DateTime(timezone=True)),
+)
+
+
+def _token_expiry(token: str, now: datetime) -> datetime:
+    try:
+        exp = jwt.get_unverified_claims(token).get('exp')
+    except JWTError:
+        exp = None
+    if exp is None:
+        return now + timedelta(days=5)
+    return datetime.fromtimestamp(exp, timezone.utc)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('revoked_token', sa.Column('token_hash', sa.String(), nullable=True))
+    op.add_column('revoked_token', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('revoked_token', sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True))
+
+    connection = op.get_bind()
+    now = datetime.now(timezone.utc)
+    for (token,) in connection.execute(sa.select(revoked_token.c.token)).all():
+        connection.execute(
+            revoked_token.update()
+            .where(revoked_token.c.token == token)
+            .values(
+                token_hash=hash_token(token),
+                expires_at=_token_expiry(token, now),
+                revoked_at=now,
+            )
+        )
+
+    op.drop_constraint('revoked_token_pkey', 'revoked_token', type_='primary')
+    op.drop_column('revoked_token', 'token')
+    op.alter_column('revoked_token', 'token_hash', nullable=False)
+    op.alter_column('revoked_token', 'expires_at', nullable=False)
+    op.alter_column('revoked_token', 'revoked_at', nullable=False)
+    op.create_primary_key('revoked_token_pkey', 'revoked_token', ['token_hash'])
+    op.create_index(op.f('ix_revoked_token_expires_at'), 'revoked_token', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_revoked_token_revoked_at'), 'revoked_token', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Raw tokens cannot be recovered from their hashes; the hashes are kept in
+    # the restored column so the table shape matches the previous revision.
+    op.drop_index(op.f('ix_revoked_token_revoked_at'), table_name='revoked_token')
+    op.drop_index(op.f('ix_revoked_token_expires_at'), table_name='revoked_token')
+    op.drop_constraint('revoked_token_pkey', 'revoked_token', type_='primary')
+    op.alter_column('revoked_token', 'token_hash', new_column_name='token')
+    op.create_primary_key('revoked_token_pkey', 'revoked_token', ['token'])
+    op.drop_column('revoked_token', 'revoked_at')
+    op.drop_column('revoked_token', 'expires_at')
@@ -0,0 +1,39 @@
+"""index transaction history by wallet
+
+Revision ID: 8d41b7c2e6f0
+Revises: 5c2e8f1a9b3d
+Create Date: 2026-10-18 14:03:21.774519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41b7c2e6f0'
+down_revision: Union[str, Sequence[str], None] = '5c2e8f1a9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transaction_wallet_created_at',
+            'transaction',
+            ['wallet_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transaction_wallet_created_at',
+            table_name='transaction',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,39 @@
+"""index user listing by creation time
+
+Revision ID: a4c7e2f9d051
+Revises: f2b8d3e5a6c1
+Create Date: 2026-10-18 19:12:40.318266
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c7e2f9d051'
+down_revision: Union[str, Sequence[str], None] = 'f2b8d3e5a6c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_created_at',
+            'user',
+            ['created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_user_created_at',
+            table_name='user',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,52 @@
+"""add hot path indexes
+
+Revision ID: b3f09a6d1c27
+Revises: 8d41b7c2e6f0
+Create Date: 2026-10-18 15:26:48.102937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f09a6d1c27'
+down_revision: Union[str, Sequence[str], None] = '8d41b7c2e6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# transaction.wallet_id is already served by ix_transaction_wallet_created_at,
+# which leads with wallet_id.
+INDEXES = [
+    ('ix_transaction_related_transaction_id', 'transaction', ['related_transaction_id']),
+    ('ix_token_token_hash', 'token', ['token_hash']),
+    ('ix_token_user_id', 'token', ['user_id']),
+    ('ix_token_expires_at', 'token', ['expires_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,51 @@
+"""add wallet shards
+
+Revision ID: e7a2c4d9f813
+Revises: b3f09a6d1c27
+Create Date: 2026-10-18 16:48:05.391246
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c4d9f813'
+down_revision: Union[str, Sequence[str], None] = 'b3f09a6d1c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'wallet',
+        sa.Column('shard_count', sa.Integer(), server_default='1', nullable=False),
+    )
+    op.create_table('wallet_shard',
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('shard_no', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=18, scale=4), nullable=False),
+    sa.CheckConstraint('balance >= 0', name='wallet_shard_balance_non_negative'),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallet.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('wallet_id', 'shard_no')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold shard balances back into the wallet row before dropping them.
+    op.execute(
+        """
+        UPDATE wallet SET balance = wallet.balance + shards.total
+        FROM (
+            SELECT wallet_id, SUM(balance) AS total
+            FROM wallet_shard GROUP BY wallet_id
+        ) AS shards
+        WHERE wallet.id = shards.wallet_id
+        """
+    )
+    op.drop_table('wallet_shard')
+    op.drop_column('wallet', 'shard_count')
@@ -0,0 +1,48 @@
+"""add deferred credits
+
+Revision ID: f2b8d3e5a6c1
+Revises: e7a2c4d9f813
+Create Date: 2026-10-18 18:12:37.640925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d3e5a6c1'
+down_revision: Union[str, Sequence[str], None] = 'e7a2c4d9f813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'wallet',
+        sa.Column(
+            'deferred_credits', sa.Boolean(), server_default='false', nullable=False
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transaction_pending',
+            'transaction',
+            ['wallet_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_where=sa.text("status = 'pending'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transaction_pending',
+            table_name='transaction',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('wallet', 'deferred_credits')
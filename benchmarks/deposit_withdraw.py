@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from sqlalchemy import delete
+
+import models
+from database import AsyncSessionLocal, async_engine
+from services import TransactionService
+from utils import hash_password
+
+
+async def create_bench_wallet(currency: str):
+    async with AsyncSessionLocal() as db:
+        user = models.User(
+            username=f"bench_{uuid4().hex[:12]}",
+            email=f"bench_{uuid4().hex[:12]}@bench.local",
+            password_hash=hash_password("benchmark"),
+            first_name="Bench",
+            last_name="User",
+            gender="male",
+        )
+        db.add(user)
+        await db.flush()
+        db.add(models.Wallet(user_id=user.id, currency=currency, balance=1_000_000))
+        await db.commit()
+        return user.id
+
+
+async def drop_bench_user(user_id):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.User).filter(models.User.id == user_id))
+        await db.commit()
+
+
+async def run_operation(
+    mode: str, user_id, currency: str, index: int, limiter: asyncio.Semaphore
+) -> float:
+    async with limiter, AsyncSessionLocal() as db:
+        service = TransactionService(db, mode=mode)
+        start = time.perf_counter()
+        if index % 2 == 0:
+            await service.deposit(user_id, Decimal("10"), currency)
+        else:
+            await service.withdraw(user_id, Decimal("5"), currency)
+        return time.perf_counter() - start
+
+
+async def run_mode(mode: str, operations: int, concurrency: int, currency: str) -> dict:
+    user_id = await create_bench_wallet(currency)
+    limiter = asyncio.Semaphore(concurrency)
+    try:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(
+                run_operation(mode, user_id, currency, i, limiter)
+                for i in range(operations)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        await drop_bench_user(user_id)
+
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "operations": operations,
+        "concurrency": concurrency,
+        "throughput_ops": round(operations / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+    }
+
+
+async def main(args: argparse.Namespace):
+    results = [
+        await run_mode(mode, args.operations, args.concurrency, args.currency)
+        for mode in ("orm", "atomic")
+    ]
+    await async_engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the atomic and ORM deposit/withdraw paths on one hot wallet."
+    )
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--currency", default="USD")
+    asyncio.run(main(parser.parse_args()))
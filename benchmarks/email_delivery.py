@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+from utils import SMTPPool, build_message, mail_templates
+
+
+class SinkServer:
+    # Just enough SMTP to accept mail; --latency delays every reply to stand in
+    # for the round trips to a real relay.
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.stats = Counter()
+
+    async def reply(self, writer: asyncio.StreamWriter, line: bytes) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(line + b"\r\n")
+        await writer.drain()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.stats["connections"] += 1
+        await self.reply(writer, b"220 sink ESMTP")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command == b"EHLO":
+                await self.reply(writer, b"250-sink\r\n250 8BITMIME")
+            elif command == b"DATA":
+                await self.reply(writer, b"354 End data with <CR><LF>.<CR><LF>")
+                while (await reader.readline()) not in (b".\r\n", b""):
+                    pass
+                self.stats["messages"] += 1
+                await self.reply(writer, b"250 OK")
+            elif command == b"QUIT":
+                await self.reply(writer, b"221 Bye")
+                break
+            else:
+                await self.reply(writer, b"250 OK")
+        writer.close()
+
+
+def mail_config(host: str, port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="bench",
+        MAIL_PASSWORD="bench",
+        MAIL_FROM="bench@example.com",
+        MAIL_SERVER=host,
+        MAIL_PORT=port,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+
+async def per_email(config: ConnectionConfig, body: str, args) -> None:
+    # The previous delivery path: a new FastMail client and SMTP session per
+    # email, with --concurrency emails in flight like worker processes.
+    limiter = asyncio.Semaphore(args.concurrency)
+
+    async def send(index: int) -> None:
+        async with limiter:
+            await FastMail(config).send_message(
+                MessageSchema(
+                    subject="Verify your email",
+                    recipients=[f"user{index}@example.com"],
+                    body=body,
+                    subtype=MessageType.html,
+                )
+            )
+
+    await asyncio.gather(*(send(index) for index in range(args.emails)))
+
+
+async def pooled(config: ConnectionConfig, body: str, args) -> None:
+    pool = SMTPPool(config, size=args.concurrency)
+    for start in range(0, args.emails, args.batch_size):
+        messages = [
+            build_message(
+                "Verify your email", [f"user{index}@example.com"], body, config
+            )
+            for index in range(start, min(start + args.batch_size, args.emails))
+        ]
+        errors = [error for error in await pool.send_many(messages) if error]
+        if errors:
+            raise errors[0]
+    await pool.close()
+
+
+async def run(name: str, deliver, config: ConnectionConfig, sink, args) -> dict:
+    body = mail_templates.render(
+        "verification_mail.html",
+        {"verification_url": "https://example.com/verify?token=bench"},
+    )
+    if sink:
+        sink.stats.clear()
+    started = time.perf_counter()
+    await deliver(config, body, args)
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": name,
+        "emails": args.emails,
+        "throughput_emails": round(args.emails / elapsed, 2),
+        "connections": sink.stats["connections"] if sink else None,
+    }
+
+
+async def main(args: argparse.Namespace):
+    sink, server = None, None
+    if args.server:
+        host, _, port = args.server.partition(":")
+        port = int(port)
+    else:
+        sink = SinkServer(args.latency / 1000)
+        server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    config = mail_config(host, port)
+    try:
+        results = [
+            await run("per_email", per_email, config, sink, args),
+            await run("pooled", pooled, config, sink, args),
+        ]
+    finally:
+        if server:
+            server.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare one SMTP session per email with pooled, batched delivery."
+    )
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Emails in flight (per-email) and pooled connections.",
+    )
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=2,
+        help="Delay in ms before each reply of the built-in sink server.",
+    )
+    parser.add_argument(
+        "--server",
+        help="host:port of an external stand-in SMTP server "
+        "(e.g. `python -m aiosmtpd -n -l localhost:8025`) instead of the sink.",
+    )
+    asyncio.run(main(parser.parse_args()))
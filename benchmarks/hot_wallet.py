@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import select
+
+import models
+from benchmarks.deposit_withdraw import create_bench_wallet, drop_bench_user
+from database import AsyncSessionLocal, async_engine
+from services import TransactionService, WalletService
+
+CREDIT = Decimal("10")
+DEBIT = Decimal("5")
+
+
+async def run_operation(
+    user_id, currency: str, debit: bool, limiter: asyncio.Semaphore
+) -> float:
+    async with limiter, AsyncSessionLocal() as db:
+        service = TransactionService(db)
+        start = time.perf_counter()
+        if debit:
+            await service.withdraw(user_id, DEBIT, currency)
+        else:
+            await service.deposit(user_id, CREDIT, currency)
+        return time.perf_counter() - start
+
+
+async def run_wallet(
+    shard_count: int,
+    deferred_credits: bool,
+    operations: int,
+    concurrency: int,
+    debit_every: int,
+    currency: str,
+) -> dict:
+    user_id = await create_bench_wallet(currency)
+    async with AsyncSessionLocal() as db:
+        service = WalletService(db)
+        wallet = await service.set_shard_count(user_id, currency, shard_count)
+        opening_balance = wallet.total_balance
+        await service.set_deferred_credits(user_id, currency, deferred_credits)
+
+    limiter = asyncio.Semaphore(concurrency)
+    debits = [debit_every and i % debit_every == 0 for i in range(operations)]
+    try:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(run_operation(user_id, currency, debit, limiter) for debit in debits)
+        )
+        elapsed = time.perf_counter() - started
+
+        async with AsyncSessionLocal() as db:
+            # Deferred credits are still pending here, so count them as well.
+            closing_balance = await db.scalar(
+                select(
+                    models.Wallet.total_balance + models.Wallet.pending_balance
+                ).filter(
+                    models.Wallet.user_id == user_id,
+                    models.Wallet.currency == currency,
+                )
+            )
+    finally:
+        await drop_bench_user(user_id)
+
+    expected = (
+        opening_balance + CREDIT * debits.count(False) - DEBIT * debits.count(True)
+    )
+    latencies = sorted(latencies)
+    return {
+        "shard_count": shard_count,
+        "deferred_credits": deferred_credits,
+        "operations": operations,
+        "concurrency": concurrency,
+        "throughput_ops": round(operations / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "balance_ok": closing_balance == expected,
+    }
+
+
+async def main(args: argparse.Namespace):
+    results = [
+        await run_wallet(
+            shard_count,
+            deferred_credits,
+            args.operations,
+            args.concurrency,
+            args.debit_every,
+            args.currency,
+        )
+        for shard_count, deferred_credits in (
+            (1, False),
+            (args.shards, False),
+            (1, True),
+        )
+    ]
+    await async_engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare a single-row hot wallet with sharded and deferred ones under load."
+    )
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument(
+        "--debit-every",
+        type=int,
+        default=10,
+        help="Every Nth operation is a withdrawal (0 for credits only).",
+    )
+    parser.add_argument("--currency", default="USD")
+    asyncio.run(main(parser.parse_args()))
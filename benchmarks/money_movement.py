@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select
+
+import models
+from database import AsyncSessionLocal, async_engine
+from services import TransactionService, TransferBatcher
+from utils import (
+    TransactionStatus,
+    TransactionType,
+    hash_password,
+    retry_metrics,
+    retry_reason,
+)
+
+OPENING_BALANCE = Decimal("1000")
+
+
+def parse_weights(value: str) -> dict:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition(":")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    if not latencies:
+        return 0.0
+    index = min(len(latencies) - 1, max(0, round(len(latencies) * fraction) - 1))
+    return round(latencies[index] * 1000, 3)
+
+
+class Workload:
+    def __init__(self, args: argparse.Namespace):
+        self.random = random.Random(args.seed)
+        self.operations = parse_weights(args.mix)
+        self.currencies = parse_weights(args.currencies)
+        self.users = []
+        self.emails = {}
+        # Rank r is picked with probability proportional to 1 / r ** zipf, so
+        # a few wallets take most of the traffic (0 means uniform).
+        self.popularity = [1 / rank**args.zipf for rank in range(1, args.users + 1)]
+
+    def pick_user(self, exclude=None):
+        while True:
+            (user_id,) = self.random.choices(self.users, self.popularity)
+            if user_id != exclude:
+                return user_id
+
+    def plan(self, count: int) -> list:
+        plan = []
+        for _ in range(count):
+            (operation,) = self.random.choices(
+                list(self.operations), list(self.operations.values())
+            )
+            (currency,) = self.random.choices(
+                list(self.currencies), list(self.currencies.values())
+            )
+            user_id = self.pick_user()
+            receiver_id = self.pick_user(user_id) if operation == "transfer" else None
+            amount = Decimal(self.random.randint(1, 50))
+            plan.append((operation, user_id, receiver_id, currency, amount))
+        return plan
+
+
+async def seed(workload: Workload, count: int) -> None:
+    # Opening balances are written as deposits, so the ledger invariant holds
+    # from the first operation on.
+    password_hash = hash_password("benchmark")
+    created_at = datetime.now(timezone.utc)
+    users, wallets, ledger = [], [], []
+    for _ in range(count):
+        user_id = uuid4()
+        email = f"load_{uuid4().hex[:12]}@bench.local"
+        users.append(
+            {
+                "id": user_id,
+                "username": f"load_{uuid4().hex[:12]}",
+                "email": email,
+                "password_hash": password_hash,
+                "first_name": "Load",
+                "last_name": "User",
+                "gender": "male",
+            }
+        )
+        for currency in workload.currencies:
+            wallet_id = uuid4()
+            wallets.append(
+                {
+                    "id": wallet_id,
+                    "user_id": user_id,
+                    "currency": currency,
+                    "balance": OPENING_BALANCE,
+                }
+            )
+            ledger.append(
+                {
+                    "id": uuid4(),
+                    "wallet_id": wallet_id,
+                    "amount": OPENING_BALANCE,
+                    "balance_after": OPENING_BALANCE,
+                    "type": TransactionType.DEPOSIT.value,
+                    "status": TransactionStatus.COMPLETED.value,
+                    "description": "Opening balance",
+                    "created_at": created_at,
+                }
+            )
+        workload.users.append(user_id)
+        workload.emails[user_id] = email
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(models.User), users)
+        await db.execute(insert(models.Wallet), wallets)
+        await db.execute(insert(models.Transaction), ledger)
+        await db.commit()
+
+
+async def run_operation(
+    step: tuple,
+    args: argparse.Namespace,
+    workload: Workload,
+    batcher: TransferBatcher,
+    limiter: asyncio.Semaphore,
+    stats: dict,
+) -> None:
+    operation, user_id, receiver_id, currency, amount = step
+    async with limiter:
+        start = time.perf_counter()
+        for attempt in range(args.retries + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    service = TransactionService(db, mode=args.mode)
+                    if operation == "deposit":
+                        await service.deposit(user_id, amount, currency)
+                    elif operation == "withdraw":
+                        await service.withdraw(user_id, amount, currency)
+                    elif batcher.enabled:
+                        await batcher.transfer(
+                            user_id, workload.emails[receiver_id], amount, currency
+                        )
+                    else:
+                        await service.transfer(
+                            user_id, workload.emails[receiver_id], amount, currency
+                        )
+                outcome = "ok"
+                break
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason and attempt < args.retries:
+                    stats["retries"][reason] += 1
+                    continue
+                outcome = (
+                    str(e.status_code)
+                    if isinstance(e, HTTPException)
+                    else type(e).__name__
+                )
+                break
+        stats["latencies"][operation].append(time.perf_counter() - start)
+        stats["outcomes"][operation][outcome] += 1
+
+
+async def check_ledger(workload: Workload) -> dict:
+    async with AsyncSessionLocal() as db:
+        wallet_ids = select(models.Wallet.id).filter(
+            models.Wallet.user_id.in_(workload.users)
+        )
+        balance = await db.scalar(
+            select(func.sum(models.Wallet.total_balance)).filter(
+                models.Wallet.id.in_(wallet_ids)
+            )
+        )
+        ledger = dict(
+            (
+                await db.execute(
+                    select(
+                        models.Transaction.status, func.sum(models.Transaction.amount)
+                    )
+                    .filter(models.Transaction.wallet_id.in_(wallet_ids))
+                    .group_by(models.Transaction.status)
+                )
+            ).all()
+        )
+
+    completed = ledger.get(TransactionStatus.COMPLETED.value, Decimal(0))
+    return {
+        "balance_sum": str(balance),
+        "ledger_sum": str(completed),
+        "pending_sum": str(ledger.get(TransactionStatus.PENDING.value, Decimal(0))),
+        "ok": balance == completed,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace):
+    workload = Workload(args)
+    await seed(workload, args.users)
+    plan = workload.plan(args.operations)
+
+    batcher = TransferBatcher(AsyncSessionLocal, window=args.batch_window)
+    limiter = asyncio.Semaphore(args.concurrency)
+    stats = {
+        "latencies": defaultdict(list),
+        "outcomes": defaultdict(Counter),
+        "retries": Counter(),
+    }
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_operation(step, args, workload, batcher, limiter, stats)
+                for step in plan
+            )
+        )
+        elapsed = time.perf_counter() - started
+        await batcher.close()
+        invariant = await check_ledger(workload)
+    finally:
+        if not args.keep:
+            # One statement, as transfer pairs reference each other across users.
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(models.User).filter(models.User.id.in_(workload.users))
+                )
+                await db.commit()
+        await async_engine.dispose()
+
+    operations = {}
+    for operation, latencies in sorted(stats["latencies"].items()):
+        latencies.sort()
+        operations[operation] = {
+            "count": len(latencies),
+            "outcomes": dict(stats["outcomes"][operation]),
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+        }
+    all_latencies = sorted(
+        latency for latencies in stats["latencies"].values() for latency in latencies
+    )
+
+    result = {
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ops": round(len(plan) / elapsed, 2),
+        "p50_ms": percentile(all_latencies, 0.50),
+        "p95_ms": percentile(all_latencies, 0.95),
+        "p99_ms": percentile(all_latencies, 0.99),
+        "operations": operations,
+        "retries": dict(stats["retries"]),
+        "service_retries": retry_metrics.snapshot(),
+        "ledger_invariant": invariant,
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Drive deposits, withdrawals and transfers over many wallets and "
+        "check the ledger afterwards."
+    )
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument(
+        "--zipf",
+        type=float,
+        default=1.1,
+        help="Wallet popularity skew exponent (0 for uniform).",
+    )
+    parser.add_argument(
+        "--mix",
+        default="deposit:0.3,withdraw:0.2,transfer:0.5",
+        help="Operation weights.",
+    )
+    parser.add_argument(
+        "--currencies", default="USD:0.7,EUR:0.2,EGP:0.1", help="Currency weights."
+    )
+    parser.add_argument("--mode", choices=("atomic", "orm"), default="atomic")
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0,
+        help="Group-commit transfers within this many ms (0 disables).",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Client-side retries per operation on deadlock or serialization "
+        "failures that the services gave up on.",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated users and ledger."
+    )
+    asyncio.run(main(parser.parse_args()))
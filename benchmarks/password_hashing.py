@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from fastapi import HTTPException
+
+from utils import PasswordHasher, hash_password
+
+PASSWORD = "benchmark"
+HEARTBEAT_INTERVAL = 0.005  # in seconds
+
+
+async def heartbeat(interval: float, wakeups: list) -> None:
+    # How late the event loop wakes up is how long other requests would have
+    # been stuck behind a password check.
+    while True:
+        wakeups.append(time.perf_counter())
+        await asyncio.sleep(interval)
+
+
+async def login(
+    hasher: PasswordHasher, hashed: str, limiter: asyncio.Semaphore, stats: dict
+) -> None:
+    async with limiter:
+        started = time.perf_counter()
+        try:
+            await hasher.verify(PASSWORD, hashed)
+        except HTTPException:
+            stats["shed"] += 1
+            return
+        stats["latencies"].append(time.perf_counter() - started)
+
+
+async def run_workers(workers: int, args: argparse.Namespace) -> dict:
+    hashed = hash_password(PASSWORD, rounds=args.rounds)
+    hasher = PasswordHasher(
+        workers=workers, queue_size=args.queue_size, rounds=args.rounds
+    )
+    if hasher.enabled:
+        # Start the worker processes outside the measured run.
+        await asyncio.gather(*(hasher.verify(PASSWORD, hashed) for _ in range(workers)))
+
+    limiter = asyncio.Semaphore(args.concurrency)
+    stats = {"latencies": [], "shed": 0}
+    wakeups = []
+    monitor = asyncio.create_task(heartbeat(HEARTBEAT_INTERVAL, wakeups))
+    await asyncio.sleep(0)
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(login(hasher, hashed, limiter, stats) for _ in range(args.logins))
+        )
+        elapsed = time.perf_counter() - started
+        wakeups.append(time.perf_counter())
+    finally:
+        monitor.cancel()
+        hasher.close()
+
+    latencies = sorted(stats["latencies"])
+    max_stall = max(
+        (
+            later - earlier - HEARTBEAT_INTERVAL
+            for earlier, later in zip(wakeups, wakeups[1:])
+        ),
+        default=0,
+    )
+    throughput = len(latencies) / elapsed
+    return {
+        "workers": workers,
+        "logins": args.logins,
+        "shed": stats["shed"],
+        "throughput_logins": round(throughput, 2),
+        "logins_per_core": round(throughput / max(workers, 1), 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "max_loop_stall_ms": round(max_stall * 1000, 3),
+    }
+
+
+async def main(args: argparse.Namespace):
+    results = [await run_workers(workers, args) for workers in (0, args.workers)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare bcrypt checks on the event loop with the process pool."
+    )
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Checks allowed to wait for a worker before shedding with 429.",
+    )
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import time
+
+from utils import mail_templates
+
+TEMPLATE = "verification_mail.html"
+
+
+def read_and_replace(count: int) -> None:
+    # The previous path: read the file and substitute on every email.
+    path = os.path.join(mail_templates.directory, TEMPLATE)
+    for index in range(count):
+        with open(path, "r") as template:
+            template.read().replace(
+                "{verification_url}", f"https://example.com/verify?token={index}"
+            )
+
+
+def compiled(count: int) -> None:
+    template = mail_templates.get(TEMPLATE)
+    for index in range(count):
+        template.render(
+            {"verification_url": f"https://example.com/verify?token={index}"}
+        )
+
+
+def run(name: str, render, count: int) -> dict:
+    started = time.perf_counter()
+    render(count)
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": name,
+        "renders": count,
+        "renders_per_second": round(count / elapsed),
+        "us_per_render": round(elapsed / count * 1_000_000, 3),
+    }
+
+
+def main(args: argparse.Namespace):
+    # Single process, so the rates are per core.
+    mail_templates.load()
+    results = [
+        run("read_and_replace", read_and_replace, args.renders),
+        run("compiled", compiled, args.renders),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare per-email template reads with the compiled template cache."
+    )
+    parser.add_argument("--renders", type=int, default=100_000)
+    main(parser.parse_args())
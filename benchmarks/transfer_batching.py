@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import delete, func, select
+
+import models
+from benchmarks.deposit_withdraw import create_bench_wallet
+from database import AsyncSessionLocal, async_engine
+from services import TransactionService, TransferBatcher
+
+AMOUNT = Decimal("1")
+
+
+async def run_transfer(
+    batcher: TransferBatcher,
+    sender_id,
+    receiver_email: str,
+    currency: str,
+    limiter: asyncio.Semaphore,
+) -> float:
+    async with limiter:
+        start = time.perf_counter()
+        if batcher.enabled:
+            await batcher.transfer(sender_id, receiver_email, AMOUNT, currency)
+        else:
+            async with AsyncSessionLocal() as db:
+                await TransactionService(db).transfer(
+                    sender_id, receiver_email, AMOUNT, currency
+                )
+        return time.perf_counter() - start
+
+
+async def run_window(
+    window: float,
+    operations: int,
+    concurrency: int,
+    wallets: int,
+    currency: str,
+) -> dict:
+    user_ids = [await create_bench_wallet(currency) for _ in range(wallets)]
+    async with AsyncSessionLocal() as db:
+        emails = dict(
+            (
+                await db.execute(
+                    select(models.User.id, models.User.email).filter(
+                        models.User.id.in_(user_ids)
+                    )
+                )
+            ).all()
+        )
+
+    batcher = TransferBatcher(AsyncSessionLocal, window=window)
+    limiter = asyncio.Semaphore(concurrency)
+    pairs = [random.sample(user_ids, 2) for _ in range(operations)]
+    try:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(
+                run_transfer(batcher, sender_id, emails[receiver_id], currency, limiter)
+                for sender_id, receiver_id in pairs
+            )
+        )
+        elapsed = time.perf_counter() - started
+        await batcher.close()
+
+        async with AsyncSessionLocal() as db:
+            total_balance = await db.scalar(
+                select(func.sum(models.Wallet.balance)).filter(
+                    models.Wallet.user_id.in_(user_ids)
+                )
+            )
+    finally:
+        # One statement, as transfer pairs reference each other across users.
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.User).filter(models.User.id.in_(user_ids)))
+            await db.commit()
+
+    latencies = sorted(latencies)
+    return {
+        "window_ms": window,
+        "operations": operations,
+        "concurrency": concurrency,
+        "throughput_ops": round(operations / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "balance_ok": total_balance == 1_000_000 * wallets,
+    }
+
+
+async def main(args: argparse.Namespace):
+    results = [
+        await run_window(
+            window, args.operations, args.concurrency, args.wallets, args.currency
+        )
+        for window in (0, args.window)
+    ]
+    await async_engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare one commit per transfer with group-committed transfers."
+    )
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--wallets", type=int, default=32)
+    parser.add_argument(
+        "--window", type=float, default=3, help="Group commit window in ms."
+    )
+    parser.add_argument("--currency", default="USD")
+    asyncio.run(main(parser.parse_args()))
@@ -1,17 +1,28 @@
 from contextlib import asynccontextmanager
 from os import getenv
-from typing import Iterator
+from typing import AsyncIterator, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from sqlalchemy import create_engine
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 import models
 import utils
 from models import *
-from utils import PermissionEnum, RoleEnum, hash_password
+from services.permissions import permission_change_notice
+from utils import (
+    PermissionEnum,
+    PgListener,
+    PoolMetrics,
+    ReplicaRouter,
+    RoleEnum,
+    hash_password,
+    hash_token,
+)
 
 load_dotenv()
 
@@ -21,24 +32,97 @@ DATABASE_SERVER_IP = getenv("DATABASE_SERVER_IP", "localhost")
 DATABASE_PORT = getenv("DATABASE_PORT", 5432)
 DATABASE_NAME = getenv("DATABASE_NAME", "fastapi_users")
 
+DATABASE_POOL_SIZE = int(getenv("DATABASE_POOL_SIZE", 10))
+DATABASE_MAX_OVERFLOW = int(getenv("DATABASE_MAX_OVERFLOW", 10))
+DATABASE_POOL_TIMEOUT = float(getenv("DATABASE_POOL_TIMEOUT", 10))  # in seconds
+DATABASE_POOL_RECYCLE = int(getenv("DATABASE_POOL_RECYCLE", 1800))  # in seconds
+DATABASE_POOL_PRE_PING = getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+DATABASE_STATEMENT_TIMEOUT = int(getenv("DATABASE_STATEMENT_TIMEOUT", 15000))  # in ms
+DATABASE_LOCK_TIMEOUT = int(getenv("DATABASE_LOCK_TIMEOUT", 5000))  # in ms
+# "READ COMMITTED", "REPEATABLE READ" or "SERIALIZABLE"; serialization failures
+# under the stricter levels are retried by the transaction services.
+DATABASE_ISOLATION_LEVEL = getenv("DATABASE_ISOLATION_LEVEL", "READ COMMITTED")
+# Comma-separated postgresql:// URIs of read replicas for read-only endpoints.
+DATABASE_REPLICA_URIS = [
+    uri.strip() for uri in getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip()
+]
+
 DATABASE_URI = (
     f"postgresql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}"
     f"@{DATABASE_SERVER_IP}:{DATABASE_PORT}"
     f"/{DATABASE_NAME}"
 )
+ASYNC_DATABASE_URI = DATABASE_URI.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+POOL_OPTIONS = {
+    "pool_size": DATABASE_POOL_SIZE,
+    "max_overflow": DATABASE_MAX_OVERFLOW,
+    "pool_timeout": DATABASE_POOL_TIMEOUT,
+    "pool_recycle": DATABASE_POOL_RECYCLE,
+    "pool_pre_ping": DATABASE_POOL_PRE_PING,
+    "isolation_level": DATABASE_ISOLATION_LEVEL,
+}
+SESSION_SETTINGS = {
+    "statement_timeout": str(DATABASE_STATEMENT_TIMEOUT),
+    "lock_timeout": str(DATABASE_LOCK_TIMEOUT),
+}
+
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
 
-engine = create_engine(DATABASE_URI)
+# The synchronous engine is only used for startup seeding, migrations and
+# Celery tasks; request handlers go through the async engine below.
+engine = create_engine(
+    DATABASE_URI,
+    poolclass=pool_metrics.pool_class(QueuePool),
+    connect_args={
+        "options": " ".join(f"-c {k}={v}" for k, v in SESSION_SETTINGS.items())
+    },
+    **POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URI,
+    poolclass=async_pool_metrics.pool_class(AsyncAdaptedQueuePool),
+    connect_args={"server_settings": SESSION_SETTINGS},
+    **POOL_OPTIONS,
+)
+pool_metrics.instrument(engine)
+async_pool_metrics.instrument(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+replica_engines = [
+    create_async_engine(
+        uri.replace("postgresql://", "postgresql+asyncpg://", 1),
+        connect_args={"server_settings": SESSION_SETTINGS},
+        **POOL_OPTIONS,
+    )
+    for uri in DATABASE_REPLICA_URIS
+]
+replica_router = ReplicaRouter(async_engine, replica_engines)
+
+# One LISTEN connection per process, shared by every in-memory cache.
+pg_listener = PgListener(DATABASE_URI)
+
 # Base.metadata.create_all(engine)
 
 
-def get_db() -> Iterator[Session]:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def client_key(request: Request) -> Optional[str]:
+    authorization = request.headers.get("Authorization")
+    return hash_token(authorization) if authorization else None
+
+
+async def get_read_db(request: Request) -> AsyncIterator[AsyncSession]:
+    # For read-only endpoints: served by a healthy replica unless the client
+    # wrote recently, see the read-your-writes middleware in main.
+    async with replica_router.session(client_key(request)) as db:
         yield db
-    finally:
-        db.close()
 
 
 @asynccontextmanager
@@ -48,6 +132,9 @@ async def database_setup(app: FastAPI):
     setup_role_permissions()
     setup_superuser()
     yield
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
 
 
 def setup_roles():
@@ -55,6 +142,8 @@ def setup_roles():
         for role in RoleEnum:
             db.add(models.Role(role=role))
             try:
+                db.flush()
+                db.execute(permission_change_notice())
                 db.commit()
             except IntegrityError:
                 db.rollback()
@@ -95,6 +184,7 @@ def setup_role_permissions():
             change_roles_permission_id,
             change_permissions_permission_id,
             get_users_permission_id,
+            view_metrics_permission_id,
         ) = [
             (
                 db.query(models.Permission.id)
@@ -116,6 +206,7 @@ def setup_role_permissions():
             change_roles_permission_id,
             change_permissions_permission_id,
             get_users_permission_id,
+            view_metrics_permission_id,
         ]
 
         admin_permissions = [
@@ -127,6 +218,7 @@ def setup_role_permissions():
             remove_support_permission_id,
             change_roles_permission_id,
             get_users_permission_id,
+            view_metrics_permission_id,
         ]
 
         staff_permissions = [
@@ -148,7 +240,10 @@ def setup_role_permissions():
                         permission_id=permission_id,
                     )
                 )
+                # Only new rows notify; running processes reload their matrix.
                 try:
+                    db.flush()
+                    db.execute(permission_change_notice())
                     db.commit()
                 except IntegrityError:
                     db.rollback()
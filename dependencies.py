@@ -1,32 +1,36 @@
 from typing import Callable
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-import models
 import oauth2
 import schemas
-from database import get_db
+from database import AsyncSessionLocal, get_db
+from services import (
+    LedgerBroadcaster,
+    OutboxRelay,
+    PermissionMatrixStore,
+    TransferBatcher,
+)
+from worker import send_emails
+
+permission_matrix = PermissionMatrixStore()
+transfer_batcher = TransferBatcher(AsyncSessionLocal)
+outbox_relay = OutboxRelay(AsyncSessionLocal, {"email": send_emails})
+ledger_broadcaster = LedgerBroadcaster()
 
 
 def check_permission(
     permission: str,
 ) -> Callable:
 
-    def permission_dependency(
+    async def permission_dependency(
         current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
     ) -> bool:
         user_role_ids = current_user.user_roles
-        has_permission = bool(
-            db.query(models.RolePermission)
-            .join(models.Permission)
-            .filter(
-                models.RolePermission.role_id.in_(user_role_ids),
-                models.Permission.permission == permission,
-            )
-            .all()
-        )
+        matrix = await permission_matrix.get(db)
+        has_permission = matrix.allows(user_role_ids, permission)
 
         if not has_permission:
             raise HTTPException(
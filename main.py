@@ -1,11 +1,70 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 
 import database
+import dependencies
+import oauth2
 import routes
+import services
+import utils
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with database.database_setup(app):
+        async with database.AsyncSessionLocal() as db:
+            await dependencies.permission_matrix.load(db)
+            await utils.role_weights.load(db)
+        database.pg_listener.subscribe(
+            services.PERMISSION_MATRIX_CHANNEL,
+            dependencies.permission_matrix.invalidate,
+        )
+        database.pg_listener.subscribe(
+            services.PERMISSION_MATRIX_CHANNEL, utils.role_weights.invalidate
+        )
+        database.pg_listener.subscribe(
+            oauth2.PRINCIPAL_CACHE_CHANNEL, oauth2.discard_principals
+        )
+        database.pg_listener.subscribe(
+            services.REVOCATION_CHANNEL, oauth2.revocation_store.on_revocation
+        )
+        database.pg_listener.subscribe(
+            services.OUTBOX_CHANNEL, dependencies.outbox_relay.wake
+        )
+        database.pg_listener.subscribe(
+            services.LEDGER_CHANNEL, dependencies.ledger_broadcaster.publish
+        )
+        await database.pg_listener.start()
+        await dependencies.outbox_relay.start()
+        await oauth2.revocation_store.start()
+        await database.replica_router.start()
+        yield
+        await database.replica_router.stop()
+        await dependencies.transfer_batcher.close()
+        await dependencies.outbox_relay.stop()
+        await oauth2.revocation_store.stop()
+        await database.pg_listener.stop()
+        utils.password_hasher.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        database.replica_router.pin(database.client_key(request))
+    return response
+
 
-app = FastAPI(lifespan=database.database_setup)
+if database.replica_router.replicas:
+    app.middleware("http")(read_your_writes)
 
 app.include_router(routes.auth_router)
 app.include_router(routes.users_router)
 app.include_router(routes.wallet_router)
 app.include_router(routes.transaction_router)
+app.include_router(routes.internal_router)
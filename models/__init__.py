@@ -2,6 +2,8 @@ from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
+from .job_watermark import JobWatermark
+from .outbox_event import OutboxEvent
 from .permission import Permission
 from .revoked_token import RevokedToken
 from .role import Role
@@ -11,6 +13,8 @@ from .transaction import Transaction
 from .user import User
 from .user_role import UserRole
 from .wallet import Wallet
+from .wallet_shard import WalletShard
+from .wallet_statement import WalletStatement
 
 __all__ = [
     "User",
@@ -22,5 +26,9 @@ __all__ = [
     "Base",
     "Token",
     "Wallet",
+    "WalletShard",
     "Transaction",
+    "OutboxEvent",
+    "WalletStatement",
+    "JobWatermark",
 ]
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, DateTime, String
+
+from models import Base
+
+
+class JobWatermark(Base):
+    __tablename__ = "job_watermark"
+    name = Column(String(50), primary_key=True)
+    # Everything before this point has been processed by the job.
+    position = Column(DateTime(timezone=True), nullable=False)
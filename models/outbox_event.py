@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, DateTime, Identity, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from models import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_event"
+    id = Column(BigInteger, Identity(), primary_key=True)
+    topic = Column(String(50), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
@@ -1,8 +1,17 @@
-from sqlalchemy import Column, String
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, String
 
 from models import Base
 
 
 class RevokedToken(Base):
     __tablename__ = "revoked_token"
-    token = Column(String, nullable=False, primary_key=True)
+    token_hash = Column(String, nullable=False, primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        index=True,
+    )
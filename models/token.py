@@ -9,13 +9,14 @@ from models import Base
 class Token(Base):
     __tablename__ = "token"
     id = Column(Integer, Sequence("token_id_seq"), primary_key=True)
-    token_hash = Column(String, nullable=False)
+    token_hash = Column(String, nullable=False, index=True)
     user_id = Column(
         UUID,
         ForeignKey("user.id", ondelete="CASCADE", onupdate="CASCADE"),
         nullable=False,
+        index=True,
     )
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
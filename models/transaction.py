@@ -1,7 +1,16 @@
 from datetime import datetime, timezone
 from uuid import uuid4
 
-from sqlalchemy import UUID, Column, DateTime, ForeignKey, Numeric, String
+from sqlalchemy import (
+    UUID,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Numeric,
+    String,
+    text,
+)
 from sqlalchemy.orm import relationship
 
 from models import Base
@@ -28,6 +37,7 @@ class Transaction(Base):
         UUID(as_uuid=True),
         ForeignKey("transaction.id", onupdate="CASCADE"),
         nullable=True,
+        index=True,
     )
     description = Column(String, nullable=True)
 
@@ -42,3 +52,15 @@ class Transaction(Base):
 
     wallet = relationship("Wallet", back_populates="transactions")
     related_transaction = relationship("Transaction", remote_side=[id])
+
+    __table_args__ = (
+        Index("ix_transaction_wallet_created_at", "wallet_id", "created_at", "id"),
+        Index("ix_transaction_created_at", "created_at"),
+        Index(
+            "ix_transaction_pending",
+            "wallet_id",
+            "created_at",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
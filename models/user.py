@@ -8,6 +8,7 @@ from sqlalchemy import (
     CheckConstraint,
     Column,
     DateTime,
+    Index,
     Integer,
     Text,
 )
@@ -18,7 +19,10 @@ from models import Base
 
 class User(Base):
     __tablename__ = "user"
-    __table_args__ = (CheckConstraint("gender IN ('male', 'female')"),)
+    __table_args__ = (
+        CheckConstraint("gender IN ('male', 'female')"),
+        Index("ix_user_created_at", "created_at", "id"),
+    )
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     username = Column(VARCHAR(50), nullable=False, unique=True)
     first_name = Column(VARCHAR(50), nullable=False)
@@ -5,13 +5,20 @@ from sqlalchemy import (
     Boolean,
     Column,
     ForeignKey,
+    Integer,
     Numeric,
     String,
     UniqueConstraint,
+    cast,
+    func,
+    select,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 
 from models import Base
+from models.transaction import Transaction
+from models.wallet_shard import WalletShard
+from utils import TransactionStatus
 
 
 class Wallet(Base):
@@ -25,6 +32,32 @@ class Wallet(Base):
     currency = Column(String(3), nullable=False)
     balance = Column(Numeric(18, 4), default=0.0000, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    shard_count = Column(Integer, default=1, server_default="1", nullable=False)
+    deferred_credits = Column(
+        Boolean, default=False, server_default="false", nullable=False
+    )
+
+    # wallet.balance is shard 0; the other shards live in wallet_shard. Both
+    # sums are deferred, so only reads that report balances pay for them.
+    total_balance = column_property(
+        balance
+        + select(func.coalesce(func.sum(WalletShard.balance), 0))
+        .where(WalletShard.wallet_id == id)
+        .correlate_except(WalletShard)
+        .scalar_subquery(),
+        deferred=True,
+    )
+    # Credits accepted for a deferred_credits wallet but not yet settled.
+    pending_balance = column_property(
+        select(cast(func.coalesce(func.sum(Transaction.amount), 0), Numeric(18, 4)))
+        .where(
+            Transaction.wallet_id == id,
+            Transaction.status == TransactionStatus.PENDING.value,
+        )
+        .correlate_except(Transaction)
+        .scalar_subquery(),
+        deferred=True,
+    )
 
     user = relationship("User", back_populates="wallets")
     transactions = relationship("Transaction", back_populates="wallet")
@@ -0,0 +1,18 @@
+from sqlalchemy import UUID, CheckConstraint, Column, ForeignKey, Integer, Numeric
+
+from models import Base
+
+
+class WalletShard(Base):
+    __tablename__ = "wallet_shard"
+    wallet_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("wallet.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    shard_no = Column(Integer, primary_key=True)
+    balance = Column(Numeric(18, 4), default=0.0000, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("balance >= 0", name="wallet_shard_balance_non_negative"),
+    )
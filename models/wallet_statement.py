@@ -0,0 +1,19 @@
+from sqlalchemy import UUID, Column, Date, ForeignKey, Integer, Numeric
+
+from models import Base
+
+
+class WalletStatement(Base):
+    __tablename__ = "wallet_statement"
+    wallet_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("wallet.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    # UTC calendar day covered by the row.
+    day = Column(Date, primary_key=True)
+    opening_balance = Column(Numeric(18, 4), nullable=False)
+    closing_balance = Column(Numeric(18, 4), nullable=False)
+    credits = Column(Numeric(18, 4), nullable=False)
+    debits = Column(Numeric(18, 4), nullable=False)
+    transaction_count = Column(Integer, nullable=False)
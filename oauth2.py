@@ -1,17 +1,20 @@
 from datetime import datetime, timedelta, timezone
 from os import getenv
 from typing import Dict, Literal, Optional
+from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 import schemas
-from database import get_db
-from utils import get_expire_minutes, verify_password
+from database import AsyncSessionLocal, get_db
+from services import create_revocation_store
+from utils import TTLCache, get_expire_minutes, hash_token, password_hasher
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(
@@ -22,16 +25,58 @@ SECRET_KEY = getenv("SECRET_KEY", "auth_app_secret_key")
 ALGORITHM = getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE = int(getenv("ACCESS_TOKEN_EXPIRE", 30))  # in minutes
 REFRESH_TOKEN_EXPIRE = int(getenv("REFRESH_TOKEN_EXPIRE", 7200))  # in minutes
+PRINCIPAL_CACHE_TTL = float(getenv("PRINCIPAL_CACHE_TTL", 30))  # in seconds
+PRINCIPAL_CACHE_SIZE = int(getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_CHANNEL = "principal_cache"
 
+revocation_store = create_revocation_store(AsyncSessionLocal)
 
-def authenticate_user(
-    username: str, password: str, db: Session
+# Validated access-token principals keyed by (token hash, token version).
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def discard_principals(payload: Optional[str] = None) -> None:
+    # Listener callback; no payload means notifications may have been missed.
+    if payload is None:
+        principal_cache.clear()
+        return
+    kind, _, value = payload.partition(":")
+    if kind == "token":
+        principal_cache.discard_where(lambda key, _: key[0] == value)
+    elif kind == "user":
+        principal_cache.discard_where(lambda _, user: str(user.id) == value)
+
+
+async def _broadcast_invalidation(db: AsyncSession, payload: str) -> None:
+    # Dropped here right away, and in every other process once the caller
+    # commits.
+    discard_principals(payload)
+    await db.execute(select(func.pg_notify(PRINCIPAL_CACHE_CHANNEL, payload)))
+
+
+async def invalidate_token(db: AsyncSession, token: Optional[str]) -> None:
+    if token:
+        await _broadcast_invalidation(db, f"token:{hash_token(token)}")
+
+
+async def invalidate_user(db: AsyncSession, user_id: UUID) -> None:
+    await _broadcast_invalidation(db, f"user:{user_id}")
+
+
+async def authenticate_user(
+    username: str, password: str, db: AsyncSession
 ) -> schemas.UserResponse:
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).filter(models.User.username == username))
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"User {username} NOT found")
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Incorrect password")
+
+    # Upgrade hashes made with an older cost factor while the plain password
+    # is at hand.
+    if password_hasher.needs_rehash(user.password_hash):
+        user.password_hash = await password_hasher.hash(password)
+        await db.commit()
     return schemas.UserResponse.model_validate(user)
 
 
@@ -55,9 +100,9 @@ def create_token(
     return jwt.encode(to_encode, SECRET_KEY, ALGORITHM)
 
 
-def verify_token(
+async def verify_token(
     token: str,
-    db: Session,
+    db: AsyncSession,
     expected_type: Literal[
         "access", "refresh", "verification", "password_reset"
     ] = "access",
@@ -69,9 +114,6 @@ def verify_token(
     )
 
     try:
-        if db.query(models.RevokedToken.token).filter_by(token=token).first():
-            raise credentials_exception
-
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         token_type: str = payload.get("type")
@@ -84,20 +126,32 @@ def verify_token(
     except JWTError:
         raise credentials_exception
 
-    user = (
-        db.query(models.User)
-        .filter(models.User.username == token_data.username)
-        .first()
+    cache_key = None
+    if expected_type == "access":
+        cache_key = (hash_token(token), token_version)
+        cached_user = principal_cache.get(cache_key)
+        if cached_user is not None:
+            return cached_user
+
+    if await revocation_store.is_revoked(token, db):
+        raise credentials_exception
+
+    user = await db.scalar(
+        select(models.User).filter(models.User.username == token_data.username)
     )
     if user is None or token_version != user.token_version:
         raise credentials_exception
-    return schemas.UserResponse.model_validate(user)
+
+    principal = schemas.UserResponse.model_validate(user)
+    if cache_key is not None:
+        principal_cache.set(cache_key, principal)
+    return principal
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ) -> schemas.UserResponse:
-    user = verify_token(token, db, expected_type="access")
+    user = await verify_token(token, db, expected_type="access")
     return schemas.UserResponse.model_validate(user)
 
 
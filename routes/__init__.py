@@ -1,4 +1,5 @@
 from .auth import router as auth_router
+from .internal import router as internal_router
 from .transaction import router as transaction_router
 from .users import router as users_router
 from .wallet import router as wallet_router
@@ -8,4 +9,5 @@ __all__ = [
     "auth_router",
     "wallet_router",
     "transaction_router",
+    "internal_router",
 ]
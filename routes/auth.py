@@ -13,14 +13,15 @@ from fastapi import (
 )
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 import oauth2
 import schemas
 import utils
 from database import get_db
-from worker import start_sending_email
+from services import enqueue_event
 
 router = APIRouter(
     prefix="/api/v1/auth",
@@ -29,14 +30,14 @@ router = APIRouter(
 
 
 @router.post("/register/", response_model=schemas.UserResponse)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     user_creation_error_message = "Username already exists"
 
     password = user.password
     role = user.role
     user_data = user.model_dump(exclude={"password", "confirm_password", "role"})
 
-    password_hash = utils.hash_password(password)
+    password_hash = await utils.password_hasher.hash(password)
 
     user_data["password_hash"] = password_hash
     new_db_user = models.User(**user_data)
@@ -44,25 +45,27 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
     db.add(new_db_user)
 
     try:
-        db.flush()
+        await db.flush()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status.HTTP_409_CONFLICT, user_creation_error_message)
 
     if role:
         user_role = models.UserRole(
             user_id=new_db_user.id,
-            role_id=db.query(models.Role).filter(models.Role.role == role).first().id,
+            role_id=await db.scalar(
+                select(models.Role.id).filter(models.Role.role == role)
+            ),
         )
         db.add(user_role)
 
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status.HTTP_409_CONFLICT, user_creation_error_message)
 
-    db.refresh(new_db_user)
+    await db.refresh(new_db_user)
     return new_db_user
 
 
@@ -70,10 +73,12 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
 async def login_for_access_token(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = oauth2.authenticate_user(form_data.username, form_data.password, db)
-    token_version = db.query(models.User.token_version).filter_by(id=user.id).first()[0]
+    user = await oauth2.authenticate_user(form_data.username, form_data.password, db)
+    token_version = await db.scalar(
+        select(models.User.token_version).filter_by(id=user.id)
+    )
     data = {"sub": user.username, "v": token_version}
 
     access_token = oauth2.create_token(data)
@@ -90,20 +95,22 @@ async def login_for_access_token(
 async def refresh_access_token(
     response: Response,
     refresh_token: str = Cookie(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if not refresh_token:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Missing refresh token")
 
-    user = oauth2.verify_token(refresh_token, db, "refresh")
-    token_version = db.query(models.User.token_version).filter_by(id=user.id).first()[0]
+    user = await oauth2.verify_token(refresh_token, db, "refresh")
+    token_version = await db.scalar(
+        select(models.User.token_version).filter_by(id=user.id)
+    )
     data = {"sub": user.username, "v": token_version}
 
     access_token = oauth2.create_token(data)
     new_refresh_token = oauth2.create_token(data, token_type="refresh")
 
     try:
-        db.add(models.RevokedToken(token=refresh_token))
+        await oauth2.revocation_store.revoke(refresh_token, db)
 
         response.set_cookie(
             "refresh_token",
@@ -113,9 +120,9 @@ async def refresh_access_token(
             secure=False,
         )
 
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Token refresh failed"
         )
@@ -129,17 +136,19 @@ async def logout(
     current_user: schemas.UserResponse = Depends(oauth2.get_current_user),
     access_token: str = Header(None),
     refresh_token: str = Cookie(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
 
     if refresh_token:
-        db.add(models.RevokedToken(token=access_token))
-        db.add(models.RevokedToken(token=refresh_token))
+        await oauth2.revocation_store.revoke(access_token, db)
+        await oauth2.revocation_store.revoke(refresh_token, db)
+        # Only this session ends; the user's other tokens stay cached.
+        await oauth2.invalidate_token(db, access_token)
 
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Couldn't log out tokens")
 
     response.set_cookie(
@@ -162,21 +171,21 @@ async def change_password(
     current_user: schemas.UserResponse = Depends(oauth2.get_current_user),
     access_token: str = Header(None),
     refresh_token: str = Cookie(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
 
     if not refresh_token:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Missing refresh token.")
 
     new_password = data.new_password
-    hashed_password = utils.hash_password(new_password)
+    hashed_password = await utils.password_hasher.hash(new_password)
 
     try:
-        user_record = db.query(models.User).filter_by(username=username).first()
+        user_record = await db.scalar(select(models.User).filter_by(username=username))
         user_record.password_hash = hashed_password
         user_record.token_version += 1
-        db.add(models.RevokedToken(token=access_token))
-        db.add(models.RevokedToken(token=refresh_token))
+        await oauth2.revocation_store.revoke(access_token, db)
+        await oauth2.revocation_store.revoke(refresh_token, db)
 
         token_data = {"sub": username, "v": user_record.token_version}
         new_access_token = oauth2.create_token(token_data)
@@ -190,15 +199,16 @@ async def change_password(
             samesite="lax",
         )
 
-        db.commit()
+        await oauth2.invalidate_user(db, user_record.id)
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_409_CONFLICT,
             "Password change failed due to database constraint.",
         )
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR,
             "An unexpected error occurred while changing password.",
@@ -211,13 +221,13 @@ async def change_password(
 async def verify_email(
     request: Request,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if current_user.is_verified:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Email already verified.")
 
-    token_version = (
-        db.query(models.User.token_version).filter_by(id=current_user.id).first()[0]
+    token_version = await db.scalar(
+        select(models.User.token_version).filter_by(id=current_user.id)
     )
 
     expires_delta = timedelta(minutes=utils.get_expire_minutes("verification"))
@@ -239,31 +249,34 @@ async def verify_email(
         )
         db.add(db_token)
 
-        task = start_sending_email.delay(
-            "Email Verification",
-            [current_user.email],
-            verification_url._url,
+        await enqueue_event(
+            db,
+            "email",
+            {
+                "subject": "Email Verification",
+                "recipients": [current_user.email],
+                "template": "verification_mail.html",
+                "context": {"verification_url": verification_url._url},
+            },
         )
 
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Couldn't send verification mail."
         )
 
-    return {"msg": "We sent a link to your email, use it to veify your email.", "task_id": task.id,}
+    return {"msg": "We sent a link to your email, use it to veify your email."}
 
 
 @router.get("/verify-email/")
 async def verify_email(
     token: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    db_token = (
-        db.query(models.Token)
-        .filter(models.Token.token_hash == utils.hash_token(token))
-        .first()
+    db_token = await db.scalar(
+        select(models.Token).filter(models.Token.token_hash == utils.hash_token(token))
     )
 
     if not db_token:
@@ -272,17 +285,18 @@ async def verify_email(
     if datetime.now(timezone.utc) > db_token.expires_at:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "URL expired.")
 
-    user = oauth2.verify_token(token, db, "verification")
+    user = await oauth2.verify_token(token, db, "verification")
 
-    db_user = db.query(models.User).filter(models.User.id == user.id).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.id == user.id))
     db_user.is_verified = True
 
-    db.delete(db_token)
+    await db.delete(db_token)
+    await oauth2.invalidate_user(db, db_user.id)
 
     try:
-        db.commit()
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Couldn't verify your account."
         )
@@ -294,9 +308,9 @@ async def verify_email(
 async def forgot_password(
     request: Request,
     data: schemas.PasswordResetRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(models.User).filter(models.User.email == data.email).first()
+    user = await db.scalar(select(models.User).filter(models.User.email == data.email))
 
     if not user:
         return {"msg": "If the email exists, a reset link has been sent."}
@@ -321,16 +335,23 @@ async def forgot_password(
             + f"?token={reset_token}"
         )
 
-        # NOTE: Make sure you have a 'password_reset_mail.html' template
-        # Or reuse verification template for now
-        start_sending_email.delay(
-            "Password Reset Request",
-            [data.email],
-            reset_url,
+        await enqueue_event(
+            db,
+            "email",
+            {
+                "subject": "Password Reset Request",
+                "recipients": [data.email],
+                "template": "password_reset_mail.html",
+                "context": {
+                    "reset_url": reset_url,
+                    "username": user.username,
+                    "expire_minutes": utils.get_expire_minutes("password_reset"),
+                },
+            },
         )
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         # Log error in production
         pass
 
@@ -340,28 +361,31 @@ async def forgot_password(
 @router.post("/reset-password-confirm", name="reset_password_confirm")
 async def reset_password_confirm(
     data: schemas.PasswordResetConfirm,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
-        user_response = oauth2.verify_token(data.token, db, "password_reset")
+        user_response = await oauth2.verify_token(data.token, db, "password_reset")
     except Exception:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or expired token")
 
     token_hash = utils.hash_token(data.token)
-    db_token = (
-        db.query(models.Token).filter(models.Token.token_hash == token_hash).first()
+    db_token = await db.scalar(
+        select(models.Token).filter(models.Token.token_hash == token_hash)
     )
     if not db_token:
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST, "Token already used or invalid"
         )
 
-    user = db.query(models.User).filter(models.User.id == user_response.id).first()
-    user.password_hash = utils.hash_password(data.new_password)
+    user = await db.scalar(
+        select(models.User).filter(models.User.id == user_response.id)
+    )
+    user.password_hash = await utils.password_hasher.hash(data.new_password)
     user.token_version += 1
 
-    db.delete(db_token)
-    db.commit()
+    await db.delete(db_token)
+    await oauth2.invalidate_user(db, user.id)
+    await db.commit()
 
     return {"msg": "Password updated successfully."}
 
@@ -371,20 +395,22 @@ async def request_email_change(
     request: Request,
     data: schemas.EmailChangeRequest,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # 1. Verify Password first (Optional but Recommended for High Security)
 
-    if db.query(models.User).filter(models.User.email == data.new_email).first():
+    if await db.scalar(
+        select(models.User.id).filter(models.User.email == data.new_email)
+    ):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Email already in use.")
 
     expires_delta = timedelta(minutes=15)
     verification_token = oauth2.create_token(
         data={
             "sub": current_user.username,
-            "v": db.query(models.User.token_version)
-            .filter_by(id=current_user.id)
-            .first()[0],
+            "v": await db.scalar(
+                select(models.User.token_version).filter_by(id=current_user.id)
+            ),
             "new_email": data.new_email,
         },
         expires_delta=expires_delta,
@@ -406,15 +432,25 @@ async def request_email_change(
             + f"?token={verification_token}"
         )
 
-        start_sending_email.delay(
-            "Confirm Email Change",
-            [data.new_email],
-            verify_url,
+        await enqueue_event(
+            db,
+            "email",
+            {
+                "subject": "Confirm Email Change",
+                "recipients": [data.new_email],
+                "template": "email_change_mail.html",
+                "context": {
+                    "confirm_url": verify_url,
+                    "username": current_user.username,
+                    "new_email": data.new_email,
+                    "expire_minutes": int(expires_delta.total_seconds() // 60),
+                },
+            },
         )
 
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(e)
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to send email."
@@ -426,7 +462,7 @@ async def request_email_change(
 @router.get("/confirm-email-change", name="confirm_email_change")
 async def confirm_email_change(
     token: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         payload = oauth2.jwt.decode(
@@ -436,23 +472,26 @@ async def confirm_email_change(
         if not new_email:
             raise Exception("Invalid token payload")
 
-        user_response = oauth2.verify_token(token, db, "verification")
+        user_response = await oauth2.verify_token(token, db, "verification")
     except Exception:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid or expired token")
 
     token_hash = utils.hash_token(token)
-    db_token = (
-        db.query(models.Token).filter(models.Token.token_hash == token_hash).first()
+    db_token = await db.scalar(
+        select(models.Token).filter(models.Token.token_hash == token_hash)
     )
     if not db_token:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Token invalid")
 
-    user = db.query(models.User).filter(models.User.id == user_response.id).first()
+    user = await db.scalar(
+        select(models.User).filter(models.User.id == user_response.id)
+    )
     user.email = new_email
     user.is_verified = True
     user.token_version += 1
 
-    db.delete(db_token)
-    db.commit()
+    await db.delete(db_token)
+    await oauth2.invalidate_user(db, user.id)
+    await db.commit()
 
     return {"msg": "Email changed successfully."}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends
+
+import database
+import dependencies
+import utils
+
+router = APIRouter(prefix="/api/v1/internal", tags=["Internal"])
+
+
+@router.get(
+    "/metrics/pool",
+    dependencies=[
+        Depends(dependencies.check_permission(utils.PermissionEnum.VIEW_METRICS.value))
+    ],
+)
+async def get_pool_metrics():
+    return {
+        "async_engine": database.async_pool_metrics.snapshot(),
+        "sync_engine": database.pool_metrics.snapshot(),
+    }
+
+
+@router.get(
+    "/metrics/retries",
+    dependencies=[
+        Depends(dependencies.check_permission(utils.PermissionEnum.VIEW_METRICS.value))
+    ],
+)
+async def get_retry_metrics():
+    return utils.retry_metrics.snapshot()
+
+
+@router.get(
+    "/metrics/replicas",
+    dependencies=[
+        Depends(dependencies.check_permission(utils.PermissionEnum.VIEW_METRICS.value))
+    ],
+)
+async def get_replica_metrics():
+    return database.replica_router.snapshot()
+
+
+@router.get(
+    "/metrics/ledger-stream",
+    dependencies=[
+        Depends(dependencies.check_permission(utils.PermissionEnum.VIEW_METRICS.value))
+    ],
+)
+async def get_ledger_stream_metrics():
+    return dependencies.ledger_broadcaster.snapshot()
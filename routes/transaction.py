@@ -1,31 +1,65 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from decimal import Decimal
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import oauth2
 import schemas
 from database import get_db
-from services import TransactionService
+from dependencies import transfer_batcher
+from services import IdempotencyStore, TransactionService
+from utils import TransactionType
 
 router = APIRouter(prefix="/api/v1/transaction", tags=["Transactions"])
 
+idempotency_store = IdempotencyStore()
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    user_id: UUID,
+    idempotency_key: Optional[str],
+    transaction_type: TransactionType,
+    amount: Decimal,
+    operation: Callable[[Optional[str]], Awaitable],
+):
+    if not idempotency_key:
+        return await operation(None)
+
+    reference_id = IdempotencyStore.reference_id(user_id, idempotency_key)
+    return await idempotency_store.run(
+        db, reference_id, transaction_type, amount, lambda: operation(reference_id)
+    )
+
 
 @router.post(
     "/deposit",
     response_model=schemas.TransactionResponse,
     status_code=status.HTTP_200_OK,
 )
-def deposit(
+async def deposit(
     deposit_request: schemas.DepositRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     transaction_service = TransactionService(db)
 
-    return transaction_service.deposit(
-        user_id=current_user.id,
-        amount=deposit_request.amount,
-        currency=deposit_request.currency,
-        description=deposit_request.description or "Deposit",
+    return await run_idempotent(
+        db,
+        current_user.id,
+        idempotency_key,
+        TransactionType.DEPOSIT,
+        deposit_request.amount,
+        lambda reference_id: transaction_service.deposit(
+            user_id=current_user.id,
+            amount=deposit_request.amount,
+            currency=deposit_request.currency,
+            description=deposit_request.description or "Deposit",
+            reference_id=reference_id,
+        ),
     )
 
 
@@ -34,18 +68,32 @@ def deposit(
     response_model=schemas.TransactionResponse,
     status_code=status.HTTP_200_OK,
 )
-def transfer(
+async def transfer(
     transfer_request: schemas.TransferRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     transaction_service = TransactionService(db)
+    transfer = (
+        transfer_batcher.transfer
+        if transfer_batcher.enabled
+        else transaction_service.transfer
+    )
 
-    return transaction_service.transfer(
-        sender_id=current_user.id,
-        receiver_email=transfer_request.receiver_email,
-        amount=transfer_request.amount,
-        currency=transfer_request.currency,
+    return await run_idempotent(
+        db,
+        current_user.id,
+        idempotency_key,
+        TransactionType.TRANSFER,
+        transfer_request.amount,
+        lambda reference_id: transfer(
+            sender_id=current_user.id,
+            receiver_email=transfer_request.receiver_email,
+            amount=transfer_request.amount,
+            currency=transfer_request.currency,
+            reference_id=reference_id,
+        ),
     )
 
 
@@ -54,16 +102,45 @@ def transfer(
     response_model=schemas.TransactionResponse,
     status_code=status.HTTP_200_OK,
 )
-def withdraw(
+async def withdraw(
     withdraw_request: schemas.WithdrawRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    transaction_service = TransactionService(db)
+
+    return await run_idempotent(
+        db,
+        current_user.id,
+        idempotency_key,
+        TransactionType.WITHDRAWAL,
+        withdraw_request.amount,
+        lambda reference_id: transaction_service.withdraw(
+            user_id=current_user.id,
+            amount=withdraw_request.amount,
+            currency=withdraw_request.currency,
+            description=withdraw_request.description or "Withdrawal",
+            reference_id=reference_id,
+        ),
+    )
+
+
+@router.post(
+    "/transfer/batch",
+    response_model=schemas.BatchTransferResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def transfer_batch(
+    batch_request: schemas.BatchTransferRequest,
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
 ):
     transaction_service = TransactionService(db)
 
-    return transaction_service.withdraw(
-        user_id=current_user.id,
-        amount=withdraw_request.amount,
-        currency=withdraw_request.currency,
-        description=withdraw_request.description or "Withdrawal",
+    return await transaction_service.transfer_batch(
+        sender_id=current_user.id,
+        currency=batch_request.currency,
+        transfers=batch_request.transfers,
+        mode=batch_request.mode,
     )
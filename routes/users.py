@@ -1,31 +1,78 @@
-from typing import List
+from datetime import datetime
+from os import getenv
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import dependencies
 import models
 import oauth2
 import schemas
 import utils
-from database import get_db
+from database import get_db, get_read_db
+from services import UserService
+
+USERS_PAGE_SIZE = int(getenv("USERS_PAGE_SIZE", 50))
+USERS_MAX_PAGE_SIZE = int(getenv("USERS_MAX_PAGE_SIZE", 500))
 
 router = APIRouter(prefix="/api/v1/users", tags=["Users"])
 
 
+def user_filters(
+    role: Optional[utils.RoleEnum] = None,
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    return {
+        "role": role,
+        "is_active": is_active,
+        "is_verified": is_verified,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+
+
 @router.get(
     "/",
-    response_model=List[schemas.UserResponse],
+    response_model=schemas.UserPage,
     dependencies=[
         Depends(dependencies.check_permission(utils.PermissionEnum.GET_USERS.value))
     ],
 )
-def get_users(
+async def get_users(
+    limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: dict = Depends(user_filters),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return db.query(models.User).all()
+    user_service = UserService(db)
+    return await user_service.get_users(limit=limit, cursor=cursor, **filters)
+
+
+@router.get(
+    "/export",
+    dependencies=[
+        Depends(dependencies.check_permission(utils.PermissionEnum.GET_USERS.value))
+    ],
+)
+async def export_users(
+    filters: dict = Depends(user_filters),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    user_service = UserService(db)
+    return StreamingResponse(
+        await user_service.stream_users(**filters),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="users.ndjson"'},
+    )
 
 
 @router.get(
@@ -38,9 +85,9 @@ def get_users(
 async def get_user(
     username: str,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).filter(models.User.username == username))
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"User '{username}' not found")
     return user
@@ -49,12 +96,10 @@ async def get_user(
 @router.get("/me/", response_model=schemas.UserResponse)
 async def get_user(
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user = (
-        db.query(models.User)
-        .filter(models.User.username == current_user.username)
-        .first()
+    user = await db.scalar(
+        select(models.User).filter(models.User.username == current_user.username)
     )
     if not user:
         raise HTTPException(
@@ -67,12 +112,10 @@ async def get_user(
 async def update_me(
     user: schemas.UserUpdate,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    db_user = (
-        db.query(models.User)
-        .filter(models.User.username == current_user.username)
-        .first()
+    db_user = await db.scalar(
+        select(models.User).filter(models.User.username == current_user.username)
     )
     if not db_user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
@@ -97,13 +140,14 @@ async def update_me(
             db_user.email = user.email
             db_user.is_verified = False
 
-        db.commit()
+        await oauth2.invalidate_user(db, db_user.id)
+        await db.commit()
 
-        db.refresh(db_user)
+        await db.refresh(db_user)
         return db_user
 
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         if "username" in str(e.orig):
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "Username already taken")
         elif "email" in str(e.orig):
@@ -113,7 +157,7 @@ async def update_me(
                 status.HTTP_400_BAD_REQUEST, "Data constraint violation"
             )
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to update user"
         )
@@ -129,32 +173,35 @@ async def update_me(
 async def assign_role(
     user_role: schemas.UserRoleCreate,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(models.User).filter(models.User.id == user_role.user_id).first()
+    user = await db.scalar(
+        select(models.User).filter(models.User.id == user_role.user_id)
+    )
 
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"User not found.")
 
     role_id = user_role.role_id
-    role = db.query(models.Role).filter(models.Role.id == role_id).first()
+    role = await db.scalar(select(models.Role).filter(models.Role.id == role_id))
     if not role:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Role not found.")
 
-    current_weight = utils.get_user_max_weight(current_user.user_roles, db)
+    role_weights = await utils.role_weights.get(db)
+    current_weight = utils.get_user_max_weight(current_user.user_roles, role_weights)
 
     target_role_ids = [r.role_id for r in user.user_role]
-    target_weight = utils.get_user_max_weight(target_role_ids, db)
+    target_weight = utils.get_user_max_weight(target_role_ids, role_weights)
 
     if current_weight <= target_weight:
         raise HTTPException(
             status.HTTP_403_FORBIDDEN, "Not enough privileges to modify this user."
         )
 
-    existing_role = (
-        db.query(models.UserRole)
-        .filter(models.UserRole.user_id == user.id, models.UserRole.role_id == role_id)
-        .first()
+    existing_role = await db.scalar(
+        select(models.UserRole).filter(
+            models.UserRole.user_id == user.id, models.UserRole.role_id == role_id
+        )
     )
 
     if existing_role:
@@ -165,15 +212,16 @@ async def assign_role(
     try:
         new_user_role = models.UserRole(user_id=user.id, role_id=role_id)
         db.add(new_user_role)
-        db.commit()
-        db.refresh(new_user_role)
+        await oauth2.invalidate_user(db, user.id)
+        await db.commit()
+        await db.refresh(new_user_role)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST, "Role is already assigned to the user."
         )
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to assign user role."
         )
@@ -190,32 +238,35 @@ async def assign_role(
 async def revoke_role(
     user_role: schemas.UserRoleCreate,
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(models.User).filter(models.User.id == user_role.user_id).first()
+    user = await db.scalar(
+        select(models.User).filter(models.User.id == user_role.user_id)
+    )
 
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"User not found.")
 
     role_id = user_role.role_id
-    role = db.query(models.Role).filter(models.Role.id == role_id).first()
+    role = await db.scalar(select(models.Role).filter(models.Role.id == role_id))
     if not role:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Role not found.")
 
-    current_weight = utils.get_user_max_weight(current_user.user_roles, db)
+    role_weights = await utils.role_weights.get(db)
+    current_weight = utils.get_user_max_weight(current_user.user_roles, role_weights)
 
     target_role_ids = [r.role_id for r in user.user_role]
-    target_weight = utils.get_user_max_weight(target_role_ids, db)
+    target_weight = utils.get_user_max_weight(target_role_ids, role_weights)
 
     if current_weight <= target_weight:
         raise HTTPException(
             status.HTTP_403_FORBIDDEN, "Not enough privileges to modify this user."
         )
 
-    existing_role = (
-        db.query(models.UserRole)
-        .filter(models.UserRole.user_id == user.id, models.UserRole.role_id == role_id)
-        .first()
+    existing_role = await db.scalar(
+        select(models.UserRole).filter(
+            models.UserRole.user_id == user.id, models.UserRole.role_id == role_id
+        )
     )
 
     if not existing_role:
@@ -224,11 +275,12 @@ async def revoke_role(
         )
 
     try:
-        db.delete(existing_role)
-        db.commit()
+        await db.delete(existing_role)
+        await oauth2.invalidate_user(db, user.id)
+        await db.commit()
         return {"message": f"Role {role_id} successfully revoked from user {user.id}"}
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to revoke user role."
         )
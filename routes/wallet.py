@@ -1,27 +1,51 @@
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
+from os import getenv
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, status, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
 import oauth2
-from database import get_db
-from services import WalletService
+from database import get_db, get_read_db
+from dependencies import ledger_broadcaster
+from services import TransactionService, WalletService
+from utils import TransactionStatus, TransactionType
+
+HISTORY_PAGE_SIZE = int(getenv("HISTORY_PAGE_SIZE", 50))
+HISTORY_MAX_PAGE_SIZE = int(getenv("HISTORY_MAX_PAGE_SIZE", 500))
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 
 router = APIRouter(prefix="/api/v1/wallets", tags=["Wallets"])
 
 
+def history_filters(
+    transaction_type: Optional[TransactionType] = Query(None, alias="type"),
+    transaction_status: Optional[TransactionStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    return {
+        "transaction_type": transaction_type,
+        "transaction_status": transaction_status,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+
+
 @router.post(
     "/",
     response_model=schemas.WalletResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def create_wallet(
+async def create_wallet(
     wallet_data: schemas.WalletCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
 ):
     wallet_service = WalletService(db)
-    return wallet_service.create_wallet(
+    return await wallet_service.create_wallet(
         user_id=current_user.id, wallet_data=wallet_data
     )
 
@@ -31,12 +55,40 @@ def create_wallet(
     response_model=List[schemas.WalletResponse],
     status_code=status.HTTP_200_OK,
 )
-def get_my_wallets(
-    db: Session = Depends(get_db),
+async def get_my_wallets(
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
 ):
     wallet_service = WalletService(db)
-    return wallet_service.get_my_wallets(user_id=current_user.id)
+    return await wallet_service.get_my_wallets(user_id=current_user.id)
+
+
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def stream_wallet_events(
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    wallet_service = WalletService(db)
+    # Subscribed before the wallets are read, so nothing committed in between
+    # is missed; at worst an event repeats what the snapshot already shows.
+    subscription = ledger_broadcaster.subscribe(
+        await wallet_service.get_my_wallet_ids(user_id=current_user.id)
+    )
+    try:
+        wallets = [
+            schemas.WalletResponse.model_validate(wallet).model_dump_json()
+            for wallet in await wallet_service.get_my_wallets(user_id=current_user.id)
+        ]
+    except BaseException:
+        ledger_broadcaster.unsubscribe(subscription)
+        raise
+    # The stream itself needs no database connection.
+    await db.close()
+    return StreamingResponse(
+        ledger_broadcaster.stream(subscription, wallets),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get(
@@ -44,10 +96,113 @@ def get_my_wallets(
     response_model=schemas.WalletResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_wallet(
+async def get_wallet(
+    currency: str,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    wallet_service = WalletService(db)
+    return await wallet_service.get_wallet(
+        user_id=current_user.id, currency=currency, with_balances=True
+    )
+
+
+@router.get(
+    "/{currency}/balance",
+    response_model=schemas.WalletBalanceAt,
+    status_code=status.HTTP_200_OK,
+)
+async def get_wallet_balance_at(
+    currency: str,
+    at: datetime,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    wallet_service = WalletService(db)
+    return await wallet_service.get_balance_at(
+        user_id=current_user.id, currency=currency, at=at
+    )
+
+
+@router.put(
+    "/{currency}/shards",
+    response_model=schemas.WalletResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def set_wallet_shards(
     currency: str,
-    db: Session = Depends(get_db),
+    shards_update: schemas.WalletShardsUpdate,
+    db: AsyncSession = Depends(get_db),
     current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
 ):
     wallet_service = WalletService(db)
-    return wallet_service.get_wallet(user_id=current_user.id, currency=currency)
+    return await wallet_service.set_shard_count(
+        user_id=current_user.id,
+        currency=currency,
+        shard_count=shards_update.shard_count,
+    )
+
+
+@router.put(
+    "/{currency}/settlement",
+    response_model=schemas.WalletResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def set_wallet_settlement(
+    currency: str,
+    settlement_update: schemas.WalletSettlementUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    wallet_service = WalletService(db)
+    return await wallet_service.set_deferred_credits(
+        user_id=current_user.id,
+        currency=currency,
+        deferred_credits=settlement_update.deferred_credits,
+    )
+
+
+@router.get(
+    "/{currency}/transactions",
+    response_model=schemas.TransactionPage,
+    status_code=status.HTTP_200_OK,
+)
+async def get_wallet_transactions(
+    currency: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: dict = Depends(history_filters),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    transaction_service = TransactionService(db)
+    return await transaction_service.get_history(
+        user_id=current_user.id,
+        currency=currency,
+        limit=limit,
+        cursor=cursor,
+        **filters,
+    )
+
+
+@router.get("/{currency}/transactions/export", status_code=status.HTTP_200_OK)
+async def export_wallet_transactions(
+    currency: str,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    filters: dict = Depends(history_filters),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(oauth2.get_current_active_user),
+):
+    transaction_service = TransactionService(db)
+    rows = await transaction_service.stream_history(
+        user_id=current_user.id,
+        currency=currency,
+        export_format=export_format,
+        **filters,
+    )
+    filename = f"{currency.upper()}-transactions.{export_format}"
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
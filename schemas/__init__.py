@@ -1,8 +1,13 @@
 from .role import RoleResponse
 from .token import Token, TokenData
 from .transaction import (
+    BatchTransferItem,
+    BatchTransferRequest,
+    BatchTransferResponse,
+    BatchTransferResult,
     DepositRequest,
     TransactionBase,
+    TransactionPage,
     TransactionResponse,
     TransferRequest,
     WithdrawRequest,
@@ -14,16 +19,24 @@ from .user import (
     ChangePasswordRequest,
     User,
     UserCreate,
+    UserPage,
     UserResponse,
     UserUpdate,
 )
 from .user_role import UserRoleCreate, UserRoleResponse
-from .wallet import WalletCreate, WalletResponse
+from .wallet import (
+    WalletBalanceAt,
+    WalletCreate,
+    WalletResponse,
+    WalletSettlementUpdate,
+    WalletShardsUpdate,
+)
 
 __all__ = [
     "User",
     "UserCreate",
     "UserResponse",
+    "UserPage",
     "UserUpdate",
     "PasswordResetRequest",
     "PasswordResetConfirm",
@@ -35,9 +48,17 @@ __all__ = [
     "UserRoleResponse",
     "WalletCreate",
     "WalletResponse",
+    "WalletBalanceAt",
+    "WalletShardsUpdate",
+    "WalletSettlementUpdate",
     "TransactionBase",
     "TransactionResponse",
+    "TransactionPage",
     "DepositRequest",
     "TransferRequest",
+    "BatchTransferItem",
+    "BatchTransferRequest",
+    "BatchTransferResult",
+    "BatchTransferResponse",
     "WithdrawRequest",
 ]
@@ -1,6 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -37,3 +37,33 @@ class TransactionResponse(BaseModel):
     description: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class BatchTransferItem(TransactionBase):
+    receiver_email: str
+
+
+class BatchTransferRequest(BaseModel):
+    currency: str
+    mode: Literal["atomic", "partial"] = "atomic"
+    transfers: List[BatchTransferItem] = Field(..., min_length=1)
+
+
+class BatchTransferResult(BaseModel):
+    index: int
+    receiver_email: str
+    amount: Decimal
+    transaction: Optional[TransactionResponse] = None
+    error: Optional[str] = None
+
+
+class BatchTransferResponse(BaseModel):
+    mode: Literal["atomic", "partial"]
+    completed: int
+    failed: int
+    results: List[BatchTransferResult]
+
+
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
@@ -75,10 +75,15 @@ class UserResponse(User):
     @classmethod
     def extract_roles_ids(cls, v):
         if isinstance(v, list):
-            return [user_role.role_id for user_role in v]
+            return [getattr(user_role, "role_id", user_role) for user_role in v]
         return v
 
 
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
 class ChangePasswordRequest(BaseModel):
     old_password: str = Field(min_length=8, max_length=16)
     new_password: str = Field(min_length=8, max_length=16)
@@ -1,7 +1,8 @@
+from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, computed_field
 
 import utils
 
@@ -11,13 +12,44 @@ class Wallet(BaseModel):
     user_id: UUID
     currency: utils.CurrencyEnum
     is_active: bool
-    balance: Decimal
+    balance: Decimal = Field(validation_alias=AliasChoices("total_balance", "balance"))
+    pending_balance: Decimal = Decimal(0)
+    shard_count: int = 1
+    deferred_credits: bool = False
+
+    @computed_field
+    @property
+    def settled_balance(self) -> Decimal:
+        return self.balance
+
+    @computed_field
+    @property
+    def available_balance(self) -> Decimal:
+        # Debits only draw on settled money; pending credits become
+        # spendable once they settle.
+        return self.balance
 
 
 class WalletCreate(BaseModel):
     user_id: UUID
     currency: utils.CurrencyEnum
+    shard_count: int = Field(1, ge=1)
+    deferred_credits: bool = False
+
+
+class WalletShardsUpdate(BaseModel):
+    shard_count: int = Field(..., ge=1)
+
+
+class WalletSettlementUpdate(BaseModel):
+    deferred_credits: bool
 
 
 class WalletResponse(Wallet):
     model_config = ConfigDict(from_attributes=True)
+
+
+class WalletBalanceAt(BaseModel):
+    currency: utils.CurrencyEnum
+    at: datetime
+    balance: Decimal
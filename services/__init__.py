@@ -1,7 +1,56 @@
 from .wallet import WalletService
-from .transaction import TransactionService
+from .ledger import (
+    LEDGER_CHANNEL,
+    LedgerBroadcaster,
+    LedgerSubscription,
+    ledger_event,
+)
+from .user import UserService
+from .transaction import GroupedTransfer, TransactionService
+from .transfer_batcher import TransferBatcher
+from .permissions import (
+    PERMISSION_MATRIX_CHANNEL,
+    PermissionMatrix,
+    PermissionMatrixStore,
+    permission_change_notice,
+)
+from .idempotency import IdempotencyStore
+from .outbox import OUTBOX_CHANNEL, OutboxRelay, enqueue_event
+from .settlement import settle_pending_credits, settle_wallet
+from .statements import rollup_day, rollup_statements
+from .revocation import (
+    REVOCATION_CHANNEL,
+    DatabaseRevocationBackend,
+    RedisRevocationBackend,
+    TokenRevocationStore,
+    create_revocation_store,
+)
 
 __all__ = [
     "WalletService",
+    "LedgerBroadcaster",
+    "LedgerSubscription",
+    "LEDGER_CHANNEL",
+    "ledger_event",
+    "UserService",
     "TransactionService",
+    "GroupedTransfer",
+    "TransferBatcher",
+    "IdempotencyStore",
+    "OutboxRelay",
+    "OUTBOX_CHANNEL",
+    "enqueue_event",
+    "settle_pending_credits",
+    "settle_wallet",
+    "rollup_statements",
+    "rollup_day",
+    "TokenRevocationStore",
+    "DatabaseRevocationBackend",
+    "RedisRevocationBackend",
+    "REVOCATION_CHANNEL",
+    "create_revocation_store",
+    "PermissionMatrix",
+    "PermissionMatrixStore",
+    "PERMISSION_MATRIX_CHANNEL",
+    "permission_change_notice",
 ]
@@ -0,0 +1,113 @@
+import asyncio
+from decimal import Decimal
+from os import getenv
+from typing import Awaitable, Callable, Dict, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from models import Transaction
+from utils import TTLCache, TransactionType
+
+IDEMPOTENCY_CACHE_SIZE = int(getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+IDEMPOTENCY_CACHE_TTL = float(getenv("IDEMPOTENCY_CACHE_TTL", 86400))  # in seconds
+
+
+class IdempotencyStore:
+    def __init__(
+        self, maxsize: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_CACHE_TTL
+    ):
+        # Recent responses keyed by reference_id; the unique reference_id
+        # column stays the source of truth across processes and restarts.
+        self.responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def reference_id(user_id: UUID, key: str) -> str:
+        return f"{user_id}:{key}"
+
+    async def run(
+        self,
+        db: AsyncSession,
+        reference_id: str,
+        transaction_type: TransactionType,
+        amount: Decimal,
+        operation: Callable[[], Awaitable[Transaction]],
+    ) -> schemas.TransactionResponse:
+        while True:
+            response = self.responses.get(reference_id)
+            if response is not None:
+                break
+
+            inflight = self._inflight.get(reference_id)
+            if inflight is None:
+                response = await self._run_once(db, reference_id, operation)
+                break
+
+            # Duplicates arriving while the first request is still running
+            # wait for its outcome, including its error.
+            try:
+                response = await asyncio.shield(inflight)
+                break
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+
+        # The stored row is the request's fingerprint: a replay must be the
+        # same operation for the same amount.
+        if response.type != transaction_type or abs(response.amount) != amount:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        return response
+
+    async def _run_once(
+        self,
+        db: AsyncSession,
+        reference_id: str,
+        operation: Callable[[], Awaitable[Transaction]],
+    ) -> schemas.TransactionResponse:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[reference_id] = future
+        try:
+            response = await self._lookup(db, reference_id)
+            if response is None:
+                try:
+                    response = schemas.TransactionResponse.model_validate(
+                        await operation()
+                    )
+                except Exception:
+                    # Another process may have committed the same key first;
+                    # the unique constraint rolled this attempt back.
+                    await db.rollback()
+                    response = await self._lookup(db, reference_id)
+                    if response is None:
+                        raise
+            self.responses.set(reference_id, response)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Marks the exception as retrieved when nobody else is waiting.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(reference_id, None)
+
+    @staticmethod
+    async def _lookup(
+        db: AsyncSession, reference_id: str
+    ) -> Optional[schemas.TransactionResponse]:
+        transaction = await db.scalar(
+            select(Transaction).filter(Transaction.reference_id == reference_id)
+        )
+        if transaction is None:
+            return None
+        return schemas.TransactionResponse.model_validate(transaction)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from os import getenv
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import String, cast, func
+
+from models import Transaction
+
+LEDGER_CHANNEL = "ledger"
+LEDGER_STREAM_QUEUE_SIZE = int(getenv("LEDGER_STREAM_QUEUE_SIZE", 100))
+LEDGER_STREAM_HEARTBEAT = float(getenv("LEDGER_STREAM_HEARTBEAT", 15))  # in seconds
+
+# Tells a client its stream has a gap and it should reload its wallets.
+RESYNC = ("resync", "{}")
+
+
+def ledger_event():
+    # Meant for the RETURNING clause of the statement writing the ledger row:
+    # Postgres holds the notification until that transaction commits and
+    # drops it on rollback, so subscribers only ever see committed rows.
+    return func.pg_notify(
+        LEDGER_CHANNEL,
+        cast(
+            func.json_build_object(
+                "id",
+                Transaction.id,
+                "wallet_id",
+                Transaction.wallet_id,
+                "amount",
+                Transaction.amount,
+                "balance_after",
+                Transaction.balance_after,
+                "type",
+                Transaction.type,
+                "status",
+                Transaction.status,
+                "created_at",
+                Transaction.created_at,
+            ),
+            String,
+        ),
+    ).label("ledger_event")
+
+
+class LedgerSubscription:
+    def __init__(self, wallet_ids: Iterable[UUID], queue_size: int):
+        self.wallet_ids = frozenset(str(wallet_id) for wallet_id in wallet_ids)
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    def push(self, event: Tuple[str, str]) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow reader never holds up the listener or other subscribers;
+            # its backlog is dropped and it is told to resync instead.
+            self.resync()
+
+    def resync(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(RESYNC)
+
+    async def get(self) -> Tuple[str, str]:
+        return await self._queue.get()
+
+
+class LedgerBroadcaster:
+    def __init__(
+        self,
+        queue_size: int = LEDGER_STREAM_QUEUE_SIZE,
+        heartbeat: float = LEDGER_STREAM_HEARTBEAT,
+    ):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers: Dict[str, Set[LedgerSubscription]] = {}
+
+    def subscribe(self, wallet_ids: Iterable[UUID]) -> LedgerSubscription:
+        subscription = LedgerSubscription(wallet_ids, self.queue_size)
+        for wallet_id in subscription.wallet_ids:
+            self._subscribers.setdefault(wallet_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LedgerSubscription) -> None:
+        for wallet_id in subscription.wallet_ids:
+            subscribers = self._subscribers.get(wallet_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[wallet_id]
+
+    def publish(self, payload: Optional[str]) -> None:
+        if payload is None:
+            # The listener (re)connected and may have missed notifications.
+            for subscription in set().union(*self._subscribers.values()):
+                subscription.resync()
+            return
+        wallet_id = json.loads(payload)["wallet_id"]
+        for subscription in self._subscribers.get(wallet_id, ()):
+            subscription.push(("transaction", payload))
+
+    async def stream(
+        self, subscription: LedgerSubscription, wallets: Iterable[str]
+    ) -> AsyncIterator[str]:
+        # Server-sent events: the current wallets first, then every committed
+        # ledger row of those wallets, with a comment line as keep-alive.
+        try:
+            for wallet in wallets:
+                yield f"event: wallet\ndata: {wallet}\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscription.get(), self.heartbeat
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def snapshot(self) -> dict:
+        return {
+            "subscribers": len(set().union(*self._subscribers.values())),
+            "wallets": len(self._subscribers),
+        }
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import defaultdict
+from os import getenv
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import OutboxEvent
+
+OUTBOX_CHANNEL = "outbox"
+OUTBOX_BATCH_SIZE = int(getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_POLL_INTERVAL = float(getenv("OUTBOX_POLL_INTERVAL", 5))  # in seconds
+
+# Takes the payloads of one topic from a batch; raising leaves them queued.
+Transport = Callable[[List[dict]], object]
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_event(db: AsyncSession, topic: str, payload: dict) -> None:
+    # Part of the caller's transaction: the event exists only if it commits,
+    # and the NOTIFY, sent by the same statement, is delivered on commit.
+    await db.execute(
+        insert(OutboxEvent)
+        .values(topic=topic, payload=payload)
+        .returning(func.pg_notify(OUTBOX_CHANNEL, topic))
+    )
+
+
+class OutboxRelay:
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        transports: Optional[Dict[str, Transport]] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.transports: Dict[str, Transport] = dict(transports or {})
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, topic: str, transport: Transport) -> None:
+        self.transports[topic] = transport
+
+    def wake(self, payload: Optional[str] = None) -> None:
+        self._wakeup.set()
+
+    async def drain(self) -> int:
+        relayed = 0
+        while True:
+            async with self.session_factory() as db:
+                # SKIP LOCKED lets every process run a relay without two of
+                # them picking up the same events.
+                events = (
+                    await db.scalars(
+                        select(OutboxEvent)
+                        .filter(OutboxEvent.topic.in_(self.transports))
+                        .order_by(OutboxEvent.id)
+                        .limit(self.batch_size)
+                        .with_for_update(skip_locked=True)
+                    )
+                ).all()
+                if not events:
+                    return relayed
+
+                payloads = defaultdict(list)
+                for event in events:
+                    payloads[event.topic].append(event.payload)
+                for topic, batch in payloads.items():
+                    # Transports such as Celery's delay() block on the broker.
+                    await asyncio.to_thread(self.transports[topic], batch)
+
+                # Events are removed only once handed over; a crash before the
+                # commit means they are sent again (at-least-once).
+                await db.execute(
+                    delete(OutboxEvent).filter(
+                        OutboxEvent.id.in_([event.id for event in events])
+                    )
+                )
+                await db.commit()
+
+            relayed += len(events)
+            if len(events) < self.batch_size:
+                return relayed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except Exception:
+                # The events stay in the table for the next wakeup or poll.
+                logger.exception("Outbox relay failed to drain events")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,65 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Permission, RolePermission
+from utils import PermissionEnum
+
+PERMISSION_BITS = {
+    permission: 1 << index for index, permission in enumerate(PermissionEnum)
+}
+PERMISSION_MATRIX_CHANNEL = "permission_matrix"
+
+
+@dataclass(frozen=True)
+class PermissionMatrix:
+    role_bits: Mapping[int, int] = field(default_factory=dict)
+
+    def allows(self, role_ids: Iterable[int], permission: PermissionEnum) -> bool:
+        bit = PERMISSION_BITS[PermissionEnum(permission)]
+        return any(self.role_bits.get(role_id, 0) & bit for role_id in role_ids)
+
+
+class PermissionMatrixStore:
+    def __init__(self):
+        self._matrix: Optional[PermissionMatrix] = None
+
+    @property
+    def matrix(self) -> Optional[PermissionMatrix]:
+        return self._matrix
+
+    async def load(self, db: AsyncSession) -> PermissionMatrix:
+        rows = (
+            await db.execute(
+                select(RolePermission.role_id, Permission.permission).join(
+                    Permission, RolePermission.permission_id == Permission.id
+                )
+            )
+        ).all()
+
+        role_bits = {}
+        for role_id, permission in rows:
+            if permission in PermissionEnum._value2member_map_:
+                bit = PERMISSION_BITS[PermissionEnum(permission)]
+                role_bits[role_id] = role_bits.get(role_id, 0) | bit
+
+        self._matrix = PermissionMatrix(role_bits=MappingProxyType(role_bits))
+        return self._matrix
+
+    async def get(self, db: AsyncSession) -> PermissionMatrix:
+        matrix = self._matrix
+        if matrix is None:
+            matrix = await self.load(db)
+        return matrix
+
+    def invalidate(self, payload: Optional[str] = None) -> None:
+        self._matrix = None
+
+
+def permission_change_notice():
+    # Executed in the transaction that edits roles or role permissions; every
+    # process' listener drops its matrix and role weights once it commits.
+    return text(f"NOTIFY {PERMISSION_MATRIX_CHANNEL}")
@@ -0,0 +1,238 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from os import getenv
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from jose import JWTError, jwt
+from redis import asyncio as aioredis
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import RevokedToken
+from utils import BloomFilter, hash_token
+
+TOKEN_REVOCATION_BACKEND = getenv("TOKEN_REVOCATION_BACKEND", "database")
+TOKEN_REVOCATION_REDIS_URL = getenv(
+    "TOKEN_REVOCATION_REDIS_URL", "redis://localhost:6379/1"
+)
+TOKEN_REVOCATION_CAPACITY = int(getenv("TOKEN_REVOCATION_CAPACITY", 100000))
+TOKEN_REVOCATION_SYNC_INTERVAL = float(
+    getenv("TOKEN_REVOCATION_SYNC_INTERVAL", 2)
+)  # in seconds
+REFRESH_TOKEN_EXPIRE = int(getenv("REFRESH_TOKEN_EXPIRE", 7200))  # in minutes
+REVOCATION_CHANNEL = "token_revocation"
+
+# Revocations committed slightly out of order are picked up by re-reading a
+# short window behind the last watermark.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def token_expiry(token: str) -> datetime:
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        exp = None
+
+    if exp is None:
+        return datetime.now(timezone.utc) + timedelta(minutes=REFRESH_TOKEN_EXPIRE)
+    return datetime.fromtimestamp(exp, timezone.utc)
+
+
+class RevocationBackend(Protocol):
+    async def add(
+        self, db: AsyncSession, token_hash: str, expires_at: datetime
+    ) -> None: ...
+
+    async def contains(self, db: AsyncSession, token_hash: str) -> bool: ...
+
+    async def revoked_since(
+        self, db: AsyncSession, since: Optional[datetime]
+    ) -> List[Tuple[str, datetime]]: ...
+
+
+class DatabaseRevocationBackend:
+    async def add(self, db: AsyncSession, token_hash: str, expires_at: datetime):
+        # Written in the caller's transaction; the route commits it.
+        await db.execute(
+            insert(RevokedToken)
+            .values(
+                token_hash=token_hash,
+                expires_at=expires_at,
+                revoked_at=datetime.now(timezone.utc),
+            )
+            .on_conflict_do_nothing(index_elements=[RevokedToken.token_hash])
+        )
+
+    async def contains(self, db: AsyncSession, token_hash: str) -> bool:
+        return bool(
+            await db.scalar(
+                select(RevokedToken.token_hash).filter(
+                    RevokedToken.token_hash == token_hash,
+                    RevokedToken.expires_at > datetime.now(timezone.utc),
+                )
+            )
+        )
+
+    async def revoked_since(
+        self, db: AsyncSession, since: Optional[datetime]
+    ) -> List[Tuple[str, datetime]]:
+        query = select(RevokedToken.token_hash, RevokedToken.revoked_at).filter(
+            RevokedToken.expires_at > datetime.now(timezone.utc)
+        )
+        if since is not None:
+            query = query.filter(RevokedToken.revoked_at > since - SYNC_OVERLAP)
+        return [tuple(row) for row in (await db.execute(query)).all()]
+
+
+class RedisRevocationBackend:
+    def __init__(self, client: aioredis.Redis, key: str = "revoked_tokens"):
+        self.client = client
+        self.key = key
+        self.log_key = f"{key}:log"
+
+    async def add(self, db: AsyncSession, token_hash: str, expires_at: datetime):
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.key, {token_hash: expires_at.timestamp()})
+            pipe.zadd(self.log_key, {token_hash: now})
+            pipe.zremrangebyscore(self.key, "-inf", now)
+            pipe.zremrangebyscore(self.log_key, "-inf", now - REFRESH_TOKEN_EXPIRE * 60)
+            # No token outlives the refresh lifetime, so both sets can lapse
+            # once nothing has been revoked for that long.
+            pipe.expire(self.key, REFRESH_TOKEN_EXPIRE * 60)
+            pipe.expire(self.log_key, REFRESH_TOKEN_EXPIRE * 60)
+            await pipe.execute()
+
+    async def contains(self, db: AsyncSession, token_hash: str) -> bool:
+        expires_at = await self.client.zscore(self.key, token_hash)
+        return expires_at is not None and expires_at > time.time()
+
+    async def revoked_since(
+        self, db: AsyncSession, since: Optional[datetime]
+    ) -> List[Tuple[str, datetime]]:
+        minimum = "-inf" if since is None else (since - SYNC_OVERLAP).timestamp()
+        members = await self.client.zrangebyscore(
+            self.log_key, minimum, "+inf", withscores=True
+        )
+        return [
+            (
+                member.decode() if isinstance(member, bytes) else member,
+                datetime.fromtimestamp(score, timezone.utc),
+            )
+            for member, score in members
+        ]
+
+
+class TokenRevocationStore:
+    def __init__(
+        self,
+        backend: RevocationBackend,
+        session_factory: Callable[[], AsyncSession],
+        capacity: int = TOKEN_REVOCATION_CAPACITY,
+        sync_interval: float = TOKEN_REVOCATION_SYNC_INTERVAL,
+    ):
+        self.backend = backend
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.sync_interval = sync_interval
+        self.bloom = BloomFilter(capacity)
+        self.loaded = False
+        self._watermark: Optional[datetime] = None
+        # Hashes inside the overlap window, which every sync reads again.
+        self._recent: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def revoke(self, token: Optional[str], db: AsyncSession) -> None:
+        if not token:
+            return
+        token_hash = hash_token(token)
+        await self.backend.add(db, token_hash, token_expiry(token))
+        self._remember(token_hash, datetime.now(timezone.utc))
+        # Delivered to every other process once the caller commits.
+        await db.execute(select(func.pg_notify(REVOCATION_CHANNEL, token_hash)))
+
+    def on_revocation(self, payload: Optional[str]) -> None:
+        # Listener callback; anything missed while disconnected is picked up
+        # by the next sync.
+        if payload is not None:
+            self._remember(payload, datetime.now(timezone.utc))
+
+    async def is_revoked(self, token: str, db: AsyncSession) -> bool:
+        token_hash = hash_token(token)
+        # Until the filter has been loaded it cannot answer negatives.
+        if self.loaded and token_hash not in self.bloom:
+            return False
+        return await self.backend.contains(db, token_hash)
+
+    async def load(self, db: AsyncSession) -> None:
+        revoked = await self.backend.revoked_since(db, None)
+        bloom = BloomFilter(max(self.capacity, len(revoked) * 2))
+        for token_hash, _ in revoked:
+            bloom.add(token_hash)
+
+        self.bloom = bloom
+        self._watermark = max(
+            (revoked_at for _, revoked_at in revoked),
+            default=datetime.now(timezone.utc),
+        )
+        self._recent = dict(revoked)
+        self._forget_old()
+        self.loaded = True
+
+    async def sync(self, db: AsyncSession) -> None:
+        if not self.loaded or len(self.bloom) > self.bloom.capacity:
+            # Rebuilding drops expired hashes, which a Bloom filter cannot delete.
+            await self.load(db)
+            return
+
+        revoked = await self.backend.revoked_since(db, self._watermark)
+        for token_hash, revoked_at in revoked:
+            self._remember(token_hash, revoked_at)
+            self._watermark = max(self._watermark, revoked_at)
+        self._forget_old()
+
+    def _remember(self, token_hash: str, revoked_at: datetime) -> None:
+        # Re-adding would inflate the count and force early reloads.
+        if token_hash not in self._recent:
+            self.bloom.add(token_hash)
+            self._recent[token_hash] = revoked_at
+
+    def _forget_old(self) -> None:
+        horizon = self._watermark - SYNC_OVERLAP
+        self._recent = {
+            token_hash: revoked_at
+            for token_hash, revoked_at in self._recent.items()
+            if revoked_at > horizon
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                async with self.session_factory() as db:
+                    await self.sync(db)
+            except Exception:
+                # Keep answering from the backend until the next sync succeeds.
+                self.loaded = False
+
+    async def start(self) -> None:
+        async with self.session_factory() as db:
+            await self.load(db)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def create_revocation_store(
+    session_factory: Callable[[], AsyncSession],
+) -> TokenRevocationStore:
+    if TOKEN_REVOCATION_BACKEND == "redis":
+        backend = RedisRevocationBackend(aioredis.from_url(TOKEN_REVOCATION_REDIS_URL))
+    else:
+        backend = DatabaseRevocationBackend()
+    return TokenRevocationStore(backend, session_factory)
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from os import getenv
+from uuid import UUID
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.orm import Session
+
+from models import Transaction, Wallet
+from services import ledger_event
+from utils import TransactionStatus
+
+CREDIT_SETTLEMENT_BATCH_SIZE = int(getenv("CREDIT_SETTLEMENT_BATCH_SIZE", 1000))
+CREDIT_SETTLEMENT_WALLETS = int(getenv("CREDIT_SETTLEMENT_WALLETS", 100))
+
+
+def settle_pending_credits(
+    db: Session,
+    batch_size: int = CREDIT_SETTLEMENT_BATCH_SIZE,
+    wallet_limit: int = CREDIT_SETTLEMENT_WALLETS,
+) -> int:
+    wallet_ids = db.scalars(
+        select(Transaction.wallet_id)
+        .filter(Transaction.status == TransactionStatus.PENDING.value)
+        .distinct()
+        .limit(wallet_limit)
+    ).all()
+
+    settled = 0
+    for wallet_id in wallet_ids:
+        settled += settle_wallet(db, wallet_id, batch_size)
+        db.commit()
+    return settled
+
+
+def settle_wallet(db: Session, wallet_id: UUID, batch_size: int) -> int:
+    # Wallets busy with a debit are picked up on the next run instead of
+    # making the aggregator wait on their row lock.
+    opening_balance = db.scalar(
+        select(Wallet.total_balance)
+        .filter(Wallet.id == wallet_id)
+        .with_for_update(skip_locked=True)
+    )
+    if opening_balance is None:
+        return 0
+
+    # Holding the wallet lock makes this the only writer of the wallet's
+    # pending rows, so they can be read without FOR UPDATE.
+    pending = (
+        select(
+            Transaction.id,
+            func.sum(Transaction.amount)
+            .over(order_by=(Transaction.created_at, Transaction.id))
+            .label("running_total"),
+        )
+        .filter(
+            Transaction.wallet_id == wallet_id,
+            Transaction.status == TransactionStatus.PENDING.value,
+        )
+        .order_by(Transaction.created_at, Transaction.id)
+        .limit(batch_size)
+        .cte("pending")
+    )
+    settled = (
+        update(Transaction)
+        .filter(Transaction.id == pending.c.id)
+        .values(
+            status=TransactionStatus.COMPLETED.value,
+            balance_after=literal(opening_balance) + pending.c.running_total,
+            updated_at=datetime.now(timezone.utc),
+        )
+        .returning(Transaction.amount, ledger_event())
+        .cte("settled")
+    )
+    credited = db.execute(
+        update(Wallet)
+        .filter(Wallet.id == wallet_id)
+        .values(
+            balance=Wallet.balance
+            + select(func.coalesce(func.sum(settled.c.amount), 0)).scalar_subquery()
+        )
+        .returning(select(func.count()).select_from(settled).scalar_subquery())
+        .add_cte(pending)
+        .add_cte(settled)
+    ).scalar()
+    return credited or 0
@@ -0,0 +1,132 @@
+from datetime import date, datetime, time, timedelta, timezone
+from os import getenv
+
+from sqlalchemy import Date, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models import JobWatermark, Transaction, WalletStatement
+from utils import TransactionStatus
+
+STATEMENT_WATERMARK = "wallet_statements"
+STATEMENT_CLOSE_DELAY = float(getenv("STATEMENT_CLOSE_DELAY", 300))  # in seconds
+STATEMENT_DAYS_PER_RUN = int(getenv("STATEMENT_DAYS_PER_RUN", 31))
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def rollup_statements(
+    db: Session,
+    days_per_run: int = STATEMENT_DAYS_PER_RUN,
+    close_delay: float = STATEMENT_CLOSE_DELAY,
+) -> int:
+    # Statements are written for whole UTC days, oldest first, and the
+    # watermark moves in the same transaction, so each run only reads the
+    # ledger rows of days it has not rolled up yet.
+    first_day = db.scalar(select(func.min(Transaction.created_at)))
+    if first_day is None:
+        return 0
+    db.execute(
+        insert(JobWatermark)
+        .values(
+            name=STATEMENT_WATERMARK,
+            position=day_start(first_day.astimezone(timezone.utc).date()),
+        )
+        .on_conflict_do_nothing()
+    )
+    # Another run already holds the watermark; it will cover these days.
+    watermark = db.scalar(
+        select(JobWatermark)
+        .filter(JobWatermark.name == STATEMENT_WATERMARK)
+        .with_for_update(skip_locked=True)
+    )
+    if watermark is None:
+        db.rollback()
+        return 0
+
+    # A day is closed once writes that started before midnight have had
+    # close_delay to commit and none of its credits are still pending.
+    horizon = day_start(
+        (datetime.now(timezone.utc) - timedelta(seconds=close_delay)).date()
+    )
+    oldest_pending = db.scalar(
+        select(func.min(Transaction.created_at)).filter(
+            Transaction.status == TransactionStatus.PENDING.value
+        )
+    )
+    if oldest_pending is not None:
+        horizon = min(
+            horizon, day_start(oldest_pending.astimezone(timezone.utc).date())
+        )
+
+    written, days = 0, 0
+    while watermark.position < horizon and days < days_per_run:
+        written += rollup_day(db, watermark.position.date())
+        watermark.position += timedelta(days=1)
+        days += 1
+    db.commit()
+    return written
+
+
+def rollup_day(db: Session, day: date) -> int:
+    # Balances are summed rather than read from balance_after, which settled
+    # credits stamp at settlement time and batch rows can share a timestamp
+    # with. A wallet's opening is its latest earlier statement's closing.
+    start = day_start(day)
+    rows = (
+        select(
+            Transaction.wallet_id,
+            func.sum(Transaction.amount).label("net"),
+            func.coalesce(
+                func.sum(Transaction.amount).filter(Transaction.amount > 0), 0
+            ).label("credits"),
+            func.coalesce(
+                -func.sum(Transaction.amount).filter(Transaction.amount < 0), 0
+            ).label("debits"),
+            func.count().label("transaction_count"),
+        )
+        .filter(
+            Transaction.created_at >= start,
+            Transaction.created_at < start + timedelta(days=1),
+            Transaction.status == TransactionStatus.COMPLETED.value,
+        )
+        .group_by(Transaction.wallet_id)
+        .subquery()
+    )
+    opening_balance = func.coalesce(
+        select(WalletStatement.closing_balance)
+        .filter(
+            WalletStatement.wallet_id == rows.c.wallet_id,
+            WalletStatement.day < day,
+        )
+        .order_by(WalletStatement.day.desc())
+        .limit(1)
+        .scalar_subquery(),
+        0,
+    )
+    summary = select(
+        rows.c.wallet_id,
+        literal(day, Date),
+        opening_balance,
+        opening_balance + rows.c.net,
+        rows.c.credits,
+        rows.c.debits,
+        rows.c.transaction_count,
+    )
+
+    return db.execute(
+        insert(WalletStatement).from_select(
+            [
+                WalletStatement.wallet_id,
+                WalletStatement.day,
+                WalletStatement.opening_balance,
+                WalletStatement.closing_balance,
+                WalletStatement.credits,
+                WalletStatement.debits,
+                WalletStatement.transaction_count,
+            ],
+            summary,
+        )
+    ).rowcount
@@ -1,31 +1,467 @@
+import csv
+import io
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from uuid import UUID
+from os import getenv
+from typing import AsyncIterator, List, Literal, Optional, Sequence, Union
+from uuid import UUID, uuid4
 
 from fastapi import HTTPException, status
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    String,
+    and_,
+    case,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 
-from models import Transaction, User, Wallet
-from services import WalletService
-from utils import TransactionStatus, TransactionType
+import schemas
+from models import Transaction, User, Wallet, WalletShard
+from services import WalletService, ledger_event
+from utils import (
+    TransactionStatus,
+    TransactionType,
+    decode_cursor,
+    encode_cursor,
+    retry_on_conflict,
+    retry_reason,
+)
+
+TransactionMode = Literal["atomic", "orm"]
+
+TRANSACTION_MODE: TransactionMode = getenv("TRANSACTION_MODE", "atomic")
+BATCH_TRANSFER_MAX_SIZE = int(getenv("BATCH_TRANSFER_MAX_SIZE", 1000))
+HISTORY_EXPORT_CHUNK_SIZE = int(getenv("HISTORY_EXPORT_CHUNK_SIZE", 1000))
+
+EXPORT_COLUMNS = [
+    "id",
+    "created_at",
+    "type",
+    "status",
+    "amount",
+    "balance_after",
+    "reference_id",
+    "related_transaction_id",
+    "description",
+]
+
+
+@dataclass(frozen=True)
+class GroupedTransfer:
+    sender_id: UUID
+    receiver_email: str
+    amount: Decimal
+    currency: str
+    reference_id: Optional[str] = None
 
 
 class TransactionService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, mode: Optional[TransactionMode] = None):
         self.db = db
+        self.mode = mode or TRANSACTION_MODE
+
+    @retry_on_conflict
+    async def deposit(
+        self,
+        user_id: UUID,
+        amount: Decimal,
+        currency: str,
+        description: str = "Deposit",
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        if self.mode == "atomic":
+            return await self._apply_atomic(
+                user_id,
+                amount,
+                currency,
+                TransactionType.DEPOSIT,
+                description,
+                reference_id,
+            )
+        return await self._orm_deposit(
+            user_id, amount, currency, description, reference_id
+        )
+
+    @retry_on_conflict
+    async def withdraw(
+        self,
+        user_id: UUID,
+        amount: Decimal,
+        currency: str,
+        description: str = "Withdrawal",
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        if self.mode == "atomic":
+            return await self._apply_atomic(
+                user_id,
+                -amount,
+                currency,
+                TransactionType.WITHDRAWAL,
+                description,
+                reference_id,
+            )
+        return await self._orm_withdraw(
+            user_id, amount, currency, description, reference_id
+        )
+
+    async def _apply_atomic(
+        self,
+        user_id: UUID,
+        delta: Decimal,
+        currency: str,
+        transaction_type: TransactionType,
+        description: str,
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        # Balance update, funds check and ledger insert run as one statement,
+        # so the wallet row lock is only held for a single round-trip + COMMIT.
+        conditions = [
+            Wallet.user_id == user_id,
+            Wallet.currency == currency,
+            Wallet.shard_count == 1,
+            Wallet.balance + delta >= 0,
+        ]
+        if delta > 0:
+            conditions.append(Wallet.deferred_credits.is_(False))
+        updated_wallet = (
+            update(Wallet)
+            .where(*conditions)
+            .values(balance=Wallet.balance + delta)
+            .returning(Wallet.id.label("wallet_id"), Wallet.balance)
+            .cte("updated_wallet")
+        )
+
+        transaction = await self._insert_ledger_entry(
+            updated_wallet,
+            updated_wallet.c.balance,
+            delta,
+            transaction_type,
+            description,
+            reference_id,
+        )
+
+        if transaction is None:
+            wallet = (
+                await self.db.execute(
+                    select(
+                        Wallet.id, Wallet.shard_count, Wallet.deferred_credits
+                    ).filter(Wallet.user_id == user_id, Wallet.currency == currency)
+                )
+            ).first()
+            if wallet and delta > 0 and wallet.deferred_credits:
+                return await self._append_pending_credit(
+                    wallet.id, delta, transaction_type, description, reference_id
+                )
+            if wallet and wallet.shard_count > 1:
+                return await self._apply_sharded(
+                    wallet.id,
+                    wallet.shard_count,
+                    delta,
+                    transaction_type,
+                    description,
+                    reference_id,
+                )
+            await self.db.rollback()
+            if not wallet:
+                raise HTTPException(
+                    status_code=404, detail=f"No {currency} wallet found for this user"
+                )
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+
+        await self.db.commit()
+        return transaction
+
+    async def _insert_ledger_entry(
+        self,
+        updated,
+        balance_after,
+        delta: Decimal,
+        transaction_type: TransactionType,
+        description: str,
+        reference_id: Optional[str] = None,
+    ) -> Optional[Transaction]:
+        # Inserts the ledger row only if the balance UPDATE in the `updated`
+        # CTE matched, in the same statement as that UPDATE.
+        ledger_insert = (
+            insert(Transaction)
+            .from_select(
+                [
+                    Transaction.id,
+                    Transaction.wallet_id,
+                    Transaction.amount,
+                    Transaction.balance_after,
+                    Transaction.type,
+                    Transaction.status,
+                    Transaction.description,
+                    Transaction.reference_id,
+                    Transaction.created_at,
+                ],
+                select(
+                    literal(uuid4(), Transaction.id.type),
+                    updated.c.wallet_id,
+                    literal(delta, Transaction.amount.type),
+                    balance_after,
+                    literal(transaction_type.value, String),
+                    literal(TransactionStatus.COMPLETED.value, String),
+                    literal(description, String),
+                    literal(reference_id, String),
+                    literal(datetime.now(timezone.utc), Transaction.created_at.type),
+                ),
+                include_defaults=False,
+            )
+            .returning(Transaction, ledger_event())
+            .add_cte(updated)
+        )
+
+        return (
+            await self.db.scalars(select(Transaction).from_statement(ledger_insert))
+        ).first()
+
+    async def _publish(self, transaction: Transaction) -> None:
+        # Rows added through the ORM are flushed first, then get the same
+        # commit-time notification the INSERT ... RETURNING paths queue.
+        await self.db.flush()
+        await self.db.execute(
+            select(ledger_event()).filter(Transaction.id == transaction.id)
+        )
+
+    async def _append_pending_credit(
+        self,
+        wallet_id: UUID,
+        amount: Decimal,
+        transaction_type: TransactionType,
+        description: str,
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        # No wallet lock: settle_pending_credits folds the row into the
+        # balance later and fills in balance_after.
+        transaction = Transaction(
+            wallet_id=wallet_id,
+            amount=amount,
+            balance_after=0,
+            type=transaction_type.value,
+            status=TransactionStatus.PENDING.value,
+            description=description,
+            reference_id=reference_id,
+        )
+
+        self.db.add(transaction)
+        await self._publish(transaction)
+        await self.db.commit()
+        await self.db.refresh(transaction)
+        return transaction
 
-    def deposit(
+    async def _apply_sharded(
+        self,
+        wallet_id: UUID,
+        shard_count: int,
+        delta: Decimal,
+        transaction_type: TransactionType,
+        description: str,
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        if delta >= 0:
+            # Credit a random shard and write the ledger row in one statement.
+            # The subquery reads the pre-update snapshot, hence the + delta.
+            balance_after = (
+                select(Wallet.total_balance)
+                .filter(Wallet.id == wallet_id)
+                .scalar_subquery()
+                + delta
+            )
+            for shard_no in (random.randrange(shard_count), 0):
+                transaction = await self._insert_ledger_entry(
+                    self._credit_statement(wallet_id, shard_no, delta).cte(
+                        "credited_shard"
+                    ),
+                    balance_after,
+                    delta,
+                    transaction_type,
+                    description,
+                    reference_id,
+                )
+                if transaction is not None:
+                    await self.db.commit()
+                    return transaction
+
+        balance_after = await self._adjust_balance(wallet_id, shard_count, delta)
+        if balance_after is None:
+            await self.db.rollback()
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+
+        transaction = Transaction(
+            wallet_id=wallet_id,
+            amount=delta,
+            balance_after=balance_after,
+            type=transaction_type.value,
+            status=TransactionStatus.COMPLETED.value,
+            description=description,
+            reference_id=reference_id,
+        )
+
+        self.db.add(transaction)
+        await self._publish(transaction)
+        await self.db.commit()
+        await self.db.refresh(transaction)
+        return transaction
+
+    async def _adjust_balance(
+        self, wallet_id: UUID, shard_count: int, delta: Decimal
+    ) -> Optional[Decimal]:
+        if shard_count == 1:
+            return await self.db.scalar(
+                update(Wallet)
+                .filter(Wallet.id == wallet_id, Wallet.balance + delta >= 0)
+                .values(balance=Wallet.balance + delta)
+                .returning(Wallet.balance)
+            )
+
+        if delta >= 0:
+            await self._credit_shard(wallet_id, random.randrange(shard_count), delta)
+        elif not await self._debit_shards(wallet_id, -delta):
+            return None
+
+        return await self.db.scalar(
+            select(Wallet.total_balance).filter(Wallet.id == wallet_id)
+        )
+
+    async def _credit_shard(
+        self, wallet_id: UUID, shard_no: int, amount: Decimal
+    ) -> None:
+        # Shard 0 is the wallet row itself; it also catches shards removed by
+        # a concurrent resize.
+        if await self.db.scalar(self._credit_statement(wallet_id, shard_no, amount)):
+            return
+        await self.db.execute(self._credit_statement(wallet_id, 0, amount))
+
+    @staticmethod
+    def _credit_statement(wallet_id: UUID, shard_no: int, amount: Decimal):
+        if shard_no:
+            return (
+                update(WalletShard)
+                .filter(
+                    WalletShard.wallet_id == wallet_id,
+                    WalletShard.shard_no == shard_no,
+                )
+                .values(balance=WalletShard.balance + amount)
+                .returning(WalletShard.wallet_id)
+            )
+        return (
+            update(Wallet)
+            .filter(Wallet.id == wallet_id)
+            .values(balance=Wallet.balance + amount)
+            .returning(Wallet.id.label("wallet_id"))
+        )
+
+    async def _debit_shards(self, wallet_id: UUID, amount: Decimal) -> bool:
+        balances = dict(
+            (
+                await self.db.execute(
+                    select(literal(0), Wallet.balance)
+                    .filter(Wallet.id == wallet_id)
+                    .union_all(
+                        select(WalletShard.shard_no, WalletShard.balance).filter(
+                            WalletShard.wallet_id == wallet_id
+                        )
+                    )
+                )
+            ).all()
+        )
+        if sum(balances.values()) < amount:
+            return False
+
+        # Lock only the largest shards needed to cover the amount; if a
+        # concurrent debit drained them meanwhile, retry with every shard.
+        chosen, covered = [], Decimal(0)
+        for shard_no, balance in sorted(
+            balances.items(), key=lambda shard: shard[1], reverse=True
+        ):
+            if covered >= amount:
+                break
+            chosen.append(shard_no)
+            covered += balance
+
+        for shard_nos in (sorted(chosen), sorted(balances)):
+            savepoint = await self.db.begin_nested()
+            locked = await self._lock_shards(wallet_id, shard_nos)
+            if sum(locked.values()) >= amount:
+                break
+            # Rolling back to the savepoint also releases its row locks.
+            await savepoint.rollback()
+        else:
+            return False
+
+        remaining, drained = amount, {}
+        for shard_no in sorted(locked):
+            taken = min(locked[shard_no], remaining)
+            if taken:
+                drained[shard_no] = locked[shard_no] - taken
+                remaining -= taken
+            if not remaining:
+                break
+
+        if 0 in drained:
+            await self.db.execute(
+                update(Wallet)
+                .filter(Wallet.id == wallet_id)
+                .values(balance=drained.pop(0))
+            )
+        if drained:
+            await self.db.execute(
+                update(WalletShard),
+                [
+                    {"wallet_id": wallet_id, "shard_no": shard_no, "balance": balance}
+                    for shard_no, balance in drained.items()
+                ],
+            )
+        await savepoint.commit()
+        return True
+
+    async def _lock_shards(self, wallet_id: UUID, shard_nos: List[int]) -> dict:
+        # Shard 0 (the wallet row) first, then the rest in shard order, so
+        # concurrent debits always acquire locks in the same sequence.
+        locked = {}
+        if 0 in shard_nos:
+            locked[0] = await self.db.scalar(
+                select(Wallet.balance).filter(Wallet.id == wallet_id).with_for_update()
+            )
+        rest = [shard_no for shard_no in shard_nos if shard_no]
+        if rest:
+            locked.update(
+                (
+                    await self.db.execute(
+                        select(WalletShard.shard_no, WalletShard.balance)
+                        .filter(
+                            WalletShard.wallet_id == wallet_id,
+                            WalletShard.shard_no.in_(rest),
+                        )
+                        .order_by(WalletShard.shard_no)
+                        .with_for_update()
+                    )
+                ).all()
+            )
+        return locked
+
+    async def _orm_deposit(
         self,
         user_id: UUID,
         amount: Decimal,
         currency: str,
         description: str = "Deposit",
+        reference_id: Optional[str] = None,
     ) -> Transaction:
-        wallet = (
-            self.db.query(Wallet)
+        wallet = await self.db.scalar(
+            select(Wallet)
             .filter(Wallet.user_id == user_id, Wallet.currency == currency)
             .with_for_update()
-            .first()
         )
 
         if not wallet:
@@ -33,6 +469,21 @@ class TransactionService:
                 status_code=404, detail=f"No {currency} wallet found for this user"
             )
 
+        if wallet.deferred_credits:
+            return await self._append_pending_credit(
+                wallet.id, amount, TransactionType.DEPOSIT, description, reference_id
+            )
+
+        if wallet.shard_count > 1:
+            return await self._apply_sharded(
+                wallet.id,
+                wallet.shard_count,
+                amount,
+                TransactionType.DEPOSIT,
+                description,
+                reference_id,
+            )
+
         wallet.balance += amount
 
         transaction = Transaction(
@@ -42,25 +493,27 @@ class TransactionService:
             type=TransactionType.DEPOSIT.value,
             status=TransactionStatus.COMPLETED.value,
             description=description,
+            reference_id=reference_id,
         )
 
         self.db.add(transaction)
-        self.db.commit()
-        self.db.refresh(transaction)
+        await self._publish(transaction)
+        await self.db.commit()
+        await self.db.refresh(transaction)
         return transaction
 
-    def withdraw(
+    async def _orm_withdraw(
         self,
         user_id: UUID,
         amount: Decimal,
         currency: str,
         description: str = "Withdrawal",
+        reference_id: Optional[str] = None,
     ) -> Transaction:
-        wallet = (
-            self.db.query(Wallet)
+        wallet = await self.db.scalar(
+            select(Wallet)
             .filter(Wallet.user_id == user_id, Wallet.currency == currency)
             .with_for_update()
-            .first()
         )
 
         if not wallet:
@@ -68,6 +521,16 @@ class TransactionService:
                 status_code=404, detail=f"No {currency} wallet found for this user"
             )
 
+        if wallet.shard_count > 1:
+            return await self._apply_sharded(
+                wallet.id,
+                wallet.shard_count,
+                -amount,
+                TransactionType.WITHDRAWAL,
+                description,
+                reference_id,
+            )
+
         if wallet.balance < amount:
             raise HTTPException(status_code=400, detail="Insufficient funds")
 
@@ -80,17 +543,44 @@ class TransactionService:
             type=TransactionType.WITHDRAWAL.value,
             status=TransactionStatus.COMPLETED.value,
             description=description,
+            reference_id=reference_id,
         )
 
         self.db.add(transaction)
-        self.db.commit()
-        self.db.refresh(transaction)
+        await self._publish(transaction)
+        await self.db.commit()
+        await self.db.refresh(transaction)
         return transaction
 
-    def transfer(
-        self, sender_id: UUID, receiver_email: str, amount: Decimal, currency: str
+    @retry_on_conflict
+    async def transfer(
+        self,
+        sender_id: UUID,
+        receiver_email: str,
+        amount: Decimal,
+        currency: str,
+        reference_id: Optional[str] = None,
     ) -> Transaction:
-        receiver = self.db.query(User).filter(User.email == receiver_email).first()
+        # Sender and receiver, each with their wallet for this currency, in a
+        # single round-trip.
+        accounts = (
+            await self.db.execute(
+                select(
+                    User.id,
+                    User.email,
+                    Wallet.id.label("wallet_id"),
+                    Wallet.shard_count,
+                    Wallet.deferred_credits,
+                )
+                .outerjoin(
+                    Wallet, and_(Wallet.user_id == User.id, Wallet.currency == currency)
+                )
+                .filter(or_(User.email == receiver_email, User.id == sender_id))
+            )
+        ).all()
+        sender = next((row for row in accounts if row.id == sender_id), None)
+        receiver = next((row for row in accounts if row.email == receiver_email), None)
+
         if not receiver:
             raise HTTPException(status_code=404, detail="Receiver not found")
 
@@ -99,95 +589,683 @@ class TransactionService:
                 status_code=400, detail="Cannot transfer money to yourself"
             )
 
-        sender_wallet_id_query = (
-            self.db.query(Wallet.id)
-            .filter(Wallet.user_id == sender_id, Wallet.currency == currency)
-            .scalar()
-        )
-        receiver_wallet_id_query = (
-            self.db.query(Wallet.id)
-            .filter(Wallet.user_id == receiver.id, Wallet.currency == currency)
-            .scalar()
-        )
-
-        if not sender_wallet_id_query:
+        if not sender or not sender.wallet_id:
             raise HTTPException(
                 status_code=404, detail="You don't have a wallet for this currency"
             )
 
-        if not receiver_wallet_id_query:
+        if not receiver.wallet_id:
             raise HTTPException(
                 status_code=404,
                 detail="Receiver doesn't have a wallet for this currency",
             )
 
-        first_lock_id, second_lock_id = sorted(
-            [sender_wallet_id_query, receiver_wallet_id_query]
-        )
+        if (
+            sender.shard_count > 1
+            or receiver.shard_count > 1
+            or receiver.deferred_credits
+        ):
+            return await self._transfer_by_delta(sender, receiver, amount, reference_id)
 
         try:
-            wallet_1 = (
-                self.db.query(Wallet)
-                .filter(Wallet.id == first_lock_id)
-                .with_for_update()
-                .first()
+            # Both rows locked in one statement, in wallet id order.
+            balances = dict(
+                (
+                    await self.db.execute(
+                        select(Wallet.id, Wallet.balance)
+                        .filter(Wallet.id.in_([sender.wallet_id, receiver.wallet_id]))
+                        .order_by(Wallet.id)
+                        .with_for_update()
+                    )
+                ).all()
             )
-            wallet_2 = (
-                self.db.query(Wallet)
-                .filter(Wallet.id == second_lock_id)
-                .with_for_update()
-                .first()
+
+            if balances[sender.wallet_id] < amount:
+                raise HTTPException(status_code=400, detail="Insufficient funds")
+
+            # The balance UPDATE rides along with the ledger INSERT as a CTE.
+            moved = (
+                update(Wallet)
+                .filter(Wallet.id.in_(balances))
+                .values(
+                    balance=case(
+                        (Wallet.id == sender.wallet_id, Wallet.balance - amount),
+                        else_=Wallet.balance + amount,
+                    )
+                )
+                .cte("moved")
             )
+            outgoing_tx = await self._insert_transfer_pair(
+                sender.wallet_id,
+                receiver.wallet_id,
+                sender.email,
+                receiver.email,
+                amount,
+                balances[sender.wallet_id] - amount,
+                balances[receiver.wallet_id] + amount,
+                reference_id,
+                moved,
+            )
+
+            await self.db.commit()
+            return outgoing_tx
+
+        except Exception as e:
+            await self.db.rollback()
+            if isinstance(e, HTTPException):
+                raise e
+
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            ) from e
+
+    async def _insert_transfer_pair(
+        self,
+        sender_wallet_id: UUID,
+        receiver_wallet_id: UUID,
+        sender_email: str,
+        receiver_email: str,
+        amount: Decimal,
+        sender_balance_after: Decimal,
+        receiver_balance_after: Optional[Decimal],
+        reference_id: Optional[str] = None,
+        *ctes,
+    ) -> Transaction:
+        # Both ids are generated up front, so the pair references each other
+        # in a single multi-row INSERT; the self-referencing FK is checked
+        # once the statement has written both rows. A receiver_balance_after
+        # of None leaves the incoming row pending for settlement.
+        outgoing_id, incoming_id = uuid4(), uuid4()
+        created_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": outgoing_id,
+                "wallet_id": sender_wallet_id,
+                "amount": -amount,
+                "balance_after": sender_balance_after,
+                "type": TransactionType.TRANSFER.value,
+                "status": TransactionStatus.COMPLETED.value,
+                "related_transaction_id": incoming_id,
+                "description": f"Transfer to {receiver_email}",
+                "reference_id": reference_id,
+                "created_at": created_at,
+            },
+            {
+                "id": incoming_id,
+                "wallet_id": receiver_wallet_id,
+                "amount": amount,
+                "balance_after": (
+                    0 if receiver_balance_after is None else receiver_balance_after
+                ),
+                "type": TransactionType.TRANSFER.value,
+                "status": (
+                    TransactionStatus.PENDING.value
+                    if receiver_balance_after is None
+                    else TransactionStatus.COMPLETED.value
+                ),
+                "related_transaction_id": outgoing_id,
+                "description": f"Received from {sender_email}",
+                "reference_id": None,
+                "created_at": created_at,
+            },
+        ]
+
+        statement = (
+            insert(Transaction).values(rows).returning(Transaction, ledger_event())
+        )
+        for cte in ctes:
+            statement = statement.add_cte(cte)
+        # RETURNING hands back the stored rows, so the response carries the
+        # column types (e.g. Numeric scale) without a second read.
+        transactions = await self.db.scalars(
+            select(Transaction).from_statement(statement)
+        )
+        return next(
+            transaction for transaction in transactions if transaction.id == outgoing_id
+        )
 
-            sender_wallet = (
-                wallet_1 if wallet_1.id == sender_wallet_id_query else wallet_2
+    async def _record_transfer(
+        self,
+        sender_wallet: Wallet,
+        receiver_wallet: Wallet,
+        sender_email: str,
+        receiver_email: str,
+        amount: Decimal,
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        # Both wallets must already be locked.
+        sender_wallet.balance -= amount
+        receiver_wallet.balance += amount
+
+        return await self._insert_transfer_pair(
+            sender_wallet.id,
+            receiver_wallet.id,
+            sender_email,
+            receiver_email,
+            amount,
+            sender_wallet.balance,
+            receiver_wallet.balance,
+            reference_id,
+        )
+
+    async def _transfer_by_delta(
+        self, sender, receiver, amount: Decimal, reference_id: Optional[str] = None
+    ) -> Transaction:
+        # Used when either side is sharded or the receiver defers credits:
+        # each side is applied as a balance delta instead of locking both
+        # wallet rows up front.
+        try:
+            deltas = [(sender.wallet_id, sender.shard_count, -amount)]
+            if not receiver.deferred_credits:
+                deltas.append((receiver.wallet_id, receiver.shard_count, amount))
+
+            # Same wallet order as the row-locking path; within a wallet the
+            # shard helpers keep their own lock order.
+            balances_after = {receiver.wallet_id: None}
+            for wallet_id, shard_count, delta in sorted(deltas):
+                balance_after = await self._adjust_balance(
+                    wallet_id, shard_count, delta
+                )
+                if balance_after is None:
+                    raise HTTPException(status_code=400, detail="Insufficient funds")
+                balances_after[wallet_id] = balance_after
+
+            outgoing_tx = await self._insert_transfer_pair(
+                sender.wallet_id,
+                receiver.wallet_id,
+                sender.email,
+                receiver.email,
+                amount,
+                balances_after[sender.wallet_id],
+                balances_after[receiver.wallet_id],
+                reference_id,
             )
-            receiver_wallet = (
-                wallet_2 if wallet_2.id == receiver_wallet_id_query else wallet_1
+
+            await self.db.commit()
+            return outgoing_tx
+
+        except Exception as e:
+            await self.db.rollback()
+            if isinstance(e, HTTPException):
+                raise e
+
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            ) from e
+
+    @retry_on_conflict
+    async def transfer_group(
+        self, transfers: Sequence[GroupedTransfer]
+    ) -> List[Union[Transaction, HTTPException]]:
+        # Independent transfers from different callers, committed together.
+        # Each entry of the result is the outgoing transaction or the error
+        # that transfer() would have raised for that item.
+        emails = {item.receiver_email for item in transfers}
+        sender_ids = {item.sender_id for item in transfers}
+        currencies = {item.currency for item in transfers}
+        accounts = (
+            await self.db.execute(
+                select(
+                    User.id,
+                    User.email,
+                    Wallet.id,
+                    Wallet.currency,
+                    Wallet.shard_count,
+                    Wallet.deferred_credits,
+                )
+                .outerjoin(
+                    Wallet,
+                    and_(Wallet.user_id == User.id, Wallet.currency.in_(currencies)),
+                )
+                .filter(or_(User.email.in_(emails), User.id.in_(sender_ids)))
             )
+        ).all()
 
-            if sender_wallet.balance < amount:
-                raise HTTPException(status_code=400, detail="Insufficient funds")
+        user_ids, emails_by_id, wallets_by_owner = {}, {}, {}
+        for user_id, email, wallet_id, currency, shard_count, deferred in accounts:
+            user_ids[email] = user_id
+            emails_by_id[user_id] = email
+            if wallet_id:
+                wallets_by_owner[(user_id, currency)] = (
+                    wallet_id,
+                    shard_count,
+                    deferred,
+                )
+
+        outcomes: List[Union[Transaction, HTTPException, None]] = []
+        planned, by_delta = [], []
+        for position, item in enumerate(transfers):
+            receiver_id = user_ids.get(item.receiver_email)
+            sender_wallet = wallets_by_owner.get((item.sender_id, item.currency))
+            receiver_wallet = wallets_by_owner.get((receiver_id, item.currency))
+            if not receiver_id:
+                error = HTTPException(status_code=404, detail="Receiver not found")
+            elif receiver_id == item.sender_id:
+                error = HTTPException(
+                    status_code=400, detail="Cannot transfer money to yourself"
+                )
+            elif not sender_wallet:
+                error = HTTPException(
+                    status_code=404,
+                    detail="You don't have a wallet for this currency",
+                )
+            elif not receiver_wallet:
+                error = HTTPException(
+                    status_code=404,
+                    detail="Receiver doesn't have a wallet for this currency",
+                )
+            else:
+                error = None
+            outcomes.append(error)
+            if error is not None:
+                continue
+            # Sharded wallets and deferred-credit receivers take transfer()'s
+            # balance-delta path, on their own after the group commits.
+            if sender_wallet[1] > 1 or receiver_wallet[1] > 1 or receiver_wallet[2]:
+                by_delta.append(position)
+            else:
+                planned.append((position, item, sender_wallet[0], receiver_wallet[0]))
+
+        if planned:
+            # Every wallet of the group is locked in one sorted FOR UPDATE pass,
+            # the same global order transfer() uses.
+            wallet_ids = {
+                wallet_id
+                for _, _, sender_wallet_id, receiver_wallet_id in planned
+                for wallet_id in (sender_wallet_id, receiver_wallet_id)
+            }
+            try:
+                wallets = {
+                    wallet.id: wallet
+                    for wallet in await self.db.scalars(
+                        select(Wallet)
+                        .filter(Wallet.id.in_(wallet_ids))
+                        .order_by(Wallet.id)
+                        .with_for_update()
+                        .execution_options(populate_existing=True)
+                    )
+                }
+
+                for position, item, sender_wallet_id, receiver_wallet_id in planned:
+                    sender_wallet = wallets[sender_wallet_id]
+                    if sender_wallet.balance < item.amount:
+                        outcomes[position] = HTTPException(
+                            status_code=400, detail="Insufficient funds"
+                        )
+                        continue
 
-            sender_wallet.balance -= amount
-            receiver_wallet.balance += amount
+                    # A savepoint per item, so a failing write (e.g. a reused
+                    # reference_id) only drops that item from the group.
+                    try:
+                        async with self.db.begin_nested():
+                            outcomes[position] = await self._record_transfer(
+                                sender_wallet,
+                                wallets[receiver_wallet_id],
+                                emails_by_id[item.sender_id],
+                                item.receiver_email,
+                                item.amount,
+                                item.reference_id,
+                            )
+                    except Exception as e:
+                        # A conflict is not the item's fault; the whole group
+                        # is rolled back and retried instead.
+                        if retry_reason(e):
+                            raise
+                        outcomes[position] = self._as_http_error(e)
+                        await self.db.refresh(sender_wallet)
+                        await self.db.refresh(wallets[receiver_wallet_id])
 
-            outgoing_tx = Transaction(
-                wallet_id=sender_wallet.id,
-                amount=-amount,
-                balance_after=sender_wallet.balance,
-                type=TransactionType.TRANSFER.value,
-                status=TransactionStatus.COMPLETED.value,
-                description=f"Transfer to {receiver.email}",
+                await self.db.commit()
+            except Exception as e:
+                await self.db.rollback()
+                # Conflicts fail the whole group, which is then retried.
+                if retry_reason(e):
+                    raise
+                for position, *_ in planned:
+                    if not isinstance(outcomes[position], Exception):
+                        outcomes[position] = self._as_http_error(e)
+
+        for position in by_delta:
+            item = transfers[position]
+            try:
+                outcomes[position] = await self.transfer(
+                    item.sender_id,
+                    item.receiver_email,
+                    item.amount,
+                    item.currency,
+                    item.reference_id,
+                )
+            except HTTPException as e:
+                outcomes[position] = e
+
+        return outcomes
+
+    @retry_on_conflict
+    async def transfer_batch(
+        self,
+        sender_id: UUID,
+        currency: str,
+        transfers: Sequence[schemas.BatchTransferItem],
+        mode: Literal["atomic", "partial"] = "atomic",
+    ) -> dict:
+        if len(transfers) > BATCH_TRANSFER_MAX_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch size is limited to {BATCH_TRANSFER_MAX_SIZE} transfers",
             )
 
-            incoming_tx = Transaction(
-                wallet_id=receiver_wallet.id,
-                amount=amount,
-                balance_after=receiver_wallet.balance,
-                type=TransactionType.TRANSFER.value,
-                status=TransactionStatus.COMPLETED.value,
-                description=f"Received from {sender_wallet.user.email}",
+        # Resolve the sender and every receiver, with their wallet for this
+        # currency, in a single round-trip.
+        emails = {item.receiver_email for item in transfers}
+        accounts = (
+            await self.db.execute(
+                select(User.id, User.email, Wallet.id, Wallet.deferred_credits)
+                .outerjoin(
+                    Wallet, and_(Wallet.user_id == User.id, Wallet.currency == currency)
+                )
+                .filter(or_(User.email.in_(emails), User.id == sender_id))
             )
+        ).all()
 
-            self.db.add(outgoing_tx)
-            self.db.add(incoming_tx)
+        sender_email, sender_wallet_id = None, None
+        receivers, deferred_wallet_ids = {}, set()
+        for user_id, email, wallet_id, deferred_credits in accounts:
+            if user_id == sender_id:
+                sender_email, sender_wallet_id = email, wallet_id
+            receivers[email] = (user_id, wallet_id)
+            if deferred_credits:
+                deferred_wallet_ids.add(wallet_id)
 
-            self.db.flush()
+        if not sender_wallet_id:
+            raise HTTPException(
+                status_code=404, detail="You don't have a wallet for this currency"
+            )
 
-            outgoing_tx.related_transaction_id = incoming_tx.id
-            incoming_tx.related_transaction_id = outgoing_tx.id
+        results = []
+        for index, item in enumerate(transfers):
+            receiver_id, receiver_wallet_id = receivers.get(
+                item.receiver_email, (None, None)
+            )
+            if not receiver_id:
+                error = (404, "Receiver not found")
+            elif receiver_id == sender_id:
+                error = (400, "Cannot transfer money to yourself")
+            elif not receiver_wallet_id:
+                error = (404, "Receiver doesn't have a wallet for this currency")
+            else:
+                error = None
+            results.append((index, item, receiver_wallet_id, error))
 
-            self.db.commit()
-            self.db.refresh(outgoing_tx)
+        if mode == "atomic":
+            self._raise_first_error(results)
 
-            return outgoing_tx
+        # Receivers that defer credits only get a pending row, so their
+        # wallets are not locked at all.
+        wallet_ids = {sender_wallet_id} | {
+            wallet_id
+            for _, _, wallet_id, error in results
+            if error is None and wallet_id not in deferred_wallet_ids
+        }
+
+        try:
+            # One sorted FOR UPDATE pass over every wallet in the batch keeps
+            # the lock order consistent with single transfers.
+            wallets = {
+                wallet.id: wallet
+                for wallet in await self.db.scalars(
+                    select(Wallet)
+                    .filter(Wallet.id.in_(wallet_ids))
+                    .order_by(Wallet.id)
+                    .options(undefer(Wallet.total_balance))
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+            }
+            sender_wallet = wallets[sender_wallet_id]
+            # Sharded receivers are credited on shard 0; balance_after still
+            # reports their summed balance.
+            balances = {
+                wallet_id: wallet.total_balance for wallet_id, wallet in wallets.items()
+            }
+            if sender_wallet.shard_count > 1:
+                # A payout drains many shards anyway, so fold them all into
+                # the locked wallet row instead of picking shards per item.
+                folded = await self.db.scalars(
+                    select(WalletShard.balance)
+                    .filter(WalletShard.wallet_id == sender_wallet.id)
+                    .order_by(WalletShard.shard_no)
+                    .with_for_update()
+                )
+                sender_wallet.balance += sum(folded.all())
+                await self.db.execute(
+                    update(WalletShard)
+                    .filter(WalletShard.wallet_id == sender_wallet.id)
+                    .values(balance=0)
+                )
+            # Every row gets its own microsecond, in insertion order, so
+            # (created_at, id) orders a wallet's batch rows the way their
+            # balance_after values were computed.
+            created_at = datetime.now(timezone.utc)
+            tick = timedelta(microseconds=1)
+
+            rows = []
+            for position, (index, item, receiver_wallet_id, error) in enumerate(
+                results
+            ):
+                if error is not None:
+                    continue
+                if balances[sender_wallet.id] < item.amount:
+                    results[position] = (
+                        index,
+                        item,
+                        receiver_wallet_id,
+                        (400, "Insufficient funds"),
+                    )
+                    if mode == "atomic":
+                        self._raise_first_error(results)
+                    continue
+
+                sender_wallet.balance -= item.amount
+                balances[sender_wallet.id] -= item.amount
+                if receiver_wallet_id in deferred_wallet_ids:
+                    incoming_status = TransactionStatus.PENDING.value
+                    incoming_balance_after = 0
+                else:
+                    wallets[receiver_wallet_id].balance += item.amount
+                    balances[receiver_wallet_id] += item.amount
+                    incoming_status = TransactionStatus.COMPLETED.value
+                    incoming_balance_after = balances[receiver_wallet_id]
+
+                outgoing_id, incoming_id = uuid4(), uuid4()
+                rows.append(
+                    {
+                        "id": outgoing_id,
+                        "wallet_id": sender_wallet.id,
+                        "amount": -item.amount,
+                        "balance_after": balances[sender_wallet.id],
+                        "type": TransactionType.TRANSFER.value,
+                        "status": TransactionStatus.COMPLETED.value,
+                        "related_transaction_id": incoming_id,
+                        "description": item.description
+                        or f"Transfer to {item.receiver_email}",
+                        "created_at": created_at + len(rows) * tick,
+                    }
+                )
+                rows.append(
+                    {
+                        "id": incoming_id,
+                        "wallet_id": receiver_wallet_id,
+                        "amount": item.amount,
+                        "balance_after": incoming_balance_after,
+                        "type": TransactionType.TRANSFER.value,
+                        "status": incoming_status,
+                        "related_transaction_id": outgoing_id,
+                        "description": f"Received from {sender_email}",
+                        "created_at": created_at + len(rows) * tick,
+                    }
+                )
+
+            transactions = {}
+            if rows:
+                # A single multi-row VALUES statement, so the self-referencing
+                # related_transaction_id FK is checked once every pair exists.
+                transactions = {
+                    transaction.id: transaction
+                    for transaction in await self.db.scalars(
+                        select(Transaction).from_statement(
+                            insert(Transaction)
+                            .values(rows)
+                            .returning(Transaction, ledger_event())
+                        )
+                    )
+                }
+
+            await self.db.commit()
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             if isinstance(e, HTTPException):
                 raise e
 
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            ) from e
+
+        outgoing = iter(rows[::2])
+        response = []
+        for index, item, _, error in results:
+            response.append(
+                {
+                    "index": index,
+                    "receiver_email": item.receiver_email,
+                    "amount": item.amount,
+                    "transaction": (
+                        transactions[next(outgoing)["id"]] if error is None else None
+                    ),
+                    "error": error[1] if error is not None else None,
+                }
+            )
+
+        completed = len(rows) // 2
+        return {
+            "mode": mode,
+            "completed": completed,
+            "failed": len(results) - completed,
+            "results": response,
+        }
+
+    @staticmethod
+    def _as_http_error(error: Exception) -> HTTPException:
+        if isinstance(error, HTTPException):
+            return error
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(error)
+        )
+
+    @staticmethod
+    def _raise_first_error(results) -> None:
+        for index, _, _, error in results:
+            if error is not None:
+                status_code, detail = error
+                raise HTTPException(
+                    status_code=status_code, detail=f"Transfer #{index}: {detail}"
+                )
+
+    async def _history_query(
+        self,
+        user_id: UUID,
+        currency: str,
+        transaction_type: Optional[TransactionType] = None,
+        transaction_status: Optional[TransactionStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        wallet = await WalletService(self.db).get_wallet(
+            user_id=user_id, currency=currency
+        )
+
+        # Matches ix_transaction_wallet_created_at, so pages are served by a
+        # backward index scan no matter how deep the cursor is.
+        query = (
+            select(Transaction)
+            .filter(Transaction.wallet_id == wallet.id)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        )
+        if transaction_type:
+            query = query.filter(Transaction.type == transaction_type.value)
+        if transaction_status:
+            query = query.filter(Transaction.status == transaction_status.value)
+        if created_from:
+            query = query.filter(Transaction.created_at >= created_from)
+        if created_to:
+            query = query.filter(Transaction.created_at < created_to)
+        return query
+
+    async def get_history(
+        self,
+        user_id: UUID,
+        currency: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        **filters,
+    ) -> dict:
+        query = await self._history_query(user_id, currency, **filters)
+
+        if cursor:
+            try:
+                created_at, transaction_id = decode_cursor(cursor)
+                position = (datetime.fromisoformat(created_at), UUID(transaction_id))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.filter(
+                tuple_(Transaction.created_at, Transaction.id) < position
             )
+
+        items: List[Transaction] = (await self.db.scalars(query.limit(limit + 1))).all()
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].created_at.isoformat(), items[-1].id)
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def stream_history(
+        self,
+        user_id: UUID,
+        currency: str,
+        export_format: Literal["ndjson", "csv"] = "ndjson",
+        **filters,
+    ) -> AsyncIterator[str]:
+        query = await self._history_query(user_id, currency, **filters)
+
+        # yield_per opens a server-side cursor, so only one chunk of rows is
+        # held in memory at a time regardless of the statement size.
+        result = await self.db.stream_scalars(
+            query.execution_options(yield_per=HISTORY_EXPORT_CHUNK_SIZE)
+        )
+
+        async def rows() -> AsyncIterator[str]:
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_COLUMNS)
+                yield buffer.getvalue()
+
+            async for partition in result.partitions():
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    writer.writerows(
+                        [getattr(tx, column) for column in EXPORT_COLUMNS]
+                        for tx in partition
+                    )
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(
+                        schemas.TransactionResponse.model_validate(tx).model_dump_json()
+                        + "\n"
+                        for tx in partition
+                    )
+
+        return rows()
@@ -0,0 +1,97 @@
+import asyncio
+from decimal import Decimal
+from os import getenv
+from typing import List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from models import Transaction
+from services import GroupedTransfer, TransactionService
+
+TRANSFER_BATCH_WINDOW = float(getenv("TRANSFER_BATCH_WINDOW", 0))  # in ms
+TRANSFER_BATCH_MAX_SIZE = int(getenv("TRANSFER_BATCH_MAX_SIZE", 64))
+
+
+class TransferBatcher:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        window: float = TRANSFER_BATCH_WINDOW,
+        max_size: int = TRANSFER_BATCH_MAX_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.window = window / 1000
+        self.max_size = max_size
+        self._pending: List[Tuple[GroupedTransfer, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    async def transfer(
+        self,
+        sender_id: UUID,
+        receiver_email: str,
+        amount: Decimal,
+        currency: str,
+        reference_id: Optional[str] = None,
+    ) -> Transaction:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(
+            (
+                GroupedTransfer(
+                    sender_id, receiver_email, amount, currency, reference_id
+                ),
+                future,
+            )
+        )
+
+        # A group is committed once it is full or the window since its first
+        # transfer has passed, whichever comes first.
+        if len(self._pending) >= self.max_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+
+        # Shielded so a disconnecting caller doesn't cancel the outcome the
+        # group will still report for it.
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        group, self._pending = self._pending, []
+        if group:
+            task = asyncio.create_task(self._commit_group(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit_group(
+        self, group: List[Tuple[GroupedTransfer, asyncio.Future]]
+    ) -> None:
+        try:
+            async with self.session_factory() as db:
+                outcomes = await TransactionService(db).transfer_group(
+                    [item for item, _ in group]
+                )
+        except Exception as e:
+            outcomes = [e] * len(group)
+
+        for (_, future), outcome in zip(group, outcomes):
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+                # Nobody may be waiting any more if the caller went away.
+                future.exception()
+            else:
+                future.set_result(outcome)
+
+    async def close(self) -> None:
+        self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
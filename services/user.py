@@ -0,0 +1,112 @@
+from datetime import datetime
+from os import getenv
+from typing import AsyncIterator, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from models import Role, User, UserRole
+from utils import RoleEnum, decode_cursor, encode_cursor
+
+USERS_EXPORT_CHUNK_SIZE = int(getenv("USERS_EXPORT_CHUNK_SIZE", 1000))
+
+
+class UserService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _list_query(
+        self,
+        role: Optional[RoleEnum] = None,
+        is_active: Optional[bool] = None,
+        is_verified: Optional[bool] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        # Only the columns UserResponse needs: password_hash is never loaded and
+        # role ids come back as one array instead of a joined row per role.
+        role_ids = func.array(
+            select(UserRole.role_id)
+            .filter(UserRole.user_id == User.id)
+            .order_by(UserRole.role_id)
+            .scalar_subquery()
+        )
+        query = select(
+            User.id,
+            User.username,
+            User.first_name,
+            User.last_name,
+            User.middle_name,
+            User.gender,
+            User.email,
+            User.is_active,
+            User.is_verified,
+            User.created_at,
+            role_ids.label("user_role"),
+        ).order_by(User.created_at, User.id)
+
+        if role:
+            query = query.filter(
+                User.id.in_(
+                    select(UserRole.user_id)
+                    .join(Role, Role.id == UserRole.role_id)
+                    .filter(Role.role == role.value)
+                )
+            )
+        if is_active is not None:
+            query = query.filter(User.is_active == is_active)
+        if is_verified is not None:
+            query = query.filter(User.is_verified == is_verified)
+        if created_from:
+            query = query.filter(User.created_at >= created_from)
+        if created_to:
+            query = query.filter(User.created_at < created_to)
+        return query
+
+    async def get_users(
+        self, limit: int, cursor: Optional[str] = None, **filters
+    ) -> dict:
+        query = self._list_query(**filters)
+
+        if cursor:
+            try:
+                created_at, user_id = decode_cursor(cursor)
+                position = (datetime.fromisoformat(created_at), UUID(user_id))
+            except (TypeError, ValueError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+                )
+            query = query.filter(tuple_(User.created_at, User.id) > position)
+
+        items: List = (await self.db.execute(query.limit(limit + 1))).all()
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].created_at.isoformat(), items[-1].id)
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def stream_users(self, **filters) -> AsyncIterator[str]:
+        # yield_per opens a server-side cursor, so only one chunk of rows is
+        # held in memory at a time however many users there are.
+        result = await self.db.stream(
+            self._list_query(**filters).execution_options(
+                yield_per=USERS_EXPORT_CHUNK_SIZE
+            )
+        )
+
+        async def rows() -> AsyncIterator[str]:
+            async for partition in result.partitions():
+                yield "".join(
+                    schemas.UserResponse.model_validate(user).model_dump_json(
+                        by_alias=True
+                    )
+                    + "\n"
+                    for user in partition
+                )
+
+        return rows()
@@ -1,24 +1,37 @@
+from datetime import datetime, timezone
+from os import getenv
 from uuid import UUID
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
-from models import Wallet
+from models import JobWatermark, Transaction, Wallet, WalletShard, WalletStatement
 from schemas import WalletCreate
+from services.statements import STATEMENT_WATERMARK, day_start
+from utils import TransactionStatus
+
+WALLET_MAX_SHARDS = int(getenv("WALLET_MAX_SHARDS", 32))
+
+# Wallet.total_balance and pending_balance are deferred; only the reads that
+# report them load the sums.
+WALLET_BALANCES = ["total_balance", "pending_balance"]
 
 
 class WalletService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_wallet(self, user_id: UUID, wallet_data: WalletCreate) -> Wallet:
+    async def create_wallet(self, user_id: UUID, wallet_data: WalletCreate) -> Wallet:
         currency_code = wallet_data.currency.upper()
+        self._check_shard_count(wallet_data.shard_count)
 
-        existing_wallet = (
-            self.db.query(Wallet)
-            .filter(Wallet.user_id == user_id, Wallet.currency == currency_code)
-            .first()
+        existing_wallet = await self.db.scalar(
+            select(Wallet).filter(
+                Wallet.user_id == user_id, Wallet.currency == currency_code
+            )
         )
 
         if existing_wallet:
@@ -27,29 +40,53 @@ class WalletService:
                 detail=f"You already have a {currency_code} wallet.",
             )
 
-        new_wallet = Wallet(user_id=user_id, currency=currency_code, balance=0)
+        new_wallet = Wallet(
+            user_id=user_id,
+            currency=currency_code,
+            balance=0,
+            shard_count=wallet_data.shard_count,
+            deferred_credits=wallet_data.deferred_credits,
+        )
 
         try:
             self.db.add(new_wallet)
-            self.db.commit()
-            self.db.refresh(new_wallet)
+            await self.db.flush()
+            await self._add_shards(new_wallet.id, 1, wallet_data.shard_count)
+            await self.db.commit()
+            await self.db.refresh(new_wallet, WALLET_BALANCES)
             return new_wallet
         except IntegrityError:
-            self.db.rollback()
+            await self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Could not create wallet.",
             )
 
-    def get_my_wallets(self, user_id: UUID) -> List[Wallet]:
-        return self.db.query(Wallet).filter(Wallet.user_id == user_id).all()
+    async def get_my_wallet_ids(self, user_id: UUID) -> List[UUID]:
+        return (
+            await self.db.scalars(select(Wallet.id).filter(Wallet.user_id == user_id))
+        ).all()
 
-    def get_wallet(self, user_id: UUID, currency: str) -> Wallet:
-        wallet = (
-            self.db.query(Wallet)
-            .filter(Wallet.user_id == user_id, Wallet.currency == currency.upper())
-            .first()
+    async def get_my_wallets(self, user_id: UUID) -> List[Wallet]:
+        return (
+            await self.db.scalars(
+                select(Wallet)
+                .filter(Wallet.user_id == user_id)
+                .options(undefer(Wallet.total_balance), undefer(Wallet.pending_balance))
+            )
+        ).all()
+
+    async def get_wallet(
+        self, user_id: UUID, currency: str, with_balances: bool = False
+    ) -> Wallet:
+        query = select(Wallet).filter(
+            Wallet.user_id == user_id, Wallet.currency == currency.upper()
         )
+        if with_balances:
+            query = query.options(
+                undefer(Wallet.total_balance), undefer(Wallet.pending_balance)
+            )
+        wallet = await self.db.scalar(query)
 
         if not wallet:
             raise HTTPException(
@@ -57,3 +94,115 @@ class WalletService:
                 detail=f"No {currency.upper()} wallet found.",
             )
         return wallet
+
+    async def get_balance_at(self, user_id: UUID, currency: str, at: datetime) -> dict:
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        wallet = await self.get_wallet(user_id=user_id, currency=currency)
+
+        # Days before the tail are answered by their statement; the tail is
+        # the day of `at`, or everything since the watermark if the rollup
+        # has not reached that day yet.
+        tail_start = day_start(at.astimezone(timezone.utc).date())
+        watermark = await self.db.scalar(
+            select(JobWatermark.position).filter(
+                JobWatermark.name == STATEMENT_WATERMARK
+            )
+        )
+        if watermark is None or watermark < tail_start:
+            tail_start = watermark
+
+        # The balance is the nearest statement's closing plus the completed
+        # tail rows up to `at`, summed rather than read from balance_after.
+        opening_balance = literal(0)
+        tail = select(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+            Transaction.wallet_id == wallet.id,
+            Transaction.status == TransactionStatus.COMPLETED.value,
+            Transaction.created_at <= at,
+        )
+        if tail_start is not None:
+            opening_balance = (
+                select(WalletStatement.closing_balance)
+                .filter(
+                    WalletStatement.wallet_id == wallet.id,
+                    WalletStatement.day < tail_start.date(),
+                )
+                .order_by(WalletStatement.day.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            tail = tail.filter(Transaction.created_at >= tail_start)
+        balance = await self.db.scalar(
+            select(func.coalesce(opening_balance, 0) + tail.scalar_subquery())
+        )
+
+        return {
+            "currency": wallet.currency,
+            "at": at,
+            "balance": balance,
+        }
+
+    async def set_shard_count(
+        self, user_id: UUID, currency: str, shard_count: int
+    ) -> Wallet:
+        self._check_shard_count(shard_count)
+
+        wallet = await self.db.scalar(
+            select(Wallet)
+            .filter(Wallet.user_id == user_id, Wallet.currency == currency.upper())
+            .with_for_update()
+        )
+        if not wallet:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No {currency.upper()} wallet found.",
+            )
+
+        # Shards beyond the new count are folded back into shard 0.
+        folded = (
+            await self.db.scalars(
+                delete(WalletShard)
+                .filter(
+                    WalletShard.wallet_id == wallet.id,
+                    WalletShard.shard_no >= shard_count,
+                )
+                .returning(WalletShard.balance)
+            )
+        ).all()
+        wallet.balance += sum(folded)
+
+        await self._add_shards(wallet.id, wallet.shard_count, shard_count)
+        wallet.shard_count = shard_count
+
+        await self.db.commit()
+        await self.db.refresh(wallet, WALLET_BALANCES)
+        return wallet
+
+    async def set_deferred_credits(
+        self, user_id: UUID, currency: str, deferred_credits: bool
+    ) -> Wallet:
+        wallet = await self.get_wallet(user_id=user_id, currency=currency)
+        # Credits already queued are still settled by the aggregator after
+        # switching back to immediate credits.
+        wallet.deferred_credits = deferred_credits
+        await self.db.commit()
+        await self.db.refresh(wallet, WALLET_BALANCES)
+        return wallet
+
+    async def _add_shards(self, wallet_id: UUID, start: int, stop: int) -> None:
+        if start < stop:
+            await self.db.execute(
+                insert(WalletShard),
+                [
+                    {"wallet_id": wallet_id, "shard_no": shard_no, "balance": 0}
+                    for shard_no in range(start, stop)
+                ],
+            )
+
+    @staticmethod
+    def _check_shard_count(shard_count: int) -> None:
+        if shard_count > WALLET_MAX_SHARDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A wallet can have at most {WALLET_MAX_SHARDS} shards.",
+            )
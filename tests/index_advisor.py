@@ -0,0 +1,171 @@
+"""EXPLAIN every query the test suite issues and report unindexed filters.
+
+    python -m pytest -p tests.index_advisor --index-advisor
+
+Each statement is planned with enable_seqscan off, so a Seq Scan that still
+carries a Filter means no index can serve that predicate.
+"""
+
+from collections import defaultdict
+from os import getenv
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+INDEX_ADVISOR_MIN_ROWS = int(getenv("INDEX_ADVISOR_MIN_ROWS", 0))
+
+EXPLAINABLE = ("select", "update", "delete", "with", "insert")
+CATALOGS = ("pg_catalog.", "information_schema.")
+
+
+class IndexAdvisor:
+    def __init__(self, min_rows: int, dsn: str = None):
+        self.min_rows = min_rows
+        self.dsn = dsn
+        self.pending = []
+        self.findings = defaultdict(set)
+        self._engines = {}
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        if (
+            conn.info.get("index_advisor")
+            or not statement.lstrip().lower().startswith(EXPLAINABLE)
+            or any(catalog in statement for catalog in CATALOGS)
+        ):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        if context.dialect.paramstyle != "numeric_dollar":
+            statement = cursor.mogrify(statement, parameters).decode()
+        self.pending.append((conn.engine.url, statement))
+
+    def _engine(self, url):
+        url = self.dsn or url.set(drivername="postgresql+psycopg2")
+        if url not in self._engines:
+            engine = create_engine(url, poolclass=NullPool)
+            event.listen(
+                engine,
+                "engine_connect",
+                lambda conn: conn.info.__setitem__("index_advisor", True),
+            )
+            self._engines[url] = engine
+        return self._engines[url]
+
+    def flush(self, nodeid: str):
+        pending, self.pending = self.pending, []
+        by_url = defaultdict(list)
+        for url, statement in pending:
+            by_url[url].append(statement)
+
+        for url, statements in by_url.items():
+            with self._engine(url).connect() as conn:
+                conn.execute(text("SET enable_seqscan = off"))
+                for statement in statements:
+                    for table, condition in self._explain(conn, statement):
+                        self.findings[(table, condition)].add(nodeid)
+
+    def _explain(self, conn, statement: str):
+        generic = "GENERIC_PLAN, " if "$1" in statement else ""
+        savepoint = conn.begin_nested()
+        try:
+            (plan,) = conn.exec_driver_sql(
+                f"EXPLAIN ({generic}FORMAT JSON) {statement}"
+            ).scalar()
+        except Exception:
+            savepoint.rollback()
+            return
+        savepoint.commit()
+
+        for node in self._seq_scans(plan["Plan"]):
+            rows = conn.scalar(
+                text(
+                    "SELECT GREATEST(reltuples, 0) FROM pg_class "
+                    "WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": f'"{node["Relation Name"]}"'},
+            )
+            if rows is not None and rows >= self.min_rows:
+                yield node["Relation Name"], node["Filter"]
+
+    def _seq_scans(self, node):
+        if node.get("Node Type") == "Seq Scan" and "Filter" in node:
+            yield node
+        for child in node.get("Plans", []):
+            yield from self._seq_scans(child)
+
+    def close(self):
+        for engine in self._engines.values():
+            engine.dispose()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("index-advisor")
+    group.addoption(
+        "--index-advisor",
+        action="store_true",
+        help="EXPLAIN every query and report sequential scans that need an index.",
+    )
+    group.addoption(
+        "--index-advisor-min-rows",
+        type=int,
+        default=INDEX_ADVISOR_MIN_ROWS,
+        help="Ignore tables whose estimated row count is below this threshold.",
+    )
+    group.addoption(
+        "--index-advisor-dsn",
+        default=None,
+        help="Plan against this database (e.g. a staging copy) instead of the test DB.",
+    )
+    group.addoption(
+        "--index-advisor-strict",
+        action="store_true",
+        help="Fail the run when any sequential scan is reported.",
+    )
+
+
+def pytest_configure(config):
+    if not config.getoption("index_advisor"):
+        return
+    advisor = IndexAdvisor(
+        config.getoption("index_advisor_min_rows"),
+        config.getoption("index_advisor_dsn"),
+    )
+    event.listen(Engine, "before_cursor_execute", advisor.capture)
+    config._index_advisor = advisor
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    yield
+    advisor = getattr(item.config, "_index_advisor", None)
+    if advisor:
+        # Plan while the test's tables and rows still exist.
+        advisor.flush(item.nodeid)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    advisor = getattr(config, "_index_advisor", None)
+    if not advisor:
+        return
+    advisor.close()
+
+    terminalreporter.section("index advisor")
+    if not advisor.findings:
+        terminalreporter.write_line("No unindexed sequential scans found.")
+        return
+    for (table, condition), nodeids in sorted(advisor.findings.items()):
+        terminalreporter.write_line(f"Seq Scan on {table}: {condition}", red=True)
+        for nodeid in sorted(nodeids):
+            terminalreporter.write_line(f"    {nodeid}")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    advisor = getattr(session.config, "_index_advisor", None)
+    if (
+        advisor
+        and advisor.findings
+        and session.config.getoption("index_advisor_strict")
+    ):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+import schemas
+from models import Transaction, User, Wallet
+from services import TransactionService
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+)
+
+
+def batch(*items):
+    return [
+        schemas.BatchTransferItem(receiver_email=email, amount=Decimal(amount))
+        for email, amount in items
+    ]
+
+
+def balances(db):
+    return dict(db.execute(select(User.username, Wallet.balance).join(Wallet)).all())
+
+
+@pytest.mark.asyncio
+async def test_atomic_batch_rolls_back_on_insufficient_funds(db_setup):
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 50).id
+        create_wallet_owner(db, "alice", 0)
+        create_wallet_owner(db, "bob", 0)
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as error:
+            await TransactionService(db).transfer_batch(
+                sender_id,
+                "EGP",
+                batch(("alice@example.com", "40"), ("bob@example.com", "20")),
+            )
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Transfer #1: Insufficient funds"
+    with TestingSessionLocal() as db:
+        assert balances(db) == {"sender": 50, "alice": 0, "bob": 0}
+        assert db.scalar(select(Transaction.id)) is None
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_keeps_the_transfers_that_fit(db_setup):
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 50).id
+        create_wallet_owner(db, "alice", 0)
+        create_wallet_owner(db, "bob", 0)
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        result = await TransactionService(db).transfer_batch(
+            sender_id,
+            "EGP",
+            batch(
+                ("alice@example.com", "30"),
+                ("nobody@example.com", "5"),
+                ("bob@example.com", "30"),
+                ("bob@example.com", "20"),
+            ),
+            mode="partial",
+        )
+
+    assert (result["completed"], result["failed"]) == (2, 2)
+    assert [item["error"] for item in result["results"]] == [
+        None,
+        "Receiver not found",
+        "Insufficient funds",
+        None,
+    ]
+    with TestingSessionLocal() as db:
+        assert balances(db) == {"sender": 0, "alice": 30, "bob": 20}
+
+        # The sender's rows sort in the order their balances were computed.
+        history = db.scalars(
+            select(Transaction.balance_after)
+            .join(Wallet)
+            .filter(Wallet.user_id == sender_id)
+            .order_by(Transaction.created_at, Transaction.id)
+        ).all()
+    assert history == [Decimal("20"), Decimal("0")]
@@ -0,0 +1,116 @@
+import base64
+import csv
+import io
+import json
+
+from utils import encode_cursor
+
+HISTORY_URL = "/api/v1/wallets/EGP/transactions"
+
+
+def fund_wallet(client, authenticated_user, deposits: int):
+    headers = authenticated_user["header"]
+    response = client.post(
+        "/api/v1/wallets/",
+        json={"user_id": authenticated_user["id"], "currency": "EGP"},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    for amount in range(1, deposits + 1):
+        response = client.post(
+            "/api/v1/transaction/deposit",
+            json={"amount": str(amount), "currency": "EGP"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+    response = client.post(
+        "/api/v1/transaction/withdraw",
+        json={"amount": "1", "currency": "EGP"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return headers
+
+
+def test_history_pages_cover_every_row_once(client, authenticated_user):
+    headers = fund_wallet(client, authenticated_user, deposits=4)
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get(HISTORY_URL, params=params, headers=headers).json()
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(items) for items in pages] == [2, 2, 1]
+    rows = [item for items in pages for item in items]
+    assert len({row["id"] for row in rows}) == 5
+    assert [row["amount"] for row in rows] == [
+        "-1.0000",
+        "4.0000",
+        "3.0000",
+        "2.0000",
+        "1.0000",
+    ]
+
+    # An exactly full last page has no cursor to an empty one.
+    page = client.get(HISTORY_URL, params={"limit": 5}, headers=headers).json()
+    assert len(page["items"]) == 5
+    assert page["next_cursor"] is None
+
+
+def test_history_filters(client, authenticated_user):
+    headers = fund_wallet(client, authenticated_user, deposits=3)
+
+    page = client.get(
+        HISTORY_URL, params={"type": "withdrawal"}, headers=headers
+    ).json()
+    assert [item["type"] for item in page["items"]] == ["withdrawal"]
+
+    newest = client.get(HISTORY_URL, params={"limit": 1}, headers=headers).json()
+    created_at = newest["items"][0]["created_at"]
+    page = client.get(
+        HISTORY_URL, params={"created_to": created_at}, headers=headers
+    ).json()
+    assert [item["type"] for item in page["items"]] == ["deposit"] * 3
+    page = client.get(
+        HISTORY_URL, params={"created_from": created_at}, headers=headers
+    ).json()
+    assert [item["type"] for item in page["items"]] == ["withdrawal"]
+
+
+def test_history_rejects_invalid_cursors(client, authenticated_user):
+    headers = fund_wallet(client, authenticated_user, deposits=1)
+
+    cursors = [
+        "not-a-cursor",
+        encode_cursor("yesterday", "abc"),
+        encode_cursor(1),
+        base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    ]
+    for cursor in cursors:
+        response = client.get(HISTORY_URL, params={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_export_streams_the_filtered_history(client, authenticated_user):
+    headers = fund_wallet(client, authenticated_user, deposits=3)
+
+    response = client.get(f"{HISTORY_URL}/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["amount"] for row in rows] == ["-1.0000", "3.0000", "2.0000", "1.0000"]
+
+    response = client.get(
+        f"{HISTORY_URL}/export",
+        params={"format": "csv", "type": "deposit"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert 'filename="EGP-transactions.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["amount"] for row in rows] == ["3.0000", "2.0000", "1.0000"]
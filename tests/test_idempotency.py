@@ -0,0 +1,97 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from models import Transaction, Wallet
+from services import IdempotencyStore, TransactionService
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+)
+from utils import TransactionType
+
+
+def deposit(client, headers, amount, key="retry-1"):
+    return client.post(
+        "/api/v1/transaction/deposit",
+        json={"amount": amount, "currency": "EGP"},
+        headers={**headers, "Idempotency-Key": key},
+    )
+
+
+def create_wallet(client, authenticated_user):
+    response = client.post(
+        "/api/v1/wallets/",
+        json={"user_id": authenticated_user["id"], "currency": "EGP"},
+        headers=authenticated_user["header"],
+    )
+    assert response.status_code == 201
+
+
+def test_replay_returns_the_original_transaction(client, authenticated_user):
+    headers = authenticated_user["header"]
+    create_wallet(client, authenticated_user)
+
+    first = deposit(client, headers, "10")
+    replay = deposit(client, headers, "10")
+
+    assert first.status_code == replay.status_code == 200
+    assert replay.json() == first.json()
+    wallet = client.get("/api/v1/wallets/EGP", headers=headers).json()
+    assert Decimal(wallet["balance"]) == Decimal("10")
+
+
+def test_key_reused_for_a_different_request_conflicts(client, authenticated_user):
+    headers = authenticated_user["header"]
+    create_wallet(client, authenticated_user)
+    assert deposit(client, headers, "10").status_code == 200
+
+    assert deposit(client, headers, "25").status_code == 409
+    response = client.post(
+        "/api/v1/transaction/withdraw",
+        json={"amount": "10", "currency": "EGP"},
+        headers={**headers, "Idempotency-Key": "retry-1"},
+    )
+    assert response.status_code == 409
+
+    wallet = client.get("/api/v1/wallets/EGP", headers=headers).json()
+    assert Decimal(wallet["balance"]) == Decimal("10")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_execution(db_setup):
+    with TestingSessionLocal() as db:
+        user_id = create_wallet_owner(db, "payer", 0).id
+        db.commit()
+
+    store = IdempotencyStore()
+    reference_id = IdempotencyStore.reference_id(user_id, "retry-1")
+    release, calls = asyncio.Event(), []
+
+    async def request():
+        async with TestingAsyncSessionLocal() as db:
+
+            async def operation():
+                calls.append(reference_id)
+                await release.wait()
+                return await TransactionService(db).deposit(
+                    user_id, Decimal("10"), "EGP", reference_id=reference_id
+                )
+
+            return await store.run(
+                db, reference_id, TransactionType.DEPOSIT, Decimal("10"), operation
+            )
+
+    requests = [asyncio.ensure_future(request()) for _ in range(3)]
+    await asyncio.sleep(0.1)
+    release.set()
+    responses = await asyncio.gather(*requests)
+
+    assert len(calls) == 1
+    assert len({response.id for response in responses}) == 1
+    with TestingSessionLocal() as db:
+        assert db.scalar(select(Wallet.balance)) == Decimal("10")
+        assert len(db.scalars(select(Transaction.id)).all()) == 1
@@ -0,0 +1,41 @@
+import json
+from uuid import uuid4
+
+import pytest
+
+from services import LedgerBroadcaster
+from services.ledger import RESYNC
+
+
+def ledger_payload(wallet_id) -> str:
+    return json.dumps({"id": str(uuid4()), "wallet_id": str(wallet_id)})
+
+
+@pytest.mark.asyncio
+async def test_events_reach_only_subscribers_of_the_wallet():
+    broadcaster = LedgerBroadcaster()
+    wallet_id, other_wallet_id = uuid4(), uuid4()
+    subscription = broadcaster.subscribe([wallet_id])
+    other = broadcaster.subscribe([other_wallet_id])
+
+    payload = ledger_payload(wallet_id)
+    broadcaster.publish(payload)
+
+    assert await subscription.get() == ("transaction", payload)
+    assert other._queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_told_to_resync():
+    broadcaster = LedgerBroadcaster(queue_size=2)
+    wallet_id = uuid4()
+    subscription = broadcaster.subscribe([wallet_id])
+
+    for _ in range(3):
+        broadcaster.publish(ledger_payload(wallet_id))
+
+    assert await subscription.get() == RESYNC
+    assert subscription._queue.empty()
+
+    broadcaster.unsubscribe(subscription)
+    assert broadcaster.snapshot() == {"subscribers": 0, "wallets": 0}
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from sqlalchemy import select, update
+
+from models import OutboxEvent, User
+from tests.conftest import TestingSessionLocal
+from utils import CompiledTemplate, TemplateRegistry, mail_templates
+
+
+def test_values_are_html_escaped():
+    template = CompiledTemplate("greeting.html", "<p>Hello {first_name}</p>")
+
+    rendered = template.render({"first_name": "<script>alert(1)</script>"})
+
+    assert "<script>" not in rendered
+    assert rendered == "<p>Hello &lt;script&gt;alert(1)&lt;/script&gt;</p>"
+
+
+def test_missing_placeholder_raises():
+    template = CompiledTemplate("greeting.html", "<p>{first_name} {last_name}</p>")
+
+    with pytest.raises(ValueError, match="greeting.html is missing last_name"):
+        template.render({"first_name": "Test"})
+
+
+def test_unknown_template_raises(tmp_path):
+    with pytest.raises(KeyError):
+        TemplateRegistry(str(tmp_path)).get("missing.html")
+
+
+def test_every_template_renders_with_its_route_context(client, authenticated_user):
+    headers = authenticated_user["header"]
+    with TestingSessionLocal() as db:
+        db.execute(update(User).values(is_verified=False))
+        db.commit()
+
+    responses = [
+        client.post("/api/v1/auth/verify-email/", headers=headers),
+        client.post("/api/v1/auth/forgot-password", json={"email": "test@example.com"}),
+        client.post(
+            "/api/v1/auth/request-email-change",
+            json={"new_email": "new@example.com"},
+            headers=headers,
+        ),
+    ]
+    assert [response.status_code for response in responses] == [200] * 3
+
+    with TestingSessionLocal() as db:
+        payloads = db.scalars(select(OutboxEvent.payload).order_by(OutboxEvent.id))
+        rendered = {
+            payload["template"]: mail_templates.render(
+                payload["template"], payload["context"]
+            )
+            for payload in payloads
+        }
+
+    assert sorted(rendered) == sorted(os.listdir(mail_templates.directory))
+    assert "new@example.com" in rendered["email_change_mail.html"]
+    assert "testuser" in rendered["password_reset_mail.html"]
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+from models import OutboxEvent
+from services import OutboxRelay, enqueue_event
+from tests.conftest import TestingAsyncSessionLocal
+
+
+async def queued_events() -> int:
+    async with TestingAsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(OutboxEvent))
+
+
+async def enqueue(*payloads) -> None:
+    async with TestingAsyncSessionLocal() as db:
+        for payload in payloads:
+            await enqueue_event(db, "email", payload)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_event_exists_only_if_the_transaction_commits(db_setup):
+    async with TestingAsyncSessionLocal() as db:
+        await enqueue_event(db, "email", {"n": 1})
+        await db.rollback()
+    assert await queued_events() == 0
+
+    await enqueue({"n": 2})
+    sent = []
+    assert await OutboxRelay(TestingAsyncSessionLocal, {"email": sent.extend}).drain()
+    assert sent == [{"n": 2}]
+    assert await queued_events() == 0
+
+
+@pytest.mark.asyncio
+async def test_failing_transport_leaves_events_queued(db_setup):
+    await enqueue({"n": 1}, {"n": 2})
+
+    def broken(batch):
+        raise ConnectionError("broker is down")
+
+    with pytest.raises(ConnectionError):
+        await OutboxRelay(TestingAsyncSessionLocal, {"email": broken}).drain()
+    assert await queued_events() == 2
+
+    sent = []
+    await OutboxRelay(TestingAsyncSessionLocal, {"email": sent.extend}).drain()
+    assert sent == [{"n": 1}, {"n": 2}]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_relays_take_disjoint_events(db_setup):
+    await enqueue(*({"n": n} for n in range(4)))
+    first_sent, second_sent = [], []
+    handed_over, release = threading.Event(), threading.Event()
+
+    def blocking_transport(batch):
+        first_sent.extend(batch)
+        handed_over.set()
+        release.wait(5)
+
+    first = OutboxRelay(
+        TestingAsyncSessionLocal, {"email": blocking_transport}, batch_size=2
+    )
+    second = OutboxRelay(
+        TestingAsyncSessionLocal, {"email": second_sent.extend}, batch_size=2
+    )
+
+    # The first relay holds its batch's row locks until release is set.
+    draining = asyncio.ensure_future(first.drain())
+    assert await asyncio.to_thread(handed_over.wait, 5)
+    assert await second.drain() == 2
+    release.set()
+    assert await draining == 2
+
+    assert first_sent == [{"n": 0}, {"n": 1}]
+    assert second_sent == [{"n": 2}, {"n": 3}]
+    assert await queued_events() == 0
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models import User
+from tests.conftest import TestingSessionLocal
+from utils import (
+    PasswordHasher,
+    hash_password,
+    needs_rehash,
+    password_hasher,
+    verify_password,
+)
+
+
+def blocked(release: threading.Event) -> str:
+    release.wait(5)
+    return "done"
+
+
+def broken() -> None:
+    raise ValueError("invalid salt")
+
+
+@pytest.mark.asyncio
+async def test_saturated_hasher_sheds_load_and_releases_slots():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    hasher._executor = ThreadPoolExecutor(2)
+    release = threading.Event()
+    try:
+        running = [
+            asyncio.ensure_future(hasher._run(blocked, release)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert hasher._inflight == 2
+
+        with pytest.raises(HTTPException) as error:
+            await hasher._run(blocked, release)
+        assert error.value.status_code == 429
+        assert error.value.headers == {"Retry-After": "1"}
+
+        release.set()
+        assert await asyncio.gather(*running) == ["done", "done"]
+        assert hasher._inflight == 0
+
+        with pytest.raises(ValueError):
+            await hasher._run(broken)
+        assert hasher._inflight == 0
+    finally:
+        release.set()
+        hasher.close()
+
+
+@pytest.mark.parametrize("cost, expected", [(4, True), (5, False), (6, True)])
+def test_needs_rehash_when_the_cost_differs(cost, expected):
+    assert needs_rehash(hash_password("password123", rounds=cost), 5) is expected
+    assert (
+        PasswordHasher(rounds=5).needs_rehash(hash_password("password123", rounds=cost))
+        is expected
+    )
+
+
+def test_login_rehashes_an_old_cost_hash(client, monkeypatch):
+    monkeypatch.setattr(password_hasher, "rounds", 5)
+    with TestingSessionLocal() as db:
+        db.add(
+            User(
+                username="olduser",
+                email="old@example.com",
+                password_hash=hash_password("password123", rounds=4),
+                first_name="Old",
+                last_name="User",
+                gender="male",
+                is_verified=True,
+            )
+        )
+        db.commit()
+
+    response = client.post(
+        "/api/v1/auth/token", data={"username": "olduser", "password": "password123"}
+    )
+    assert response.status_code == 200
+
+    with TestingSessionLocal() as db:
+        password_hash = db.scalar(
+            select(User.password_hash).filter(User.username == "olduser")
+        )
+    assert password_hash.split("$")[2] == "05"
+    assert verify_password("password123", password_hash)
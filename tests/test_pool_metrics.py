@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+import database
+from tests.conftest import ASYNC_SQLALCHEMY_DATABASE_URL, grant_role
+from utils import PoolMetrics
+
+
+def test_pool_settings_reach_the_engines():
+    env = {**os.environ, "DATABASE_POOL_SIZE": "3", "DATABASE_MAX_OVERFLOW": "2"}
+    # A fresh interpreter, since the engines are built at import time.
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import database\n"
+            "for engine in (database.engine, database.async_engine):\n"
+            "    print(engine.pool.size(), engine.pool._max_overflow)",
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output.split("\n")[:2] == ["3 2", "3 2"]
+
+
+@pytest.mark.asyncio
+async def test_pool_endpoint_reports_checkouts(client, authenticated_user, monkeypatch):
+    grant_role(authenticated_user["id"], "admin")
+    metrics = PoolMetrics()
+    engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        poolclass=metrics.pool_class(AsyncAdaptedQueuePool),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    metrics.instrument(engine.sync_engine)
+    monkeypatch.setattr(database, "async_pool_metrics", metrics)
+
+    connections = [await engine.connect() for _ in range(2)]
+    try:
+        with pytest.raises(PoolTimeoutError):
+            await engine.connect()
+
+        response = client.get(
+            "/api/v1/internal/metrics/pool", headers=authenticated_user["header"]
+        )
+        assert response.status_code == 200
+        snapshot = response.json()["async_engine"]
+    finally:
+        for connection in connections:
+            await connection.close()
+        await engine.dispose()
+
+    counters = ("size", "checked_out", "overflow", "overflow_events", "timeouts")
+    assert [snapshot[counter] for counter in counters] == [1, 2, 1, 1, 1]
+    assert snapshot["checkouts"] == snapshot["peak_checked_out"] == 2
+    assert snapshot["wait"]["count"] == 3
+    assert snapshot["wait"]["max_ms"] >= 100
+    assert snapshot["connection_age_seconds"]["open"] == 2
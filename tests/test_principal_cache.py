@@ -0,0 +1,114 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text, update
+
+import oauth2
+from models import User
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal
+from utils import PgListener, hash_token
+
+
+def test_logout_revokes_cached_principal(client, authenticated_user):
+    headers = authenticated_user["header"]
+    access_token = headers["Authorization"].removeprefix("Bearer ")
+
+    # The second call is answered from the principal cache.
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+    client.cookies.set("refresh_token", "unused")
+    response = client.post(
+        "/api/v1/auth/logout", headers={**headers, "access-token": access_token}
+    )
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 401
+
+
+def test_logout_keeps_other_sessions_cached(client, authenticated_user):
+    headers = authenticated_user["header"]
+    access_token = headers["Authorization"].removeprefix("Bearer ")
+    other_token = oauth2.create_token(
+        {"sub": "testuser", "v": 1}, expires_delta=timedelta(minutes=5)
+    )
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+    for session in (headers, other_headers):
+        assert client.get("/api/v1/users/me/", headers=session).status_code == 200
+
+    client.cookies.set("refresh_token", "unused")
+    response = client.post(
+        "/api/v1/auth/logout", headers={**headers, "access-token": access_token}
+    )
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/users/me/", headers=headers).status_code == 401
+    assert oauth2.principal_cache.get((hash_token(other_token), 1)) is not None
+    assert client.get("/api/v1/users/me/", headers=other_headers).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_invalidation_from_another_process_drops_cached_principal(
+    client, authenticated_user
+):
+    headers = authenticated_user["header"]
+    listener = PgListener(SQLALCHEMY_DATABASE_URL)
+    connected, delivered = asyncio.Event(), asyncio.Event()
+
+    def on_invalidation(payload):
+        oauth2.discard_principals(payload)
+        (delivered if payload is not None else connected).set()
+
+    listener.subscribe(oauth2.PRINCIPAL_CACHE_CHANNEL, on_invalidation)
+    await listener.start()
+    try:
+        await asyncio.wait_for(connected.wait(), 5)
+        assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+
+        # Another worker bumps the token version and broadcasts, without
+        # touching this process' cache directly.
+        with TestingSessionLocal() as db:
+            db.execute(
+                update(User)
+                .filter(User.username == "testuser")
+                .values(token_version=User.token_version + 1)
+            )
+            assert client.get("/api/v1/users/me/", headers=headers).status_code == 200
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {
+                    "channel": oauth2.PRINCIPAL_CACHE_CHANNEL,
+                    "payload": f"user:{authenticated_user['id']}",
+                },
+            )
+            db.commit()
+
+        await asyncio.wait_for(delivered.wait(), 5)
+        assert client.get("/api/v1/users/me/", headers=headers).status_code == 401
+    finally:
+        await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_failing_callback_does_not_stop_other_subscribers():
+    listener = PgListener(SQLALCHEMY_DATABASE_URL)
+    connected, delivered = asyncio.Event(), asyncio.Event()
+
+    def broken(payload):
+        raise RuntimeError("boom")
+
+    def on_payload(payload):
+        (delivered if payload is not None else connected).set()
+
+    listener.subscribe("listener_test", broken)
+    listener.subscribe("listener_test", on_payload)
+    await listener.start()
+    try:
+        await asyncio.wait_for(connected.wait(), 5)
+        with TestingSessionLocal() as db:
+            db.execute(text("NOTIFY listener_test, 'ping'"))
+            db.commit()
+        await asyncio.wait_for(delivered.wait(), 5)
+    finally:
+        await listener.stop()
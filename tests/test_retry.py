@@ -0,0 +1,210 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+import utils
+from models import Transaction, User, Wallet
+from services import GroupedTransfer, TransactionService
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+    grant_role,
+)
+from utils import retry as retry_module
+
+
+class DriverError(Exception):
+    def __init__(self, pgcode: str):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+def conflict(pgcode: str = "40P01") -> DBAPIError:
+    return DBAPIError("COMMIT", None, DriverError(pgcode))
+
+
+def fail_after(monkeypatch, method: str, errors: list) -> list:
+    # Runs the real method, then raises the next queued error (None lets that
+    # call through), so a failed attempt has already written to the database
+    # before it is rolled back.
+    original = getattr(TransactionService, method)
+    calls = []
+
+    async def wrapper(self, *args, **kwargs):
+        calls.append(method)
+        result = await original(self, *args, **kwargs)
+        error = errors.pop(0) if errors else None
+        if error is not None:
+            raise error
+        return result
+
+    monkeypatch.setattr(TransactionService, method, wrapper)
+    return calls
+
+
+@pytest.fixture()
+def accounts(db_setup, monkeypatch):
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_BASE_DELAY", 0)
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 100).id
+        create_wallet_owner(db, "receiver", 0)
+        db.commit()
+    return sender_id
+
+
+def ledger():
+    with TestingSessionLocal() as db:
+        balances = dict(
+            db.execute(select(User.username, Wallet.balance).join(Wallet)).all()
+        )
+        rows = db.scalar(select(func.count()).select_from(Transaction))
+    return balances, rows
+
+
+async def transfer(sender_id, amount="30"):
+    async with TestingAsyncSessionLocal() as db:
+        return await TransactionService(db).transfer(
+            sender_id, "receiver@example.com", Decimal(amount), "EGP"
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pgcode", ["40P01", "40001"])
+async def test_conflict_is_retried_and_applied_once(accounts, monkeypatch, pgcode):
+    calls = fail_after(monkeypatch, "_insert_transfer_pair", [conflict(pgcode)])
+
+    outgoing = await transfer(accounts)
+
+    assert len(calls) == 2
+    assert outgoing.balance_after == Decimal("70")
+    assert ledger() == ({"sender": 70, "receiver": 30}, 2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error, status_code",
+    [
+        (IntegrityError("INSERT", None, DriverError("23505")), 500),
+        (HTTPException(status_code=409, detail="Duplicate"), 409),
+    ],
+)
+async def test_other_errors_are_not_retried(accounts, monkeypatch, error, status_code):
+    calls = fail_after(monkeypatch, "_insert_transfer_pair", [error])
+
+    with pytest.raises(HTTPException) as raised:
+        await transfer(accounts)
+
+    assert raised.value.status_code == status_code
+    assert len(calls) == 1
+    assert ledger() == ({"sender": 100, "receiver": 0}, 0)
+
+
+@pytest.mark.asyncio
+async def test_exhausted_attempts_return_503(accounts, monkeypatch):
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_MAX_ATTEMPTS", 3)
+    calls = fail_after(monkeypatch, "_insert_transfer_pair", [conflict()] * 5)
+
+    with pytest.raises(HTTPException) as raised:
+        await transfer(accounts)
+
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "1"}
+    assert len(calls) == 3
+    assert ledger() == ({"sender": 100, "receiver": 0}, 0)
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_returns_503(accounts, monkeypatch):
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_BUDGET", 0)
+    calls = fail_after(monkeypatch, "_insert_transfer_pair", [conflict()] * 5)
+
+    with pytest.raises(HTTPException) as raised:
+        await transfer(accounts)
+
+    assert raised.value.status_code == 503
+    assert len(calls) == 1
+
+
+def test_retry_metrics_endpoint(client, authenticated_user, monkeypatch):
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(utils, "retry_metrics", utils.RetryMetrics())
+    monkeypatch.setattr(retry_module, "retry_metrics", utils.retry_metrics)
+    grant_role(authenticated_user["id"], "admin")
+    headers = authenticated_user["header"]
+    with TestingSessionLocal() as db:
+        create_wallet_owner(db, "receiver", 0)
+        db.commit()
+    client.post(
+        "/api/v1/wallets/",
+        json={"user_id": authenticated_user["id"], "currency": "EGP"},
+        headers=headers,
+    )
+    client.post(
+        "/api/v1/transaction/deposit",
+        json={"amount": "100", "currency": "EGP"},
+        headers=headers,
+    )
+
+    fail_after(
+        monkeypatch,
+        "_insert_transfer_pair",
+        [conflict(), None, conflict("40001"), conflict("40001")],
+    )
+    statuses = [
+        client.post(
+            "/api/v1/transaction/transfer",
+            json={
+                "amount": "10",
+                "currency": "EGP",
+                "receiver_email": "receiver@example.com",
+            },
+            headers=headers,
+        ).status_code
+        for _ in range(2)
+    ]
+    assert statuses == [200, 503]
+
+    response = client.get("/api/v1/internal/metrics/retries", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "TransactionService.transfer": {
+            "retries": {"deadlock_detected": 1, "serialization_failure": 1},
+            "exhausted": {"serialization_failure": 1},
+            "recovered": 1,
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_group_conflict_reruns_only_the_grouped_transfers(db_setup, monkeypatch):
+    monkeypatch.setattr(retry_module, "TRANSACTION_RETRY_BASE_DELAY", 0)
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 100).id
+        sharded_id = create_wallet_owner(db, "sharded", 100, shard_count=2).id
+        create_wallet_owner(db, "receiver", 0)
+        db.commit()
+
+    recorded = fail_after(monkeypatch, "_record_transfer", [conflict()])
+    sharded_calls = fail_after(monkeypatch, "transfer", [])
+
+    async with TestingAsyncSessionLocal() as db:
+        outcomes = await TransactionService(db).transfer_group(
+            [
+                GroupedTransfer(
+                    sender_id, "receiver@example.com", Decimal("30"), "EGP"
+                ),
+                GroupedTransfer(
+                    sharded_id, "receiver@example.com", Decimal("20"), "EGP"
+                ),
+            ]
+        )
+
+    assert [outcome.balance_after for outcome in outcomes] == [70, 80]
+    assert len(recorded) == 2
+    assert len(sharded_calls) == 1
+    assert ledger() == ({"sender": 70, "sharded": 80, "receiver": 50}, 4)
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services import (
+    REVOCATION_CHANNEL,
+    DatabaseRevocationBackend,
+    TokenRevocationStore,
+)
+from services.revocation import SYNC_OVERLAP
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingAsyncSessionLocal
+from utils import PgListener, hash_token
+
+
+class ListBackend:
+    def __init__(self):
+        self.rows = []
+
+    async def add(self, db, token_hash, expires_at):
+        self.rows.append((token_hash, datetime.now(timezone.utc)))
+
+    async def contains(self, db, token_hash):
+        return any(row[0] == token_hash for row in self.rows)
+
+    async def revoked_since(self, db, since):
+        if since is None:
+            return list(self.rows)
+        return [row for row in self.rows if row[1] > since - SYNC_OVERLAP]
+
+
+class NotifyingSession:
+    # Stands in for the session revoke() sends its pg_notify through.
+    async def execute(self, statement):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_sync_does_not_recount_the_overlap_window():
+    backend = ListBackend()
+    now = datetime.now(timezone.utc)
+    backend.rows = [("old", now - timedelta(minutes=5)), ("recent", now)]
+    store = TokenRevocationStore(backend, session_factory=None, capacity=10)
+
+    await store.load(None)
+    assert len(store.bloom) == 2
+
+    backend.rows.append(("late", now - timedelta(seconds=1)))
+    for _ in range(3):
+        await store.sync(None)
+
+    assert len(store.bloom) == 3
+    assert "late" in store.bloom
+
+
+@pytest.mark.asyncio
+async def test_revoke_then_sync_counts_the_token_once():
+    store = TokenRevocationStore(ListBackend(), session_factory=None, capacity=10)
+    await store.load(None)
+
+    await store.revoke("access-token", NotifyingSession())
+    await store.sync(None)
+    await store.sync(None)
+
+    assert len(store.bloom) == 1
+    assert await store.is_revoked("access-token", None)
+
+
+@pytest.mark.asyncio
+async def test_revocation_reaches_other_stores_without_sync(db_setup):
+    stores = [
+        TokenRevocationStore(
+            DatabaseRevocationBackend(), TestingAsyncSessionLocal, capacity=10
+        )
+        for _ in range(2)
+    ]
+    listener = PgListener(SQLALCHEMY_DATABASE_URL)
+    connected, delivered = asyncio.Event(), asyncio.Event()
+
+    def on_payload(payload):
+        (delivered if payload is not None else connected).set()
+
+    listener.subscribe(REVOCATION_CHANNEL, stores[1].on_revocation)
+    listener.subscribe(REVOCATION_CHANNEL, on_payload)
+    await listener.start()
+    try:
+        async with TestingAsyncSessionLocal() as db:
+            for store in stores:
+                await store.load(db)
+        await asyncio.wait_for(connected.wait(), 5)
+
+        async with TestingAsyncSessionLocal() as db:
+            assert not await stores[1].is_revoked("access-token", db)
+            await stores[0].revoke("access-token", db)
+            await db.commit()
+
+        await asyncio.wait_for(delivered.wait(), 5)
+        assert hash_token("access-token") in stores[1].bloom
+        async with TestingAsyncSessionLocal() as db:
+            assert await stores[1].is_revoked("access-token", db)
+    finally:
+        await listener.stop()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, update
+
+import utils
+from models import Role, User
+from services import PERMISSION_MATRIX_CHANNEL, permission_change_notice
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal, grant_role
+from utils import PgListener, RoleEnum
+
+
+@pytest.mark.asyncio
+async def test_role_change_reaches_role_checks_after_invalidation(
+    client, authenticated_user
+):
+    headers = authenticated_user["header"]
+    with TestingSessionLocal() as db:
+        target = User(
+            username="target",
+            email="target@example.com",
+            password_hash="unused",
+            first_name="Target",
+            last_name="User",
+            gender="male",
+        )
+        db.add(target)
+        db.commit()
+        target_id = str(target.id)
+    grant_role(authenticated_user["id"], RoleEnum.ADMIN.value)
+    grant_role(target_id, RoleEnum.STAFF.value)
+    with TestingSessionLocal() as db:
+        support_id = db.scalar(
+            select(Role.id).filter(Role.role == RoleEnum.SUPPORT.value)
+        )
+    user_role = {"user_id": target_id, "role_id": support_id}
+
+    listener = PgListener(SQLALCHEMY_DATABASE_URL)
+    connected, delivered = asyncio.Event(), asyncio.Event()
+
+    def on_payload(payload):
+        (connected if not connected.is_set() else delivered).set()
+
+    listener.subscribe(PERMISSION_MATRIX_CHANNEL, utils.role_weights.invalidate)
+    listener.subscribe(PERMISSION_MATRIX_CHANNEL, on_payload)
+    await listener.start()
+    try:
+        await asyncio.wait_for(connected.wait(), 5)
+
+        # An admin outranks staff, and the weights are now cached.
+        response = client.post(
+            "/api/v1/users/assign-role/", json=user_role, headers=headers
+        )
+        assert response.status_code == 200, response.json()
+
+        # Another process promotes the target's role row above admin.
+        with TestingSessionLocal() as db:
+            db.execute(
+                update(Role)
+                .filter(Role.role == RoleEnum.SUPERUSER.value)
+                .values(role="retired")
+            )
+            db.execute(
+                update(Role)
+                .filter(Role.role == RoleEnum.STAFF.value)
+                .values(role=RoleEnum.SUPERUSER.value)
+            )
+            db.execute(permission_change_notice())
+            db.commit()
+
+        await asyncio.wait_for(delivered.wait(), 5)
+        response = client.request(
+            "DELETE", "/api/v1/users/revoke-role/", json=user_role, headers=headers
+        )
+        assert response.status_code == 403
+        assert response.json()["detail"] == "Not enough privileges to modify this user."
+    finally:
+        await listener.stop()
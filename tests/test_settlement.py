@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from models import Transaction, Wallet
+from services import TransactionService, settle_pending_credits
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+)
+from utils import TransactionStatus
+
+
+@pytest.mark.asyncio
+async def test_settlement_stamps_credits_after_interleaved_debits(db_setup):
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 100).id
+        receiver_id = create_wallet_owner(db, "receiver", 100, deferred_credits=True).id
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        service = TransactionService(db)
+        await service.transfer(sender_id, "receiver@example.com", Decimal("30"), "EGP")
+        await service.withdraw(receiver_id, Decimal("20"), "EGP")
+        await service.transfer(sender_id, "receiver@example.com", Decimal("50"), "EGP")
+        await service.withdraw(receiver_id, Decimal("10"), "EGP")
+
+    with TestingSessionLocal() as db:
+        assert settle_pending_credits(db) == 2
+        assert settle_pending_credits(db) == 0
+
+        wallet = db.scalar(select(Wallet).filter(Wallet.user_id == receiver_id))
+        ledger = db.execute(
+            select(Transaction.amount, Transaction.balance_after, Transaction.status)
+            .filter(Transaction.wallet_id == wallet.id)
+            .order_by(Transaction.created_at, Transaction.id)
+        ).all()
+
+    completed = TransactionStatus.COMPLETED.value
+    # Debits see only settled money; credits are stamped when they settle,
+    # on top of every debit made meanwhile.
+    assert ledger == [
+        (Decimal("30"), Decimal("100"), completed),
+        (Decimal("-20"), Decimal("80"), completed),
+        (Decimal("50"), Decimal("150"), completed),
+        (Decimal("-10"), Decimal("70"), completed),
+    ]
+    assert wallet.balance == Decimal("150")
+
+
+def test_pending_credits_are_not_available_until_settled(client, authenticated_user):
+    headers = authenticated_user["header"]
+    client.post(
+        "/api/v1/wallets/",
+        json={
+            "user_id": authenticated_user["id"],
+            "currency": "EGP",
+            "deferred_credits": True,
+        },
+        headers=headers,
+    )
+    response = client.post(
+        "/api/v1/transaction/deposit",
+        json={"amount": "40", "currency": "EGP"},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.json()
+
+    wallet = client.get("/api/v1/wallets/EGP", headers=headers).json()
+    assert [
+        Decimal(wallet[field])
+        for field in ("settled_balance", "pending_balance", "available_balance")
+    ] == [0, 40, 0]
+    response = client.post(
+        "/api/v1/transaction/withdraw",
+        json={"amount": "10", "currency": "EGP"},
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+    with TestingSessionLocal() as db:
+        settle_pending_credits(db)
+    wallet = client.get("/api/v1/wallets/EGP", headers=headers).json()
+    assert Decimal(wallet["available_balance"]) == 40
+    response = client.post(
+        "/api/v1/transaction/withdraw",
+        json={"amount": "10", "currency": "EGP"},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.json()
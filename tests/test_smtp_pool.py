@@ -0,0 +1,87 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from fastapi_mail import ConnectionConfig
+
+from utils import SMTPPool, build_message
+
+
+class SinkServer:
+    # Accepts every message except those addressed to rejected@example.com.
+    def __init__(self):
+        self.stats = Counter()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.stats["connections"] += 1
+        writer.write(b"220 sink ESMTP\r\n")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command == b"EHLO":
+                writer.write(b"250-sink\r\n250 8BITMIME\r\n")
+            elif command == b"RCPT" and b"rejected@" in line:
+                writer.write(b"550 No such user\r\n")
+            elif command == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                while (await reader.readline()) not in (b".\r\n", b""):
+                    pass
+                self.stats["messages"] += 1
+                writer.write(b"250 OK\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+def mail_config(port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="test",
+        MAIL_PASSWORD="test",
+        MAIL_FROM="test@example.com",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_shares_pooled_connections():
+    sink = SinkServer()
+    server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+    pool = SMTPPool(mail_config(server.sockets[0].getsockname()[1]), size=2)
+    try:
+        recipients = [f"user{i}@example.com" for i in range(10)]
+        recipients[3] = "rejected@example.com"
+        outcomes = await pool.send_many(
+            [
+                build_message("Hello", [recipient], "<p>Hi</p>")
+                for recipient in recipients
+            ]
+        )
+
+        # A rejected recipient fails only its own message.
+        assert [outcome is None for outcome in outcomes] == [
+            recipient != "rejected@example.com" for recipient in recipients
+        ]
+        assert sink.stats["messages"] == 9
+        assert sink.stats["connections"] <= 3
+
+        connections = sink.stats["connections"]
+        await pool.send_many(
+            [build_message("Again", ["user@example.com"], "<p>Hi</p>")] * 4
+        )
+        assert sink.stats["messages"] == 13
+        assert sink.stats["connections"] == connections
+    finally:
+        await pool.close()
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,142 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, text, update
+
+import schemas
+from models import Wallet, WalletShard, WalletStatement
+from services import (
+    TransactionService,
+    WalletService,
+    rollup_statements,
+    settle_pending_credits,
+)
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+)
+
+
+def create_owners(*names, **wallet):
+    with TestingSessionLocal() as db:
+        ids = [create_wallet_owner(db, name, 0, **wallet).id for name in names]
+        db.commit()
+    return ids
+
+
+def move_ledger_to_yesterday():
+    with TestingSessionLocal() as db:
+        db.execute(
+            text("UPDATE transaction SET created_at = created_at - interval '1 day'")
+        )
+        db.commit()
+
+
+def close_days(user_id):
+    # Rolls up every day before today and returns the wallet's statements.
+    with TestingSessionLocal() as db:
+        rollup_statements(db, close_delay=0)
+        return db.execute(
+            select(
+                WalletStatement.opening_balance,
+                WalletStatement.closing_balance,
+                WalletStatement.credits,
+                WalletStatement.debits,
+                WalletStatement.transaction_count,
+            )
+            .join(Wallet, Wallet.id == WalletStatement.wallet_id)
+            .filter(Wallet.user_id == user_id)
+            .order_by(WalletStatement.day)
+        ).all()
+
+
+async def balance_at(user_id, at: datetime) -> Decimal:
+    async with TestingAsyncSessionLocal() as db:
+        return (await WalletService(db).get_balance_at(user_id, "EGP", at))["balance"]
+
+
+def start_of_today() -> datetime:
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@pytest.mark.asyncio
+async def test_settled_credits_count_on_the_day_they_were_made(db_setup):
+    sender_id, receiver_id = create_owners("sender", "receiver")
+    async with TestingAsyncSessionLocal() as db:
+        service = TransactionService(db)
+        await service.deposit(sender_id, Decimal("100"), "EGP")
+        await service.deposit(receiver_id, Decimal("100"), "EGP")
+    with TestingSessionLocal() as db:
+        db.execute(
+            update(Wallet)
+            .filter(Wallet.user_id == receiver_id)
+            .values(deferred_credits=True)
+        )
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        service = TransactionService(db)
+        await service.transfer(sender_id, "receiver@example.com", Decimal("30"), "EGP")
+        await service.withdraw(receiver_id, Decimal("20"), "EGP")
+    move_ledger_to_yesterday()
+
+    # The credit is stamped at settlement, after yesterday's withdrawal.
+    with TestingSessionLocal() as db:
+        assert settle_pending_credits(db) == 1
+    async with TestingAsyncSessionLocal() as db:
+        await TransactionService(db).withdraw(receiver_id, Decimal("10"), "EGP")
+
+    assert close_days(receiver_id) == [(0, 110, 130, 20, 3)]
+    assert await balance_at(receiver_id, start_of_today()) == Decimal("110")
+    assert await balance_at(receiver_id, datetime.now(timezone.utc)) == Decimal("100")
+
+
+@pytest.mark.asyncio
+async def test_batch_rows_roll_up_to_the_sender_balance(db_setup):
+    sender_id, _, _ = create_owners("sender", "alice", "bob")
+    async with TestingAsyncSessionLocal() as db:
+        service = TransactionService(db)
+        await service.deposit(sender_id, Decimal("100"), "EGP")
+        await service.transfer_batch(
+            sender_id,
+            "EGP",
+            [
+                schemas.BatchTransferItem(receiver_email=email, amount=amount)
+                for email, amount in [
+                    ("alice@example.com", Decimal("10")),
+                    ("bob@example.com", Decimal("20")),
+                    ("alice@example.com", Decimal("30")),
+                ]
+            ],
+        )
+    move_ledger_to_yesterday()
+
+    assert close_days(sender_id) == [(0, 40, 100, 60, 4)]
+    assert await balance_at(sender_id, start_of_today()) == Decimal("40")
+
+
+@pytest.mark.asyncio
+async def test_sharded_wallet_statements_follow_every_shard(db_setup):
+    (user_id,) = create_owners("sharded", shard_count=4)
+    with TestingSessionLocal() as db:
+        wallet_id = db.scalar(select(Wallet.id))
+        db.add_all(
+            WalletShard(wallet_id=wallet_id, shard_no=shard_no, balance=0)
+            for shard_no in range(1, 4)
+        )
+        db.commit()
+
+    async with TestingAsyncSessionLocal() as db:
+        service = TransactionService(db)
+        for _ in range(4):
+            await service.deposit(user_id, Decimal("10"), "EGP")
+        await service.withdraw(user_id, Decimal("25"), "EGP")
+    move_ledger_to_yesterday()
+    async with TestingAsyncSessionLocal() as db:
+        await TransactionService(db).deposit(user_id, Decimal("5"), "EGP")
+
+    assert close_days(user_id) == [(0, 15, 40, 25, 5)]
+    assert await balance_at(user_id, start_of_today()) == Decimal("15")
+    assert await balance_at(user_id, datetime.now(timezone.utc)) == Decimal("20")
@@ -0,0 +1,204 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+
+from models import Transaction, User, Wallet
+from services import TransactionService, TransferBatcher
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    async_engine,
+    create_wallet_owner,
+)
+
+WINDOW = 50  # in ms
+
+
+def create_owners(*names, balance=100, **wallet):
+    with TestingSessionLocal() as db:
+        ids = [create_wallet_owner(db, name, balance, **wallet).id for name in names]
+        db.commit()
+    return ids
+
+
+def balances():
+    with TestingSessionLocal() as db:
+        return dict(
+            db.execute(select(User.username, Wallet.balance).join(Wallet)).all()
+        )
+
+
+def watch(monkeypatch, method: str) -> list:
+    # Records the arguments of every call to a TransactionService method.
+    original = getattr(TransactionService, method)
+    calls = []
+
+    async def wrapper(self, *args, **kwargs):
+        calls.append(args)
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(TransactionService, method, wrapper)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_transfers_share_one_commit(db_setup, monkeypatch):
+    batcher = TransferBatcher(TestingAsyncSessionLocal, window=WINDOW)
+    senders = create_owners(*(f"sender{i}" for i in range(5)))
+    create_owners("receiver", balance=0)
+    groups = watch(monkeypatch, "transfer_group")
+    commits = []
+
+    def record(conn):
+        commits.append(conn)
+
+    event.listen(async_engine.sync_engine, "commit", record)
+    try:
+        results = await asyncio.gather(
+            *(
+                batcher.transfer(
+                    sender_id, "receiver@example.com", Decimal("10"), "EGP"
+                )
+                for sender_id in senders
+            )
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "commit", record)
+
+    assert [len(transfers) for (transfers,) in groups] == [5]
+    assert len(commits) == 1
+    assert [result.balance_after for result in results] == [90] * 5
+    assert balances()["receiver"] == 50
+
+
+@pytest.mark.asyncio
+async def test_failing_items_fail_alone(db_setup):
+    batcher = TransferBatcher(TestingAsyncSessionLocal, window=WINDOW)
+    first_id, second_id = create_owners("first", "second")
+    create_owners("receiver", balance=0)
+    async with TestingAsyncSessionLocal() as db:
+        await TransactionService(db).transfer(
+            second_id, "receiver@example.com", Decimal("5"), "EGP", "used-key"
+        )
+
+    results = await asyncio.gather(
+        batcher.transfer(first_id, "receiver@example.com", Decimal("30"), "EGP"),
+        batcher.transfer(first_id, "receiver@example.com", Decimal("100"), "EGP"),
+        batcher.transfer(
+            second_id, "receiver@example.com", Decimal("10"), "EGP", "used-key"
+        ),
+        batcher.transfer(second_id, "receiver@example.com", Decimal("20"), "EGP"),
+        return_exceptions=True,
+    )
+
+    assert results[0].balance_after == 70
+    assert isinstance(results[1], HTTPException)
+    assert results[1].detail == "Insufficient funds"
+    assert isinstance(results[2], HTTPException)
+    assert results[3].balance_after == 75
+    assert balances() == {"first": 70, "second": 75, "receiver": 55}
+    with TestingSessionLocal() as db:
+        received = db.scalars(
+            select(Transaction.balance_after)
+            .filter(Transaction.amount > 0)
+            .order_by(Transaction.created_at, Transaction.id)
+        ).all()
+    assert received == [5, 35, 55]
+
+
+@pytest.mark.asyncio
+async def test_groups_lock_wallets_in_one_global_order(db_setup):
+    first_id, second_id = create_owners("first", "second")
+    batchers = [
+        TransferBatcher(TestingAsyncSessionLocal, window=WINDOW) for _ in range(2)
+    ]
+    locks = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FOR UPDATE" in statement:
+            locks.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        # Opposite directions in concurrent groups would deadlock if each
+        # group locked its wallets in arrival order.
+        for _ in range(5):
+            results = await asyncio.gather(
+                batchers[0].transfer(
+                    first_id, "second@example.com", Decimal("1"), "EGP"
+                ),
+                batchers[0].transfer(
+                    second_id, "first@example.com", Decimal("2"), "EGP"
+                ),
+                batchers[1].transfer(
+                    second_id, "first@example.com", Decimal("3"), "EGP"
+                ),
+                batchers[1].transfer(
+                    first_id, "second@example.com", Decimal("4"), "EGP"
+                ),
+            )
+            assert all(isinstance(result, Transaction) for result in results)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert balances() == {"first": 100, "second": 100}
+    assert locks and all("ORDER BY wallet.id" in statement for statement in locks)
+
+
+@pytest.mark.asyncio
+async def test_sharded_and_deferred_wallets_use_transfer(db_setup, monkeypatch):
+    batcher = TransferBatcher(TestingAsyncSessionLocal, window=WINDOW)
+    (sender_id,) = create_owners("sender")
+    (sharded_id,) = create_owners("sharded", shard_count=2)
+    create_owners("receiver", balance=0)
+    create_owners("merchant", balance=0, deferred_credits=True)
+    transfers = watch(monkeypatch, "transfer")
+    recorded = watch(monkeypatch, "_record_transfer")
+
+    results = await asyncio.gather(
+        batcher.transfer(sender_id, "receiver@example.com", Decimal("10"), "EGP"),
+        batcher.transfer(sharded_id, "receiver@example.com", Decimal("20"), "EGP"),
+        batcher.transfer(sender_id, "merchant@example.com", Decimal("30"), "EGP"),
+    )
+
+    assert [args[:2] for args in transfers] == [
+        (sharded_id, "receiver@example.com"),
+        (sender_id, "merchant@example.com"),
+    ]
+    assert len(recorded) == 1
+    assert [result.balance_after for result in results] == [90, 80, 60]
+    with TestingSessionLocal() as db:
+        pending = db.scalar(
+            select(func.count()).filter(Transaction.status == "pending")
+        )
+    assert pending == 1
+    assert balances() == {"sender": 60, "sharded": 80, "receiver": 30, "merchant": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_its_transfer(db_setup):
+    batcher = TransferBatcher(TestingAsyncSessionLocal, window=WINDOW)
+    first_id, second_id = create_owners("first", "second")
+    create_owners("receiver", balance=0)
+
+    cancelled = asyncio.ensure_future(
+        batcher.transfer(first_id, "receiver@example.com", Decimal("10"), "EGP")
+    )
+    waiting = asyncio.ensure_future(
+        batcher.transfer(second_id, "receiver@example.com", Decimal("20"), "EGP")
+    )
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert (await waiting).balance_after == 80
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    await batcher.close()
+
+    # The group still committed the cancelled caller's transfer, once.
+    assert balances() == {"first": 90, "second": 80, "receiver": 30}
+    with TestingSessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(Transaction)) == 4
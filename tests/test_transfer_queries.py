@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, select
+
+import schemas
+from models import Transaction, User, Wallet
+from services import TransactionService
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    async_engine,
+    create_wallet_owner,
+)
+
+
+@pytest.mark.asyncio
+async def test_transfer_round_trips(db_setup):
+    with TestingSessionLocal() as db:
+        sender_id = create_wallet_owner(db, "sender", 100).id
+        create_wallet_owner(db, "receiver", 0)
+        db.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with TestingAsyncSessionLocal() as db:
+            outgoing = await TransactionService(db).transfer(
+                sender_id, "receiver@example.com", Decimal("30"), "EGP"
+            )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+    # Resolve both accounts, lock both wallets, then one INSERT that also
+    # carries the balance UPDATE.
+    assert len(statements) == 3, statements
+
+    async with TestingAsyncSessionLocal() as db:
+        incoming = await db.get(Transaction, outgoing.related_transaction_id)
+        balances = dict(
+            (await db.execute(select(User.username, Wallet.balance).join(Wallet))).all()
+        )
+
+    assert outgoing.balance_after == Decimal("70")
+    response = schemas.TransactionResponse.model_validate(outgoing)
+    assert response.model_dump(mode="json")["amount"] == "-30.0000"
+    assert incoming.related_transaction_id == outgoing.id
+    assert incoming.balance_after == Decimal("30")
+    assert balances == {"sender": Decimal("70"), "receiver": Decimal("30")}
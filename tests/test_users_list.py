@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from models import Role, User, UserRole
+from tests.conftest import TestingSessionLocal, grant_role
+from utils import RoleEnum, encode_cursor
+
+USERS_URL = "/api/v1/users/"
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def staff_headers(authenticated_user):
+    grant_role(authenticated_user["id"], RoleEnum.STAFF.value)
+
+    with TestingSessionLocal() as db:
+        role_ids = dict(db.execute(select(Role.role, Role.id)).all())
+        # Older than every listed user, so it is always the first row.
+        db.get(User, authenticated_user["id"]).created_at = START - timedelta(days=1)
+        for day in range(5):
+            user = User(
+                username=f"member{day}",
+                email=f"member{day}@example.com",
+                password_hash="unused",
+                first_name="Member",
+                last_name="User",
+                gender="female",
+                is_verified=day % 2 == 0,
+                created_at=START + timedelta(days=day),
+            )
+            db.add(user)
+            db.flush()
+            db.add(UserRole(user_id=user.id, role_id=role_ids["user"]))
+        db.commit()
+    return authenticated_user["header"]
+
+
+def usernames(items):
+    return [item["username"] for item in items]
+
+
+def test_users_pages_in_creation_order(client, staff_headers):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(USERS_URL, params=params, headers=staff_headers)
+        assert response.status_code == 200
+        pages.append(usernames(response.json()["items"]))
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == [
+        ["testuser", "member0"],
+        ["member1", "member2"],
+        ["member3", "member4"],
+    ]
+
+
+def test_users_filters(client, staff_headers):
+    def listed(**params):
+        response = client.get(USERS_URL, params=params, headers=staff_headers)
+        assert response.status_code == 200
+        return usernames(response.json()["items"])
+
+    assert listed(role=RoleEnum.STAFF.value) == ["testuser"]
+    assert listed(role=RoleEnum.USER.value, is_verified=False) == [
+        "member1",
+        "member3",
+    ]
+    assert listed(
+        created_from=(START + timedelta(days=1)).isoformat(),
+        created_to=(START + timedelta(days=3)).isoformat(),
+    ) == ["member1", "member2"]
+
+
+def test_users_reject_invalid_cursors(client, staff_headers):
+    cursors = [
+        "not-a-cursor",
+        encode_cursor("yesterday", "abc"),
+        base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    ]
+    for cursor in cursors:
+        response = client.get(
+            USERS_URL, params={"cursor": cursor}, headers=staff_headers
+        )
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_users_export_streams_the_filtered_list(client, staff_headers):
+    response = client.get(
+        f"{USERS_URL}export", params={"is_verified": True}, headers=staff_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert usernames(rows) == ["testuser", "member0", "member2", "member4"]
+    assert "password_hash" not in rows[0]
+    assert len(rows[1]["user_roles"]) == 1
+
+
+def test_users_list_requires_permission(client, authenticated_user):
+    response = client.get(USERS_URL, headers=authenticated_user["header"])
+    assert response.status_code == 403
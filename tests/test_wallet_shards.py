@@ -0,0 +1,112 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models import Wallet, WalletShard
+from services import TransactionService
+from services import transaction as transaction_module
+from tests.conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    create_wallet_owner,
+)
+
+
+def create_sharded_owner(shard_balances) -> str:
+    with TestingSessionLocal() as db:
+        user = create_wallet_owner(
+            db, "sharded", shard_balances[0], shard_count=len(shard_balances)
+        )
+        db.flush()
+        wallet_id = db.scalar(select(Wallet.id).filter(Wallet.user_id == user.id))
+        db.add_all(
+            WalletShard(wallet_id=wallet_id, shard_no=shard_no, balance=balance)
+            for shard_no, balance in enumerate(shard_balances)
+            if shard_no
+        )
+        db.commit()
+        return user.id
+
+
+def shard_balances():
+    with TestingSessionLocal() as db:
+        wallet_balance = db.scalar(select(Wallet.balance))
+        rest = db.scalars(select(WalletShard.balance).order_by(WalletShard.shard_no))
+        return [wallet_balance, *rest]
+
+
+@pytest.mark.asyncio
+async def test_debit_spans_several_shards(db_setup):
+    user_id = create_sharded_owner([10, 10, 10, 10])
+
+    async with TestingAsyncSessionLocal() as db:
+        transaction = await TransactionService(db).withdraw(
+            user_id, Decimal("25"), "EGP"
+        )
+
+    assert transaction.balance_after == Decimal("15")
+    balances = shard_balances()
+    assert sum(balances) == Decimal("15")
+    assert sorted(balances) == [0, 0, 5, 10]
+
+
+@pytest.mark.asyncio
+async def test_credit_lands_on_a_random_shard(db_setup, monkeypatch):
+    user_id = create_sharded_owner([10, 10, 10, 10])
+    monkeypatch.setattr(transaction_module.random, "randrange", lambda stop: 2)
+
+    async with TestingAsyncSessionLocal() as db:
+        transaction = await TransactionService(db).deposit(user_id, Decimal("5"), "EGP")
+
+    assert transaction.balance_after == Decimal("45")
+    assert shard_balances() == [10, 10, 15, 10]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_debits_never_overdraw(db_setup):
+    user_id = create_sharded_owner([10, 10, 10, 10])
+
+    async def withdraw():
+        async with TestingAsyncSessionLocal() as db:
+            try:
+                await TransactionService(db).withdraw(user_id, Decimal("10"), "EGP")
+                return True
+            except HTTPException as e:
+                assert e.detail == "Insufficient funds"
+                return False
+
+    results = await asyncio.gather(*(withdraw() for _ in range(6)))
+
+    assert results.count(True) == 4
+    assert shard_balances() == [0, 0, 0, 0]
+
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(HTTPException):
+            await TransactionService(db).withdraw(user_id, Decimal("1"), "EGP")
+
+
+def test_wallet_endpoints_report_the_summed_balance(client, authenticated_user):
+    headers = authenticated_user["header"]
+    response = client.post(
+        "/api/v1/wallets/",
+        json={"user_id": authenticated_user["id"], "currency": "EGP", "shard_count": 4},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    assert Decimal(response.json()["balance"]) == 0
+
+    for _ in range(3):
+        response = client.post(
+            "/api/v1/transaction/deposit",
+            json={"amount": "10", "currency": "EGP"},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.json()
+
+    wallet = client.get("/api/v1/wallets/EGP", headers=headers).json()
+    assert Decimal(wallet["balance"]) == Decimal("30")
+    wallets = client.get("/api/v1/wallets/", headers=headers).json()
+    assert [Decimal(wallet["balance"]) for wallet in wallets] == [Decimal("30")]
@@ -1,4 +1,6 @@
-from .email import send_email
+from .bloom import BloomFilter
+from .cache import TTLCache
+from .email import SMTPPool, build_message, send_email, smtp_pool
 from .enums import (
     CurrencyEnum,
     Gender,
@@ -7,9 +9,24 @@ from .enums import (
     TransactionStatus,
     TransactionType,
 )
-from .get_user_max_weights import get_user_max_weight
-from .helpers import get_expire_minutes, hash_token
-from .passwords import hash_password, verify_password
+from .get_user_max_weights import (
+    RoleWeightTable,
+    get_user_max_weight,
+    role_weights,
+)
+from .helpers import decode_cursor, encode_cursor, get_expire_minutes, hash_token
+from .passwords import (
+    PasswordHasher,
+    hash_password,
+    needs_rehash,
+    password_hasher,
+    verify_password,
+)
+from .pg_listener import PgListener
+from .pool_metrics import PoolMetrics
+from .replicas import ReplicaRouter
+from .retry import RetryMetrics, retry_metrics, retry_on_conflict, retry_reason
+from .templates import CompiledTemplate, TemplateRegistry, mail_templates
 
 __all__ = [
     "RoleEnum",
@@ -17,11 +34,33 @@ __all__ = [
     "PermissionEnum",
     "hash_password",
     "verify_password",
+    "needs_rehash",
+    "PasswordHasher",
+    "password_hasher",
     "get_user_max_weight",
+    "role_weights",
+    "RoleWeightTable",
     "send_email",
+    "build_message",
+    "SMTPPool",
+    "CompiledTemplate",
+    "TemplateRegistry",
+    "mail_templates",
+    "smtp_pool",
     "get_expire_minutes",
     "hash_token",
+    "encode_cursor",
+    "decode_cursor",
     "CurrencyEnum",
     "TransactionStatus",
     "TransactionType",
+    "PoolMetrics",
+    "RetryMetrics",
+    "retry_metrics",
+    "retry_on_conflict",
+    "retry_reason",
+    "TTLCache",
+    "BloomFilter",
+    "PgListener",
+    "ReplicaRouter",
 ]
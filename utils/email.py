@@ -1,30 +1,148 @@
+import asyncio
+import time
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
 from os import getenv
-from typing import List
+from typing import List, Optional, Tuple
 
+import aiosmtplib
 from dotenv import load_dotenv
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
 
 load_dotenv()
 
+MAIL_POOL_SIZE = int(getenv("MAIL_POOL_SIZE", 4))
+MAIL_CONNECTION_MAX_AGE = float(getenv("MAIL_CONNECTION_MAX_AGE", 300))  # in seconds
+
 conf = ConnectionConfig(
     MAIL_USERNAME=getenv("MAIL_USERNAME", "email@compancy.com"),
     MAIL_PASSWORD=getenv("MAIL_PASSWORD", "app_password"),
     MAIL_FROM=getenv("MAIL_FROM", "email@compancy.com"),
+    MAIL_FROM_NAME=getenv("MAIL_FROM_NAME"),
     MAIL_PORT=getenv("MAIL_PORT", 587),
     MAIL_SERVER=getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
+    MAIL_STARTTLS=getenv("MAIL_STARTTLS", "true").lower() == "true",
+    MAIL_SSL_TLS=getenv("MAIL_SSL_TLS", "false").lower() == "true",
+    USE_CREDENTIALS=getenv("MAIL_USE_CREDENTIALS", "true").lower() == "true",
+    VALIDATE_CERTS=getenv("MAIL_VALIDATE_CERTS", "true").lower() == "true",
 )
 
 
-async def send_email(subject: str, recipients: List[EmailStr], body: str):
-    msg = MessageSchema(
-        subject=subject, body=body, recipients=recipients, subtype=MessageType.html
+def build_message(
+    subject: str,
+    recipients: List[EmailStr],
+    body: str,
+    config: ConnectionConfig = conf,
+) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = (
+        formataddr((config.MAIL_FROM_NAME, config.MAIL_FROM))
+        if config.MAIL_FROM_NAME
+        else config.MAIL_FROM
     )
+    message["To"] = ", ".join(recipients)
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message.set_content(body, subtype="html")
+    return message
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        config: ConnectionConfig = conf,
+        size: int = MAIL_POOL_SIZE,
+        max_age: float = MAIL_CONNECTION_MAX_AGE,
+    ):
+        self.config = config
+        self.size = size
+        self.max_age = max_age
+        self._idle: List[Tuple[float, aiosmtplib.SMTP]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind(self) -> None:
+        # Connections and the semaphore belong to the loop that created them.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            local_hostname=self.config.LOCAL_HOSTNAME,
+            cert_bundle=self.config.CERT_BUNDLE,
+        )
+        await client.connect()
+        if self.config.USE_CREDENTIALS:
+            await client.login(
+                self.config.MAIL_USERNAME,
+                self.config.MAIL_PASSWORD.get_secret_value(),
+            )
+        return client
+
+    def _checkout(self) -> Optional[Tuple[float, aiosmtplib.SMTP]]:
+        now = time.monotonic()
+        while self._idle:
+            connected_at, client = self._idle.pop()
+            if client.is_connected and now - connected_at < self.max_age:
+                return connected_at, client
+            client.close()
+        return None
 
-    fm = FastMail(conf)
+    async def send(self, message: EmailMessage) -> None:
+        self._bind()
+        async with self._slots:
+            while True:
+                reused = self._checkout()
+                connected_at, client = reused or (
+                    time.monotonic(),
+                    await self._connect(),
+                )
+                try:
+                    await client.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    client.close()
+                    # The server dropped an idle connection; try the next one.
+                    if reused is None:
+                        raise
+                    continue
+                except Exception:
+                    client.close()
+                    raise
+                self._idle.append((connected_at, client))
+                return
 
-    await fm.send_message(msg)
+    async def send_many(
+        self, messages: List[EmailMessage]
+    ) -> List[Optional[Exception]]:
+        outcomes = await asyncio.gather(
+            *(self.send(message) for message in messages), return_exceptions=True
+        )
+        return [
+            outcome if isinstance(outcome, Exception) else None for outcome in outcomes
+        ]
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, client in idle:
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+
+smtp_pool = SMTPPool()
+
+
+async def send_email(subject: str, recipients: List[EmailStr], body: str):
+    await smtp_pool.send(build_message(subject, recipients, body))
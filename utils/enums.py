@@ -15,19 +15,21 @@ class RoleEnum(str, Enum):
 
     @property
     def weight(self) -> int:
-        weights = {
-            "superuser": 1000,
-            "admin": 800,
-            "staff": 500,
-            "support": 500,
-            "user": 0,
-        }
-        return weights[self.value]
+        return ROLE_WEIGHTS[self.value]
 
     def can_manage(self, other_role: "RoleEnum") -> bool:
         return self.weight > other_role.weight
 
 
+ROLE_WEIGHTS = {
+    "superuser": 1000,
+    "admin": 800,
+    "staff": 500,
+    "support": 500,
+    "user": 0,
+}
+
+
 class PermissionEnum(str, Enum):
     ADD_ADMIN = "add_admin"
     REMOVE_ADMIN = "remove_admin"
@@ -40,6 +42,7 @@ class PermissionEnum(str, Enum):
     CHANGE_ROLES = "change_roles"
     CHANGE_PERMISSIONS = "change_permissions"
     GET_USERS = "get_users"
+    VIEW_METRICS = "view_metrics"
 
 
 class CurrencyEnum(str, Enum):
@@ -1,15 +1,43 @@
-from typing import List
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 import utils
 
 
-def get_user_max_weight(user_role_ids: List[int], db: Session) -> int:
-    if not user_role_ids:
-        return 0
+class RoleWeightTable:
+    def __init__(self):
+        self._weights: Optional[Mapping[int, int]] = None
+
+    async def load(self, db: AsyncSession) -> Mapping[int, int]:
+        roles = (await db.execute(select(models.Role.id, models.Role.role))).all()
+        self._weights = MappingProxyType(
+            {
+                role_id: utils.RoleEnum(role).weight
+                for role_id, role in roles
+                if role in utils.RoleEnum._value2member_map_
+            }
+        )
+        return self._weights
+
+    async def get(self, db: AsyncSession) -> Mapping[int, int]:
+        weights = self._weights
+        if weights is None:
+            weights = await self.load(db)
+        return weights
+
+    def invalidate(self, payload: Optional[str] = None) -> None:
+        self._weights = None
+
+
+role_weights = RoleWeightTable()
+
+
+def get_user_max_weight(
+    user_role_ids: Iterable[int], weights: Mapping[int, int]
+) -> int:
+    return max((weights.get(role_id, 0) for role_id in user_role_ids), default=0)
 
-    roles = db.query(models.Role.role).filter(models.Role.id.in_(user_role_ids)).all()
-    weights = [utils.RoleEnum(role[0]).weight for role in roles]
-    return max(weights) if weights else 0
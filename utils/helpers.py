@@ -1,7 +1,9 @@
+import base64
 import hashlib
 import hmac
+import json
 from os import getenv
-from typing import Literal
+from typing import List, Literal
 
 from dotenv import load_dotenv
 
@@ -30,3 +32,18 @@ def hash_token(token: str) -> str:
     return hmac.new(
         SECRECT_KEY.encode("utf-8"), token.encode("utf-8"), hashlib.sha256
     ).hexdigest()
+
+
+def encode_cursor(*values) -> str:
+    payload = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[str]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
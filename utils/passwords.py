@@ -1,4 +1,17 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from os import getenv
+from typing import Callable, Optional
+
 import bcrypt
+from fastapi import HTTPException, status
+
+PASSWORD_HASH_ROUNDS = int(getenv("PASSWORD_HASH_ROUNDS", 12))
+# 0 hashes inline on the event loop.
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(getenv("PASSWORD_HASH_QUEUE_SIZE", 64))
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -7,8 +20,79 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int = PASSWORD_HASH_ROUNDS) -> str:
     pwd_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds)
     hashed = bcrypt.hashpw(pwd_bytes, salt)
     return hashed.decode("utf-8")
+
+
+def needs_rehash(hashed_password: str, rounds: int = PASSWORD_HASH_ROUNDS) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt and digest>.
+    try:
+        return int(hashed_password.split("$")[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE_SIZE,
+        rounds: int = PASSWORD_HASH_ROUNDS,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return needs_rehash(hashed_password, self.rounds)
+
+    async def _run(self, function: Callable, *args):
+        if not self.enabled:
+            return function(*args)
+
+        # Every worker busy plus a full queue means new requests would only
+        # wait longer than a client is willing to, so shed them instead.
+        if self._inflight >= self.workers + self.queue_size:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many password checks in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        if self._executor is None:
+            # forkserver children don't inherit the event loop, the pools' sockets
+            # or the locks of threads running at fork time.
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+
+        self._inflight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, function, *args
+            )
+        finally:
+            self._inflight -= 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
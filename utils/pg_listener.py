@@ -0,0 +1,80 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+
+Handler = Callable[[Optional[str]], object]
+
+logger = logging.getLogger(__name__)
+
+
+class PgListener:
+    def __init__(self, dsn: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, payload: Optional[str]) -> None:
+        # One failing subscriber must not starve the others or end the
+        # shared listener task.
+        for handler in self._handlers.get(channel, []):
+            try:
+                result = handler(payload)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result).add_done_callback(
+                        lambda task, channel=channel: self._log_failure(task, channel)
+                    )
+            except Exception:
+                logger.exception("Listener callback for %s failed", channel)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Future, channel: str) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Listener callback for %s failed",
+                channel,
+                exc_info=task.exception(),
+            )
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self._dispatch(channel, payload)
+
+    async def _run(self) -> None:
+        while True:
+            closed = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                self._connection.add_termination_listener(lambda _: closed.set())
+                for channel in self._handlers:
+                    await self._connection.add_listener(channel, self._on_notification)
+                # Notifications sent while disconnected are lost, so every
+                # subscriber gets a payload-less resync signal on (re)connect.
+                for channel in self._handlers:
+                    self._dispatch(channel, None)
+                await closed.wait()
+            except (OSError, asyncpg.PostgresError):
+                pass
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
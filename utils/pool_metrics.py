@@ -0,0 +1,121 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._checkouts = 0
+        self._peak_checked_out = 0
+        self._overflow_events = 0
+        self._timeouts = 0
+        self._connected_at: Dict[int, float] = {}
+        self._engine: Engine = None
+
+    def observe_wait(self, seconds: float) -> None:
+        index = bisect_left(WAIT_BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            self._wait_buckets[index] += 1
+            self._wait_count += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self._timeouts += 1
+
+    def pool_class(self, base: Type[Pool]) -> Type[Pool]:
+        metrics = self
+
+        # Pool.recreate() reuses self.__class__, so the timing survives dispose().
+        class TimedPool(base):
+            def _do_get(self):
+                started = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except PoolTimeoutError:
+                    metrics.observe_timeout()
+                    raise
+                finally:
+                    metrics.observe_wait(time.perf_counter() - started)
+
+        TimedPool.__name__ = f"Timed{base.__name__}"
+        return TimedPool
+
+    def instrument(self, engine: Engine) -> None:
+        self._engine = engine
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            pool = engine.pool
+            with self._lock:
+                self._connected_at[id(connection_record)] = time.monotonic()
+                if hasattr(pool, "overflow") and pool.overflow() > 0:
+                    self._overflow_events += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            pool = engine.pool
+            with self._lock:
+                self._checkouts += 1
+                if hasattr(pool, "checkedout"):
+                    self._peak_checked_out = max(
+                        self._peak_checked_out, pool.checkedout()
+                    )
+
+        @event.listens_for(engine, "close")
+        def on_close(dbapi_connection, connection_record):
+            with self._lock:
+                self._connected_at.pop(id(connection_record), None)
+
+    def snapshot(self) -> dict:
+        pool = self._engine.pool if self._engine is not None else None
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            histogram = {
+                f"le_{bound}ms": count
+                for bound, count in zip(WAIT_BUCKETS_MS, self._wait_buckets)
+            }
+            histogram["le_inf"] = self._wait_buckets[-1]
+            return {
+                "pool": pool.status() if pool is not None else None,
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": (
+                    pool.checkedout() if hasattr(pool, "checkedout") else None
+                ),
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "peak_checked_out": self._peak_checked_out,
+                "checkouts": self._checkouts,
+                "overflow_events": self._overflow_events,
+                "timeouts": self._timeouts,
+                "wait": {
+                    "count": self._wait_count,
+                    "mean_ms": (
+                        round(self._wait_total / self._wait_count * 1000, 3)
+                        if self._wait_count
+                        else 0.0
+                    ),
+                    "max_ms": round(self._wait_max * 1000, 3),
+                    "histogram": histogram,
+                },
+                "connection_age_seconds": {
+                    "open": len(ages),
+                    "min": round(min(ages), 1) if ages else None,
+                    "max": round(max(ages), 1) if ages else None,
+                    "mean": round(sum(ages) / len(ages), 1) if ages else None,
+                },
+            }
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from os import getenv
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from .cache import TTLCache
+
+REPLICA_STICKY_SECONDS = float(getenv("REPLICA_STICKY_SECONDS", 5))  # in seconds
+REPLICA_STICKY_CACHE_SIZE = int(getenv("REPLICA_STICKY_CACHE_SIZE", 100000))
+REPLICA_MAX_LAG = float(getenv("REPLICA_MAX_LAG", 5))  # in seconds
+REPLICA_EVICTION_SECONDS = float(getenv("REPLICA_EVICTION_SECONDS", 30))  # in seconds
+REPLICA_HEALTH_INTERVAL = float(getenv("REPLICA_HEALTH_INTERVAL", 5))  # in seconds
+
+# A standby that has replayed everything it received is as fresh as it can be,
+# even when the primary has been idle and the last replay timestamp is old.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery()"
+    " OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())"
+    " END"
+)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        sticky_seconds: float = REPLICA_STICKY_SECONDS,
+        max_lag: float = REPLICA_MAX_LAG,
+        eviction_seconds: float = REPLICA_EVICTION_SECONDS,
+        health_interval: float = REPLICA_HEALTH_INTERVAL,
+    ):
+        self.primary = async_sessionmaker(bind=primary, expire_on_commit=False)
+        self.replicas = [
+            async_sessionmaker(bind=replica, expire_on_commit=False)
+            for replica in replicas
+        ]
+        self.max_lag = max_lag
+        self.eviction_seconds = eviction_seconds
+        self.health_interval = health_interval
+        self._pinned = TTLCache(maxsize=REPLICA_STICKY_CACHE_SIZE, ttl=sticky_seconds)
+        self._evicted_until: Dict[int, float] = {}
+        self._lag: Dict[int, Optional[float]] = {}
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def pin(self, key: Optional[Hashable]) -> None:
+        # Reads for this key go to the primary until the window has passed, so
+        # a client sees its own writes despite replication lag.
+        if key is not None and self.replicas:
+            self._pinned.set(key, True)
+
+    def is_pinned(self, key: Optional[Hashable]) -> bool:
+        return key is not None and self._pinned.get(key, False)
+
+    def evict(self, index: int) -> None:
+        self._evicted_until[index] = time.monotonic() + self.eviction_seconds
+
+    def healthy(self) -> List[int]:
+        now = time.monotonic()
+        return [
+            index
+            for index in range(len(self.replicas))
+            if self._evicted_until.get(index, 0) <= now
+        ]
+
+    def pick(self, key: Optional[Hashable] = None) -> Optional[int]:
+        if self.is_pinned(key):
+            return None
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    @asynccontextmanager
+    async def session(
+        self, key: Optional[Hashable] = None
+    ) -> AsyncIterator[AsyncSession]:
+        index = self.pick(key)
+        if index is not None:
+            db = self.replicas[index]()
+            try:
+                # Connect up front so an unreachable replica falls back to the
+                # primary instead of failing the request.
+                await db.connection()
+            except (DBAPIError, OSError):
+                await db.close()
+                self.evict(index)
+            else:
+                async with db:
+                    yield db
+                return
+
+        async with self.primary() as db:
+            yield db
+
+    async def check(self) -> None:
+        for index, session_factory in enumerate(self.replicas):
+            try:
+                async with session_factory() as db:
+                    lag = await asyncio.wait_for(
+                        db.scalar(REPLICA_LAG_QUERY), self.health_interval
+                    )
+            except (DBAPIError, OSError, asyncio.TimeoutError):
+                self._lag[index] = None
+                self.evict(index)
+                continue
+
+            self._lag[index] = float(lag)
+            if self._lag[index] > self.max_lag:
+                self.evict(index)
+            else:
+                self._evicted_until.pop(index, None)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check()
+            except Exception:
+                # Keep routing on the last known health until a check succeeds.
+                pass
+
+    async def start(self) -> None:
+        if self.replicas:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> dict:
+        healthy = set(self.healthy())
+        return {
+            "replicas": [
+                {
+                    "url": session_factory.kw["bind"].url.render_as_string(
+                        hide_password=True
+                    ),
+                    "healthy": index in healthy,
+                    "lag_s": self._lag.get(index),
+                }
+                for index, session_factory in enumerate(self.replicas)
+            ],
+            "pinned_clients": len(self._pinned),
+        }
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from os import getenv
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+TRANSACTION_RETRY_MAX_ATTEMPTS = int(getenv("TRANSACTION_RETRY_MAX_ATTEMPTS", 5))
+TRANSACTION_RETRY_BUDGET = float(getenv("TRANSACTION_RETRY_BUDGET", 2))  # in seconds
+TRANSACTION_RETRY_BASE_DELAY = float(
+    getenv("TRANSACTION_RETRY_BASE_DELAY", 0.01)
+)  # in seconds
+TRANSACTION_RETRY_MAX_DELAY = float(
+    getenv("TRANSACTION_RETRY_MAX_DELAY", 0.5)
+)  # in seconds
+
+# SQLSTATEs after which re-running the whole transaction can succeed.
+RETRYABLE_SQLSTATES = {
+    "40001": "serialization_failure",
+    "40P01": "deadlock_detected",
+}
+
+
+def retry_reason(error: BaseException) -> Optional[str]:
+    # Services wrap driver errors (e.g. into an HTTP 500), so follow the
+    # exception chain down to the DBAPI error.
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        sqlstate = getattr(getattr(error, "orig", None), "pgcode", None)
+        if sqlstate in RETRYABLE_SQLSTATES:
+            return RETRYABLE_SQLSTATES[sqlstate]
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class RetryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retries = Counter()
+        self._recovered = Counter()
+        self._exhausted = Counter()
+
+    def observe_retry(self, operation: str, reason: str) -> None:
+        with self._lock:
+            self._retries[(operation, reason)] += 1
+
+    def observe_recovered(self, operation: str) -> None:
+        with self._lock:
+            self._recovered[operation] += 1
+
+    def observe_exhausted(self, operation: str, reason: str) -> None:
+        with self._lock:
+            self._exhausted[(operation, reason)] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            operations = {}
+            for (operation, reason), count in self._retries.items():
+                entry = operations.setdefault(operation, {"retries": {}})
+                entry["retries"][reason] = count
+            for (operation, reason), count in self._exhausted.items():
+                entry = operations.setdefault(operation, {"retries": {}})
+                entry.setdefault("exhausted", {})[reason] = count
+            for operation, count in self._recovered.items():
+                operations.setdefault(operation, {"retries": {}})["recovered"] = count
+            return operations
+
+
+retry_metrics = RetryMetrics()
+
+
+def retry_on_conflict(method):
+    # For service methods that own their transaction through `self.db`: the
+    # session is rolled back and the whole method runs again.
+    operation = method.__qualname__
+
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        deadline = time.monotonic() + TRANSACTION_RETRY_BUDGET
+        attempt = 0
+        while True:
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    raise
+                await self.db.rollback()
+
+                # Full jitter keeps colliding transactions from retrying in
+                # lockstep.
+                delay = random.uniform(
+                    0,
+                    min(
+                        TRANSACTION_RETRY_MAX_DELAY,
+                        TRANSACTION_RETRY_BASE_DELAY * 2**attempt,
+                    ),
+                )
+                attempt += 1
+                if (
+                    attempt >= TRANSACTION_RETRY_MAX_ATTEMPTS
+                    or time.monotonic() + delay > deadline
+                ):
+                    retry_metrics.observe_exhausted(operation, reason)
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Transaction conflicted with concurrent updates, "
+                        "please retry",
+                        headers={"Retry-After": "1"},
+                    ) from e
+
+                retry_metrics.observe_retry(operation, reason)
+                await asyncio.sleep(delay)
+                continue
+
+            if attempt:
+                retry_metrics.observe_recovered(operation)
+            return result
+
+    return wrapper
@@ -0,0 +1,62 @@
+import os
+import re
+from html import escape
+from os import getenv
+from typing import Dict, Mapping, Optional
+
+MAIL_TEMPLATE_DIR = getenv("MAIL_TEMPLATE_DIR", "mail_templates")
+
+# {name} placeholders; CSS blocks never have a bare identifier inside braces.
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class CompiledTemplate:
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.placeholders = frozenset(PLACEHOLDER.findall(source))
+
+        # Compiled once into alternating literal text and placeholder names, so
+        # rendering only fills the odd slots and joins; no scanning per email.
+        self._parts = PLACEHOLDER.split(source)
+
+    def render(self, context: Mapping[str, object]) -> str:
+        missing = self.placeholders - context.keys()
+        if missing:
+            raise ValueError(
+                f"Template {self.name} is missing {', '.join(sorted(missing))}"
+            )
+        values = {name: escape(str(context[name])) for name in self.placeholders}
+        parts = self._parts.copy()
+        for index in range(1, len(parts), 2):
+            parts[index] = values[parts[index]]
+        return "".join(parts)
+
+
+class TemplateRegistry:
+    def __init__(self, directory: str = MAIL_TEMPLATE_DIR):
+        self.directory = directory
+        self._templates: Optional[Dict[str, CompiledTemplate]] = None
+
+    def load(self) -> None:
+        templates = {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                with open(path, "r") as template:
+                    templates[name] = CompiledTemplate(name, template.read())
+        self._templates = templates
+
+    def get(self, name: str) -> CompiledTemplate:
+        # Loaded on first use, so every worker process reads the directory once.
+        if self._templates is None:
+            self.load()
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise KeyError(f"Unknown mail template {name}") from None
+
+    def render(self, name: str, context: Mapping[str, object]) -> str:
+        return self.get(name).render(context)
+
+
+mail_templates = TemplateRegistry()
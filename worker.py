@@ -1,46 +1,139 @@
 import asyncio
-from typing import List
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 from celery import Celery
+from celery.signals import worker_process_shutdown
 import os
-from utils import send_email
-from fastapi_mail import errors
+import aiosmtplib
+from sqlalchemy import delete
+from utils import build_message, mail_templates, smtp_pool
 from dotenv import load_dotenv
 
+import models
+from database import SessionLocal
+from services import rollup_statements, settle_pending_credits
+
 load_dotenv()
 
 BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 BACKEND_URL = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+REVOKED_TOKEN_PRUNE_INTERVAL = float(
+    os.getenv("REVOKED_TOKEN_PRUNE_INTERVAL", 3600)
+)  # in seconds
+CREDIT_SETTLEMENT_INTERVAL = float(
+    os.getenv("CREDIT_SETTLEMENT_INTERVAL", 5)
+)  # in seconds
+STATEMENT_ROLLUP_INTERVAL = float(
+    os.getenv("STATEMENT_ROLLUP_INTERVAL", 600)
+)  # in seconds
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 100))
+
+_loop = None
 
 
 celery_app = Celery("vaultcore", broker=BROKER_URL, backend=BACKEND_URL)
+celery_app.conf.beat_schedule = {
+    "prune-revoked-tokens": {
+        "task": "prune_revoked_tokens",
+        "schedule": REVOKED_TOKEN_PRUNE_INTERVAL,
+    },
+    "settle-pending-credits": {
+        "task": "settle_pending_credits",
+        "schedule": CREDIT_SETTLEMENT_INTERVAL,
+    },
+    "rollup-wallet-statements": {
+        "task": "rollup_wallet_statements",
+        "schedule": STATEMENT_ROLLUP_INTERVAL,
+    },
+}
+
+
+def run_async(coroutine):
+    # One event loop per worker process, so pooled SMTP connections outlive the
+    # task that opened them.
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coroutine)
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    if _loop is not None:
+        run_async(smtp_pool.close())
+
+
+def render_email(
+    subject: str,
+    recipients: List[str],
+    url: Optional[str] = None,
+    template: str = "verification_mail.html",
+    context: Optional[Dict] = None,
+):
+    # `url` is what tasks queued before per-flow templates carry.
+    if url is not None:
+        context = {"verification_url": url, **(context or {})}
+    body = mail_templates.render(template, context or {})
+    return build_message(subject=subject, recipients=recipients, body=body)
 
 
 @celery_app.task(
     name="send_email",
-    autoretry_for=(
-        errors.ApiError,
-        errors.ConnectionErrors,
-    ),
+    autoretry_for=(aiosmtplib.SMTPException, OSError),
     retry_backoff=True,
     max_retries=5,
 )
 def start_sending_email(
     subject: str,
     recipients: List[str],
-    url: str,
+    url: Optional[str] = None,
     template="verification_mail.html",
+    context: Optional[Dict] = None,
 ):
-    with open(f"mail_templates/{template}", "r") as template:
-        try:
-            asyncio.get_running_loop()
-        except RuntimeError:
-            
-            asyncio.set_event_loop(asyncio.new_event_loop())
-        asyncio.run(
-            send_email(
-                subject=subject,
-                recipients=recipients,
-                body=template.read().replace("{verification_url}", url),
+    run_async(smtp_pool.send(render_email(subject, recipients, url, template, context)))
+    return {"msg": "email sent"}
+
+
+@celery_app.task(name="send_email_batch", bind=True, max_retries=5)
+def send_email_batch(self, emails: List[Dict]):
+    # Each item holds start_sending_email's keyword arguments. The batch shares
+    # the worker's SMTP connections and only the failed emails are retried.
+    outcomes = run_async(
+        smtp_pool.send_many([render_email(**email) for email in emails])
+    )
+    failed = [email for email, error in zip(emails, outcomes) if error is not None]
+    if failed:
+        error = next(error for error in outcomes if error is not None)
+        raise self.retry(args=[failed], exc=error, countdown=2**self.request.retries)
+    return {"sent": len(emails)}
+
+
+def send_emails(emails: List[Dict]) -> None:
+    for start in range(0, len(emails), MAIL_BATCH_SIZE):
+        send_email_batch.delay(emails[start : start + MAIL_BATCH_SIZE])
+
+
+@celery_app.task(name="prune_revoked_tokens")
+def prune_revoked_tokens():
+    with SessionLocal() as db:
+        result = db.execute(
+            delete(models.RevokedToken).where(
+                models.RevokedToken.expires_at < datetime.now(timezone.utc)
             )
         )
-    return {"msg": "email sent"}
+        db.commit()
+    return {"deleted": result.rowcount}
+
+
+@celery_app.task(name="settle_pending_credits")
+def settle_pending_credits_task():
+    with SessionLocal() as db:
+        settled = settle_pending_credits(db)
+    return {"settled": settled}
+
+
+@celery_app.task(name="rollup_wallet_statements")
+def rollup_wallet_statements_task():
+    with SessionLocal() as db:
+        written = rollup_statements(db)
+    return {"statements": written}